@@ -0,0 +1,410 @@
+"""
+In-process adjacency index for fast neighborhood queries.
+
+The graph is held in compressed sparse row (CSR) form: for node i, the
+entries offsets[i]:offsets[i + 1] of `targets` / `edge_index` list its
+neighbours and the edges leading to them. Edges are treated as undirected,
+like the `ANY` traversal used by /neighbors, so each edge appears once in
+each endpoint's row. Breadth-first search expands a whole level at a time
+with NumPy gathers instead of visiting nodes one by one.
+
+The index is built from a graph_cache.GraphSnapshot and is rebuilt whenever
+the snapshot changes revision.
+"""
+
+import heapq
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+class PathBudgetExceeded(Exception):
+    """A path search ran past its deadline"""
+
+
+class AdjacencyIndex:
+    """CSR adjacency over the shaped node/edge records of one snapshot"""
+
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], revision: Optional[str] = None):
+        self.revision = revision
+        self.nodes = nodes
+        self.edges = edges
+        self.index = {n["id"]: i for i, n in enumerate(nodes)}
+
+        node_count = len(nodes)
+        # Edges whose endpoints are missing from the node list are left out
+        linked = [
+            (i, self.index[e["source"]], self.index[e["target"]])
+            for i, e in enumerate(edges)
+            if e["source"] in self.index and e["target"] in self.index
+        ]
+        edge_ids = np.fromiter((l[0] for l in linked), dtype=np.int32, count=len(linked))
+        sources = np.fromiter((l[1] for l in linked), dtype=np.int32, count=len(linked))
+        targets = np.fromiter((l[2] for l in linked), dtype=np.int32, count=len(linked))
+
+        heads = np.concatenate([sources, targets])
+        tails = np.concatenate([targets, sources])
+        order = np.argsort(heads, kind="stable")
+        self.targets = tails[order]
+        self.edge_index = np.concatenate([edge_ids, edge_ids])[order]
+        self.offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=node_count), out=self.offsets[1:])
+
+        # Per-edge attributes, indexed by position in `edges`
+        self.weights = np.fromiter((e.get("weight", 1.0) for e in edges), dtype=np.float32, count=len(edges))
+        type_codes: Dict[Any, int] = {}
+        self.types = np.fromiter(
+            (type_codes.setdefault(e.get("type"), len(type_codes)) for e in edges),
+            dtype=np.int32, count=len(edges))
+        self.type_codes = type_codes
+
+        # Per-node ranking keys for top-k expansion (see ranked_bfs)
+        self.importance = np.fromiter(
+            (n.get("importance", 0.5) for n in nodes), dtype=np.float32, count=node_count)
+        self.id_rank = np.empty(node_count, dtype=np.int64)
+        self.id_rank[np.argsort(np.array([n["id"] for n in nodes], dtype=object), kind="stable")] = np.arange(node_count)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    def degree(self, node: int) -> int:
+        return int(self.offsets[node + 1] - self.offsets[node])
+
+    def _gather(self, frontier):
+        """Row slices of all frontier nodes: (row owner, target, edge index) arrays"""
+        starts = self.offsets[frontier]
+        lengths = self.offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        # positions = starts[k] + 0..lengths[k]-1 for every frontier node k
+        row_start = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = row_start + np.arange(total)
+        owners = np.repeat(frontier, lengths)
+        return owners, self.targets[positions], self.edge_index[positions]
+
+    def _edge_mask(self, edge_ids, edge_types: Optional[Sequence[Optional[str]]], min_weight: Optional[float]):
+        mask = np.ones(len(edge_ids), dtype=bool)
+        if edge_types is not None:
+            codes = [self.type_codes[t] for t in edge_types if t in self.type_codes]
+            mask &= np.isin(self.types[edge_ids], codes)
+        if min_weight is not None:
+            mask &= self.weights[edge_ids] >= min_weight
+        return mask
+
+    def bfs(
+        self,
+        start: int,
+        depth: int,
+        edge_types: Optional[Sequence[Optional[str]]] = None,
+        min_weight: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+    ):
+        """
+        Level-synchronous BFS from `start`, following only edges that pass the
+        filters. Returns (node indexes, distances, truncated). The start node
+        is not included in the node list; max_nodes keeps the nearest first.
+        """
+        distance = np.full(self.node_count, -1, dtype=np.int8)
+        distance[start] = 0
+        frontier = np.array([start], dtype=np.int64)
+        reached, truncated = [], False
+        budget = max_nodes
+
+        for level in range(1, depth + 1):
+            _, neighbours, edge_ids = self._gather(frontier)
+            neighbours = neighbours[self._edge_mask(edge_ids, edge_types, min_weight)]
+            fresh = np.unique(neighbours[distance[neighbours] < 0])
+            if budget is not None:
+                if len(fresh) > budget:
+                    fresh, truncated = fresh[:budget], True
+                budget -= len(fresh)
+            if len(fresh) == 0:
+                break
+            distance[fresh] = level
+            reached.append(fresh)
+            if truncated:
+                break
+            frontier = fresh
+
+        nodes = np.concatenate(reached) if reached else np.empty(0, dtype=np.int64)
+        return nodes, distance[nodes], truncated
+
+    def ranked_bfs(
+        self,
+        start: int,
+        depth: int,
+        edge_types: Optional[Sequence[Optional[str]]] = None,
+        min_weight: Optional[float] = None,
+        per_node_limit: Optional[int] = None,
+        per_node_offset: int = 0,
+        total_limit: Optional[int] = None,
+    ):
+        """
+        BFS that expands each node only through its strongest new neighbours:
+        ranked by edge weight, then neighbour importance, then id, skipping the
+        first per_node_offset and keeping per_node_limit of them. Each level is
+        ranked the same way again when total_limit caps the node count.
+        Returns (node indexes, distances, {expanded node: hidden neighbour
+        count}, truncated).
+        """
+        distance = np.full(self.node_count, -1, dtype=np.int8)
+        distance[start] = 0
+        frontier = [start]
+        reached, candidates = [], {}
+        budget = total_limit
+        truncated = False
+        stop = None if per_node_limit is None else per_node_offset + per_node_limit
+
+        for level in range(1, depth + 1):
+            best: Dict[int, float] = {}
+            for parent in frontier:
+                lo, hi = self.offsets[parent], self.offsets[parent + 1]
+                neighbours, edge_ids = self.targets[lo:hi], self.edge_index[lo:hi]
+                mask = self._edge_mask(edge_ids, edge_types, min_weight) & (distance[neighbours] < 0)
+                neighbours, weights = neighbours[mask], self.weights[edge_ids[mask]]
+                if len(neighbours) == 0:
+                    continue
+                # Strongest edge per neighbour, then neighbours in rank order
+                order = np.lexsort((self.id_rank[neighbours], -self.importance[neighbours], -weights))
+                neighbours, weights = neighbours[order], weights[order]
+                _, first = np.unique(neighbours, return_index=True)
+                first.sort()
+                neighbours, weights = neighbours[first], weights[first]
+                candidates[parent] = neighbours
+                for node, weight in zip(neighbours[per_node_offset:stop].tolist(), weights[per_node_offset:stop].tolist()):
+                    if weight > best.get(node, -1.0):
+                        best[node] = weight
+
+            fresh = sorted(best, key=lambda n: (-best[n], -self.importance[n], self.id_rank[n]))
+            if budget is not None:
+                if len(fresh) > budget:
+                    fresh, truncated = fresh[:budget], True
+                budget -= len(fresh)
+            if not fresh:
+                break
+            distance[fresh] = level
+            reached.append(np.array(fresh, dtype=np.int64))
+            frontier = fresh
+
+        more = {}
+        for parent, neighbours in candidates.items():
+            hidden = len(neighbours) - per_node_offset - int((distance[neighbours] >= 0).sum())
+            if hidden > 0:
+                more[parent] = hidden
+        nodes = np.concatenate(reached) if reached else np.empty(0, dtype=np.int64)
+        return nodes, distance[nodes], more, truncated or bool(more)
+
+    def induced_edges(
+        self,
+        members,
+        edge_types: Optional[Sequence[Optional[str]]] = None,
+        min_weight: Optional[float] = None,
+    ):
+        """Indexes of the edges (passing the filters) with both endpoints in `members`"""
+        members = np.asarray(members, dtype=np.int64)
+        inside = np.zeros(self.node_count, dtype=bool)
+        inside[members] = True
+        _, neighbours, edge_ids = self._gather(members)
+        keep = inside[neighbours] & self._edge_mask(edge_ids, edge_types, min_weight)
+        return np.unique(edge_ids[keep])
+
+    def neighborhood(
+        self,
+        node_id: str,
+        depth: int,
+        edge_types: Optional[Sequence[Optional[str]]] = None,
+        min_weight: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Same result shape as the AQL neighborhood query"""
+        start = self.index.get(node_id)
+        if start is None:
+            return {"nodes": [], "edges": [], "truncated": False}
+        nodes, distances, truncated = self.bfs(start, depth, edge_types, min_weight, max_nodes)
+        links = self.induced_edges(np.concatenate([[start], nodes]), edge_types, min_weight)
+        return {
+            "nodes": [self.nodes[start]] + [
+                {**self.nodes[i], "distance": int(d)} for i, d in zip(nodes.tolist(), distances.tolist())
+            ],
+            "edges": [self.edges[i] for i in links.tolist()],
+            "truncated": truncated,
+        }
+
+    def ranked_neighborhood(
+        self,
+        node_id: str,
+        depth: int,
+        edge_types: Optional[Sequence[Optional[str]]] = None,
+        min_weight: Optional[float] = None,
+        per_node_limit: Optional[int] = None,
+        per_node_offset: int = 0,
+        total_limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Same result shape as the ranked AQL neighborhood query"""
+        start = self.index.get(node_id)
+        if start is None:
+            return {"nodes": [], "edges": [], "truncated": False}
+        nodes, distances, more, truncated = self.ranked_bfs(
+            start, depth, edge_types, min_weight, per_node_limit, per_node_offset, total_limit)
+        links = self.induced_edges(np.concatenate([[start], nodes]), edge_types, min_weight)
+
+        def marked(i: int, record: Dict[str, Any]) -> Dict[str, Any]:
+            return {**record, "more": more[i]} if i in more else record
+
+        return {
+            "nodes": [marked(start, self.nodes[start])] + [
+                marked(i, {**self.nodes[i], "distance": int(d)}) for i, d in zip(nodes.tolist(), distances.tolist())
+            ],
+            "edges": [self.edges[i] for i in links.tolist()],
+            "truncated": truncated,
+        }
+
+    def _shortest_path(
+        self,
+        source: int,
+        target: int,
+        weighted: bool,
+        deadline: float,
+        banned_nodes: Set[int] = frozenset(),
+        banned_edges: Set[int] = frozenset(),
+    ) -> Optional[Tuple[float, List[int], List[int]]]:
+        """Dijkstra from source to target avoiding the banned nodes/edges: (cost, nodes, edges) or None"""
+        best = {source: 0.0}
+        previous: Dict[int, Tuple[int, int]] = {}
+        queue = [(0.0, source)]
+        settled = 0
+        while queue:
+            cost, node = heapq.heappop(queue)
+            if node == target:
+                nodes, edges = [target], []
+                while node != source:
+                    node, edge = previous[node]
+                    nodes.append(node)
+                    edges.append(edge)
+                return cost, nodes[::-1], edges[::-1]
+            if cost > best[node]:
+                continue
+            settled += 1
+            if settled % 1024 == 0 and time.monotonic() > deadline:
+                raise PathBudgetExceeded()
+            lo, hi = self.offsets[node], self.offsets[node + 1]
+            for neighbour, edge in zip(self.targets[lo:hi].tolist(), self.edge_index[lo:hi].tolist()):
+                if neighbour in banned_nodes or edge in banned_edges:
+                    continue
+                step = cost + (float(self.weights[edge]) if weighted else 1.0)
+                if step < best.get(neighbour, float("inf")):
+                    best[neighbour] = step
+                    previous[neighbour] = (node, edge)
+                    heapq.heappush(queue, (step, neighbour))
+        return None
+
+    def k_shortest_paths(
+        self,
+        source_id: str,
+        target_id: str,
+        k: int = 1,
+        weighted: bool = False,
+        max_depth: Optional[int] = None,
+        budget: float = 5.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to k loopless paths in increasing cost order (Yen's algorithm), the
+        same result as an ANY K_SHORTEST_PATHS traversal: each step costs the
+        edge weight when `weighted`, else 1. Of the k cheapest paths, those
+        longer than max_depth hops are dropped, so weighted searches may return
+        fewer than k (unweighted ones come out by length, so that is exact).
+        Raises PathBudgetExceeded after `budget` seconds.
+        Each path is {"nodes", "edges" (records), "cost", "length"}.
+        """
+        source, target = self.index.get(source_id), self.index.get(target_id)
+        if source is None or target is None:
+            return []
+        deadline = time.monotonic() + budget
+
+        found: List[Tuple[float, List[int], List[int]]] = []
+        first = self._shortest_path(source, target, weighted, deadline)
+        candidates = [first] if first else []
+        seen = {tuple(first[2])} if first else set()
+        while candidates and len(found) < k:
+            path = heapq.heappop(candidates)
+            if not weighted and max_depth is not None and len(path[2]) > max_depth:
+                break  # Unweighted paths come out shortest first; none of the rest fit either
+            found.append(path)
+            _, nodes, edges = path
+            # Deviate from the last path at each of its nodes in turn
+            for j in range(len(nodes) - 1):
+                root_nodes, root_edges = nodes[:j + 1], edges[:j]
+                # Compare roots by edges: parallel edges make distinct roots over the same nodes
+                banned_edges = {p_edges[j] for _, _, p_edges in found if len(p_edges) > j and p_edges[:j] == root_edges}
+                spur = self._shortest_path(
+                    nodes[j], target, weighted, deadline, set(root_nodes[:-1]), banned_edges)
+                if spur is None:
+                    continue
+                root_cost = sum(float(self.weights[e]) if weighted else 1.0 for e in root_edges)
+                candidate = (root_cost + spur[0], root_nodes[:-1] + spur[1], root_edges + spur[2])
+                if tuple(candidate[2]) not in seen:
+                    seen.add(tuple(candidate[2]))
+                    heapq.heappush(candidates, candidate)
+
+        return [
+            {
+                "nodes": [self.nodes[i] for i in nodes],
+                "edges": [self.edges[i] for i in edges],
+                "cost": round(cost, 6),
+                "length": len(edges),
+            }
+            for cost, nodes, edges in found
+            if max_depth is None or len(edges) <= max_depth
+        ]
+
+    def multi_neighborhood(
+        self,
+        seed_ids: Sequence[str],
+        depth: int,
+        edge_types: Optional[Sequence[Optional[str]]] = None,
+        min_weight: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Merged neighborhood of several seeds, same shape as the AQL batch
+        query: each node carries its minimum distance to any seed and the
+        seeds that reach it within `depth`.
+        """
+        distance: Dict[int, int] = {}
+        reached_by: Dict[int, set] = {}
+        missing = []
+        for seed_id in seed_ids:
+            start = self.index.get(seed_id)
+            if start is None:
+                missing.append(seed_id)
+                continue
+            nodes, distances, _ = self.bfs(start, depth, edge_types, min_weight)
+            for node, d in [(start, 0)] + list(zip(nodes.tolist(), distances.tolist())):
+                distance[node] = min(d, distance.get(node, d))
+                reached_by.setdefault(node, set()).add(seed_id)
+
+        ranked = sorted(distance, key=lambda node: (distance[node], self.nodes[node]["id"]))
+        truncated = max_nodes is not None and len(ranked) > max_nodes
+        if truncated:
+            ranked = ranked[:max_nodes]
+        links = self.induced_edges(ranked, edge_types, min_weight)
+        return {
+            "nodes": [
+                {**self.nodes[node], "distance": distance[node], "seeds": sorted(reached_by[node])}
+                for node in ranked
+            ],
+            "edges": [self.edges[i] for i in links.tolist()],
+            "missing": missing,
+            "truncated": truncated,
+        }
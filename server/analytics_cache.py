@@ -0,0 +1,93 @@
+"""
+Shared cache for computed analytics results.
+
+Each named result (e.g. the team coupling matrix) is computed once per graph
+revision and reused by every view rendered from it, so a Power BI refresh
+that hits the heatmap and the table triggers one computation, and both
+report the same calculation time. A result is recomputed when
+
+- the revision returned by load_revision() changes, or
+- it is older than `ttl` seconds (0 = only on revision changes)
+
+Computation is single-flight: requests arriving while a result is being
+computed wait for it instead of starting their own.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class CachedResult:
+    """One computed analytics value, the revision it was computed at and when"""
+
+    def __init__(self, revision: str, value: Any):
+        self.revision = revision
+        self.value = value
+        self.computed_at = time.time()
+        self.calculation_timestamp = datetime.fromtimestamp(self.computed_at).isoformat()
+
+
+class AnalyticsCache:
+    """
+    Revision-keyed result holder.
+
+    - await load_revision() must be cheap; it is called on every lookup
+    - get(name, compute) returns the cached result or awaits compute() once
+    """
+
+    def __init__(self, load_revision: Callable[[], Awaitable[str]], ttl: float = 0.0):
+        self._load_revision = load_revision
+        self.ttl = ttl
+        self._results: Dict[str, CachedResult] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, result: Optional[CachedResult], revision: str) -> bool:
+        return (
+            result is not None
+            and result.revision == revision
+            and (self.ttl <= 0 or time.time() - result.computed_at < self.ttl)
+        )
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop one cached result, or all of them"""
+        if name is None:
+            self._results.clear()
+        else:
+            self._results.pop(name, None)
+
+    async def get(self, name: str, compute: Callable[[], Awaitable[Any]]) -> CachedResult:
+        revision = await self._load_revision()
+        result = self._results.get(name)
+        if self._fresh(result, revision):
+            self.hits += 1
+            return result
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            # Another request may have computed it while we waited
+            result = self._results.get(name)
+            if self._fresh(result, revision):
+                self.hits += 1
+                return result
+
+            self.misses += 1
+            # Tagged with the revision read before computing: a change that
+            # lands meanwhile makes the next lookup recompute
+            result = CachedResult(revision, await compute())
+            self._results[name] = result
+            return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "results": {
+                name: {"revision": result.revision, "calculation_timestamp": result.calculation_timestamp}
+                for name, result in self._results.items()
+            },
+        }
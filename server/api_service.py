@@ -7,17 +7,43 @@ Combines:
 """
 
 import os
+import json
+import math
+import random
+import asyncio
+import base64
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from collections import defaultdict
+from itertools import islice
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from arango import ArangoClient
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import ollama
+import httpx
 from fastapi import Request
 
+import adjacency
+import centrality
+import communities
+import graph_codec
+import http_cache
+import search_view
+import table_export
+from adjacency import AdjacencyIndex, PathBudgetExceeded
+from arango_async import ArangoError, AsyncArangoDatabase
+from centrality import CentralityJob
+from communities import CommunityWorker
+from coupling import COUPLING_QUERY, DEFAULT_IMPORTANCE, DEFAULT_WEIGHT, CouplingMatrix
+from graph_cache import GraphSnapshotCache
+from graph_stats import GraphStats
+from incremental import node_refresh_query
+from neighbor_cache import NeighborhoodCache, node_id
+from search_index import SuggestIndex
+
 # =========================================
 # ENVIRONMENT SETUP
 # =========================================
@@ -29,16 +55,90 @@ ARANGO_PASSWORD = os.getenv("ARANGO_PASSWORD", "")
 ARANGO_DB = os.getenv("ARANGO_DB", "protograph")
 ARANGO_GRAPH = os.getenv("ARANGO_GRAPH", "protoGraph")
 
+# AQL cursor tuning: documents per round trip and server-side cursor lifetime (seconds)
+ARANGO_BATCH_SIZE = int(os.getenv("ARANGO_BATCH_SIZE", "1000"))
+ARANGO_CURSOR_TTL = int(os.getenv("ARANGO_CURSOR_TTL", "60"))
+
+# Max concurrent ArangoDB connections per worker, and per-request timeout (seconds)
+ARANGO_POOL_SIZE = int(os.getenv("ARANGO_POOL_SIZE", "20"))
+ARANGO_TIMEOUT = float(os.getenv("ARANGO_TIMEOUT", "30"))
+
+# Default page size for paginated /graph requests
+GRAPH_PAGE_SIZE = int(os.getenv("GRAPH_PAGE_SIZE", "1000"))
+
+# Seconds between collection revision checks for the graph snapshot cache
+GRAPH_REVISION_CHECK_INTERVAL = float(os.getenv("GRAPH_REVISION_CHECK_INTERVAL", "1.0"))
+
+# Serve /neighbors from the in-process adjacency index instead of AQL traversals
+ADJACENCY_INDEX = os.getenv("ADJACENCY_INDEX", "false").lower() in ("1", "true", "yes")
+
+# ArangoSearch view backing /search (see search_view.py); empty to always scan the snapshot
+SEARCH_VIEW = os.getenv("SEARCH_VIEW", search_view.VIEW_NAME)
+
+# Seconds between full recomputes of the /stats counters (0 = only at startup and on demand)
+STATS_RECOMPUTE_INTERVAL = float(os.getenv("STATS_RECOMPUTE_INTERVAL", "300"))
+
+# /neighbors result cache: byte budget (0 disables) and entry lifetime in seconds (0 = no expiry)
+NEIGHBOR_CACHE_MAX_BYTES = int(os.getenv("NEIGHBOR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+NEIGHBOR_CACHE_TTL = float(os.getenv("NEIGHBOR_CACHE_TTL", "300"))
+
+# Seconds between centrality runs that rewrite node importance (0 = only on demand)
+CENTRALITY_RECOMPUTE_INTERVAL = float(os.getenv("CENTRALITY_RECOMPUTE_INTERVAL", "0"))
+
+# notify-update endpoint of the coupling service (main.py), whose scores use node
+# importance; told to re-aggregate after each centrality write-back (empty disables)
+COUPLING_NOTIFY_URL = os.getenv("COUPLING_NOTIFY_URL", "")
+
+# Keep a data-driven `community` attribute on the nodes (see communities.py);
+# off by default since the first pass writes a label to every unlabelled node
+COMMUNITY_DETECTION = os.getenv("COMMUNITY_DETECTION", "false").lower() in ("1", "true", "yes")
+
+# Seconds a /path search may run before it is cancelled (AQL maxRuntime / in-process deadline)
+PATH_TIME_BUDGET = float(os.getenv("PATH_TIME_BUDGET", "5"))
+
+# Rows per CSV block / Parquet row group in /export responses (bounds their memory use)
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://10.10.80.99:4001")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gpt-oss:120b")
 
 # =========================================
 # FASTAPI APP CONFIGURATION
 # =========================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if db:
+        try:
+            version = await db.version()
+            print(f"✓ Connected to ArangoDB {version}: {ARANGO_DB}")
+        except Exception as e:
+            print(f"✗ Failed to connect to ArangoDB: {e}")
+        if SEARCH_VIEW:
+            try:
+                await db.query("FOR doc IN @@view LIMIT 1 RETURN 1", {"@view": SEARCH_VIEW})
+            except Exception:
+                print(f"⚠️ Search view '{SEARCH_VIEW}' not available; /search will scan the snapshot (run setup_arrango.py)")
+        graph_stats.schedule_recompute()
+    schedules = []
+    if db and STATS_RECOMPUTE_INTERVAL > 0:
+        schedules.append(asyncio.create_task(graph_stats.run_schedule(STATS_RECOMPUTE_INTERVAL)))
+    if db and CENTRALITY_RECOMPUTE_INTERVAL > 0 and centrality.is_available():
+        schedules.append(asyncio.create_task(centrality_job.run_schedule(CENTRALITY_RECOMPUTE_INTERVAL)))
+    if db and COMMUNITY_DETECTION and communities.is_available():
+        community_worker.start()
+    yield
+    for schedule in schedules:
+        schedule.cancel()
+    community_worker.stop()
+    if db:
+        await db.close()
+
+
 app = FastAPI(
     title="ProtoGraph Unified API",
     description="ArangoDB Graph + AI Assistant Backend",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -57,19 +157,180 @@ app.add_middleware(
 # =========================================
 # DATABASE CONNECTION
 # =========================================
+# Queries go through a bounded async connection pool, so a slow traversal
+# only holds one connection instead of blocking the event loop.
 try:
-    client = ArangoClient(hosts=ARANGO_HOST)
-    db = client.db(ARANGO_DB, username=ARANGO_USER, password=ARANGO_PASSWORD)
-    print(f"✓ Connected to ArangoDB: {ARANGO_DB}")
+    db = AsyncArangoDatabase(
+        ARANGO_HOST,
+        ARANGO_DB,
+        ARANGO_USER,
+        ARANGO_PASSWORD,
+        pool_size=ARANGO_POOL_SIZE,
+        timeout=ARANGO_TIMEOUT,
+        batch_size=ARANGO_BATCH_SIZE,
+        ttl=ARANGO_CURSOR_TTL,
+    )
 except Exception as e:
-    print(f"✗ Failed to connect to ArangoDB: {e}")
+    print(f"✗ Failed to configure ArangoDB client: {e}")
     db = None
 
+# =========================================
+# GRAPH SNAPSHOT CACHE
+# =========================================
+async def load_graph_revision() -> str:
+    """Cheap change detector: the revisions of both graph collections"""
+    nodes_rev, edges_rev = await asyncio.gather(
+        db.collection_revision("nodes"), db.collection_revision("edges"))
+    return f"{nodes_rev}:{edges_rev}"
+
+
+def moved_collections(old: str, new: str) -> set:
+    """Graph collections whose revision differs between two graph_cache revisions"""
+    old_revs = old.rsplit(".", 1)[0].split(":")
+    new_revs = new.rsplit(".", 1)[0].split(":")
+    return {name for name, a, b in zip(("nodes", "edges"), old_revs, new_revs) if a != b}
+
+
+async def load_graph():
+    """Full scan of both collections, shaped for the frontend"""
+    return await asyncio.gather(
+        db.query(f"FOR node IN nodes RETURN {node_projection('node')}"),
+        db.query(f"FOR edge IN edges RETURN {edge_projection('edge')}"),
+    )
+
+
+graph_cache = GraphSnapshotCache(load_graph_revision, load_graph, GRAPH_REVISION_CHECK_INTERVAL)
+
+
+async def get_adjacency() -> AdjacencyIndex:
+    """CSR adjacency for the current snapshot, rebuilt when the graph changes"""
+    return await graph_cache.derive(
+        "adjacency", lambda snapshot: AdjacencyIndex(snapshot.nodes, snapshot.edges, snapshot.revision))
+
+
+async def get_suggest_index() -> SuggestIndex:
+    """Typeahead index for the current snapshot, patched with the changed nodes on each revision"""
+    return await graph_cache.derive(
+        "suggest",
+        lambda snapshot: SuggestIndex(snapshot.nodes, snapshot.revision),
+        update=lambda index, snapshot: index.apply(snapshot.nodes, snapshot.revision))
+
+
+neighbor_cache = NeighborhoodCache(NEIGHBOR_CACHE_MAX_BYTES, NEIGHBOR_CACHE_TTL)
+
+
+async def invalidate_nodes(
+    change_type: str,
+    node_ids: List[str],
+    written: Optional[Dict[str, Dict[str, Any]]] = None,
+    base: Optional[str] = None,
+) -> None:
+    """
+    Targeted invalidation after a write to `node_ids` (see notify_update).
+    Only neighborhoods that contain a changed node are evicted; the rest are
+    carried over to the new revision, but only if nothing beyond what this
+    change type writes has moved. Anything else (e.g. unreported writes to
+    the other collection) clears the cache. Given the `written` fields and
+    the snapshot revision they were computed on (`base`), the snapshot is
+    patched the same way instead of rescanned.
+    """
+    neighbor_base = neighbor_cache.revision
+    graph_cache.invalidate()
+    neighbor_cache.invalidate_nodes(node_ids)
+    try:
+        revision = await graph_cache.revision()
+    except Exception:
+        neighbor_cache.clear()
+        return
+    allowed = CHANGE_COLLECTIONS.get(change_type, set())
+    if neighbor_base is not None and moved_collections(neighbor_base, revision) <= allowed:
+        neighbor_cache.rebase(revision)
+    else:
+        neighbor_cache.clear()
+    if written and base is not None and moved_collections(base, revision) <= allowed:
+        graph_cache.patch_nodes(base, revision, written)
+
+
+if ADJACENCY_INDEX and not adjacency.is_available():
+    print("⚠️ ADJACENCY_INDEX is set but NumPy is not installed; /neighbors will use AQL")
+    ADJACENCY_INDEX = False
+
+# =========================================
+# GRAPH STATISTICS
+# =========================================
+STATS_NODE_FIELDS = ["id", "cluster", "type"]
+STATS_EDGE_FIELDS = ["id", "source", "target", "type"]
+
+
+async def load_stats_graph():
+    """Full scan of the attributes the /stats counters are built from"""
+    return await asyncio.gather(
+        db.query(f"FOR node IN nodes RETURN {node_projection('node', STATS_NODE_FIELDS)}"),
+        db.query(f"FOR edge IN edges RETURN {edge_projection('edge', STATS_EDGE_FIELDS)}"),
+    )
+
+
+async def load_stats_nodes(ids: List[str]) -> List[Dict[str, Any]]:
+    """Current state of the given nodes and all their edges, via the edge index"""
+    query = node_refresh_query(node_projection("n", STATS_NODE_FIELDS), edge_projection("e", STATS_EDGE_FIELDS))
+    return await db.query(query, {"ids": ids})
+
+
+graph_stats = GraphStats(load_stats_graph, load_stats_nodes)
+
+# =========================================
+# CENTRALITY & COMMUNITIES
+# =========================================
+# Node documents updated per write-back query
+NODE_WRITE_BATCH = 10_000
+
+
+async def update_nodes(rows: List[Dict[str, Any]]) -> None:
+    """Store computed attributes ({"_key", ...} per node) on the node documents, one UPDATE query per batch"""
+    query = """
+        FOR row IN @rows
+            UPDATE row._key WITH UNSET(row, "_key") IN nodes
+            OPTIONS {ignoreErrors: true}
+    """
+    for start in range(0, len(rows), NODE_WRITE_BATCH):
+        await db.query(query, {"rows": rows[start:start + NODE_WRITE_BATCH]})
+
+
+async def notify_coupling() -> None:
+    """Ask the coupling service to re-aggregate: its scores depend on the importance just rewritten"""
+    if not COUPLING_NOTIFY_URL:
+        return
+    try:
+        async with httpx.AsyncClient(timeout=ARANGO_TIMEOUT) as client:
+            response = await client.post(COUPLING_NOTIFY_URL, json={
+                "change_type": "node_updated",
+                "affected_nodes": [],
+                "timestamp": datetime.now().isoformat(),
+            })
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"⚠️ Coupling service notification failed: {e}")
+
+
+async def write_centrality(rows: List[Dict[str, Any]]) -> None:
+    await update_nodes(rows)
+    await notify_coupling()
+
+
+centrality_job = CentralityJob(graph_cache.get, write_centrality)
+async def communities_written(labels: Dict[str, str], revision: str) -> None:
+    """Patch the caches with a community write-back instead of rescanning"""
+    await invalidate_nodes(
+        "node_updated", list(labels), {node: {"community": label} for node, label in labels.items()}, revision)
+
+
+community_worker = CommunityWorker(graph_cache.get, update_nodes, on_written=communities_written)
+
 # =========================================
 # OLLAMA CONFIGURATION
 # =========================================
 try:
-    ollama_client = ollama.Client(host=OLLAMA_HOST)
+    ollama_client = ollama.AsyncClient(host=OLLAMA_HOST)
 except Exception as e:
     ollama_client = None
     print(f"⚠️ Ollama not available: {e}")
@@ -81,162 +342,1331 @@ class ChatRequest(BaseModel):
     message: str
     context: Optional[str] = None
 
+# Change notifications that do not modify the graph (and so keep caches/ETags valid)
+NON_DATA_CHANGE_TYPES = {"node_selection", "gem_saved"}
+
+# Collections a reported change may write; only changes of these types can
+# keep the neighborhood cache (see notify_update)
+CHANGE_COLLECTIONS = {
+    "node_updated": {"nodes"},
+    "node_created": {"nodes"},
+    "node_deleted": {"nodes", "edges"},
+    "edge_created": {"edges"},
+    "edge_deleted": {"edges"},
+}
+
 class UpdateNotification(BaseModel):
     change_type: str
     affected_nodes: List[str] = []
     timestamp: Optional[str] = None
 
+class NeighborBatchRequest(BaseModel):
+    """Body of POST /neighbors/batch; filters mean the same as on GET /neighbors"""
+    seeds: List[str] = Field(..., min_length=1, max_length=1000)
+    depth: int = Field(1, ge=1, le=5)
+    fields: Optional[str] = None
+    edge_fields: Optional[str] = None
+    edge_types: Optional[str] = None
+    min_weight: Optional[float] = Field(None, ge=0)
+    max_nodes: Optional[int] = Field(None, ge=1, le=100000)
+    backend: Optional[str] = Field(None, pattern="^(aql|memory)$")
+
 # =========================================
 # ARANGODB GRAPH ENDPOINTS
 # =========================================
 @app.get("/")
-def root():
+async def root():
+    # Creating the client never touches the server, so ping it
+    connected = False
+    if db:
+        try:
+            await db.version()
+            connected = True
+        except Exception:
+            pass
     return {
         "service": "ProtoGraph Unified API",
         "status": "running",
         "database": ARANGO_DB,
         "ollama_model": OLLAMA_MODEL,
-        "connected": db is not None,
+        "connected": connected,
     }
 
 
+# Shapes served to the frontend, projected inside AQL so full documents
+# (descriptions, metadata, ...) never leave the database.
+NODE_FIELDS = {
+    "id": "{v}._id",
+    "label": "NOT_NULL({v}.label, {v}._key)",
+    "cluster": "{v}.cluster",
+    "type": "{v}.type",
+    "importance": "NOT_NULL({v}.importance, 0.5)",
+    "size": "NOT_NULL({v}.size, 40)",
+    "community": "{v}.community",
+}
+
+EDGE_FIELDS = {
+    "id": "{v}._id",
+    "source": "{v}._from",
+    "target": "{v}._to",
+    "type": "NOT_NULL({v}.type, 'relation')",
+    "weight": "NOT_NULL({v}.weight, 1.0)",
+}
+
+
+def parse_fields(fields: Optional[str], available: Dict[str, str]) -> Optional[List[str]]:
+    """
+    Parse a comma-separated `fields=` parameter against a field whitelist.
+    Returns None for the full shape; `id` is always included if available.
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}")
+    return (["id"] if "id" in available else []) + [f for f in available if f in requested and f != "id"]
+
+
+def aql_projection(available: Dict[str, str], var: str, fields: Optional[List[str]] = None) -> str:
+    """AQL object literal projecting `var` onto the selected fields"""
+    return "{" + ", ".join(
+        f'"{name}": {expr.format(v=var)}'
+        for name, expr in available.items()
+        if fields is None or name in fields
+    ) + "}"
+
+
+def node_projection(var: str, fields: Optional[List[str]] = None) -> str:
+    return aql_projection(NODE_FIELDS, var, fields)
+
+
+def edge_projection(var: str, fields: Optional[List[str]] = None) -> str:
+    return aql_projection(EDGE_FIELDS, var, fields)
+
+
+def select_fields(
+    items: List[Dict[str, Any]],
+    fields: Optional[List[str]],
+    keep: tuple = (),
+) -> List[Dict[str, Any]]:
+    """
+    Narrow already-shaped records (e.g. from the snapshot) to the selected
+    fields, plus any annotations listed in `keep` (e.g. "distance") they carry.
+    """
+    if fields is None:
+        return items
+    return [
+        {**{f: item[f] for f in fields}, **{k: item[k] for k in keep if k in item}}
+        for item in items
+    ]
+
+
+async def stream_graph_ndjson(node_fields: Optional[List[str]] = None, edge_fields: Optional[List[str]] = None):
+    """
+    Yield the graph as newline-delimited JSON, one record per line.
+    Cursors are consumed batch by batch so memory stays flat regardless
+    of graph size. The final line is an "end" record with the counts, so
+    clients can tell a complete stream from a truncated one.
+    """
+    counts = {"nodes": 0, "edges": 0}
+    try:
+        nodes_cursor = db.execute(
+            f"FOR node IN nodes RETURN {node_projection('node', node_fields)}", stream=True)
+        async for n in nodes_cursor:
+            yield json.dumps({"kind": "node", **n}) + "\n"
+            counts["nodes"] += 1
+
+        edges_cursor = db.execute(
+            f"FOR edge IN edges RETURN {edge_projection('edge', edge_fields)}", stream=True)
+        async for e in edges_cursor:
+            yield json.dumps({"kind": "edge", **e}) + "\n"
+            counts["edges"] += 1
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        yield json.dumps({"kind": "error", "detail": f"Failed to stream graph: {str(e)}"}) + "\n"
+        return
+
+    yield json.dumps({"kind": "end", **counts}) + "\n"
+
+
+# Paginated /graph walks the nodes collection first, then edges
+PAGE_COLLECTIONS = ["nodes", "edges"]
+
+
+def encode_page_cursor(collection: str, after_key: str) -> str:
+    """Opaque continuation token: the collection being paged and the last _key served"""
+    raw = json.dumps({"c": collection, "k": after_key}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_page_cursor(token: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        collection, after_key = data["c"], data["k"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if collection not in PAGE_COLLECTIONS or not isinstance(after_key, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return collection, after_key
+
+
+async def fetch_graph_page(
+    collection: str,
+    after_key: str,
+    limit: int,
+    node_fields: Optional[List[str]] = None,
+    edge_fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    One page of a collection in _key order (keyset pagination, so a page can
+    be retried with the same token and stays stable under concurrent inserts).
+    """
+    if collection == "nodes":
+        projection = node_projection("doc", node_fields)
+    else:
+        projection = edge_projection("doc", edge_fields)
+    query = f"""
+        FOR doc IN {collection}
+            FILTER doc._key > @after
+            SORT doc._key
+            LIMIT @limit
+            RETURN {{key: doc._key, doc: {projection}}}
+    """
+    # Fetch one extra document to learn whether another page exists
+    docs = await db.query(query, {"after": after_key, "limit": limit + 1})
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    if has_more:
+        next_cursor = encode_page_cursor(collection, docs[-1]["key"])
+    elif collection == "nodes":
+        next_cursor = encode_page_cursor("edges", "")
+    else:
+        next_cursor = None
+
+    records = [d["doc"] for d in docs]
+    if collection == "nodes":
+        page = {"nodes": records, "edges": []}
+    else:
+        page = {"nodes": [], "edges": records}
+    return {**page, "next_cursor": next_cursor}
+
+
+# Level-of-detail groupings: lod name -> node attribute collapsed into supernodes
+LOD_ATTRIBUTES = {"cluster": "cluster", "type": "type", "community": "community"}
+
+# Supernode label for nodes missing the grouping attribute. Its id uses "!"
+# instead of ":" so it cannot collide with a group that is really named this.
+UNASSIGNED_GROUP = "unassigned"
+
+
+def supernode_id(lod: str, group: Optional[str]) -> str:
+    if group is None:
+        return f"{lod}!{UNASSIGNED_GROUP}"
+    return f"{lod}:{group}"
+
+
+def resolve_lod(lod: str) -> str:
+    attribute = LOD_ATTRIBUTES.get(lod)
+    if attribute is None:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown lod '{lod}'. Available: {', '.join(LOD_ATTRIBUTES)}")
+    return attribute
+
+
+async def fetch_lod_graph(lod: str) -> Dict[str, Any]:
+    """
+    Collapse every group of nodes sharing `LOD_ATTRIBUTES[lod]` into one
+    supernode, and all edges between two groups into one weighted link.
+    Aggregation runs in AQL, so only the group-level result is transferred.
+    """
+    query = """
+        LET groups = (
+            FOR n IN nodes
+                COLLECT grp = n.@attr
+                AGGREGATE members = COUNT(1), importance = AVG(NOT_NULL(n.importance, 0.5))
+                RETURN {grp, members, importance}
+        )
+        LET links = (
+            FOR e IN edges
+                LET s = DOCUMENT(e._from).@attr
+                LET t = DOCUMENT(e._to).@attr
+                FILTER s != t
+                COLLECT source = s, target = t
+                AGGREGATE weight = SUM(NOT_NULL(e.weight, 1.0)), edgeCount = COUNT(1)
+                RETURN {source, target, weight, edgeCount}
+        )
+        RETURN {groups, links}
+    """
+    result = (await db.query(query, {"attr": LOD_ATTRIBUTES[lod]}))[0]
+
+    nodes = [
+        {
+            "id": supernode_id(lod, g["grp"]),
+            "label": UNASSIGNED_GROUP if g["grp"] is None else str(g["grp"]),
+            lod: g["grp"],
+            "importance": g["importance"],
+            # Grow with membership, but slowly enough that big groups stay on screen
+            "size": round(40 + 10 * math.log10(g["members"])),
+            "count": g["members"],
+            "supernode": True,
+        }
+        for g in result["groups"]
+    ]
+    edges = [
+        {
+            "id": f"{supernode_id(lod, link['source'])}->{supernode_id(lod, link['target'])}",
+            "source": supernode_id(lod, link["source"]),
+            "target": supernode_id(lod, link["target"]),
+            "type": "aggregate",
+            "weight": link["weight"],
+            "count": link["edgeCount"],
+        }
+        for link in result["links"]
+    ]
+    return {"lod": lod, "nodes": nodes, "edges": edges}
+
+
 @app.get("/graph")
-def get_graph():
-    """Return all nodes and edges from ArangoDB"""
+async def get_graph(
+    request: Request,
+    response: Response,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    edge_fields: Optional[str] = None,
+    lod: Optional[str] = None,
+):
+    """
+    Return all nodes and edges, served from the in-process snapshot.
+    format=ndjson streams straight from ArangoDB cursors, emitting
+    one node/edge record per line instead of a single JSON body.
+    limit/cursor switch to paginated mode: each page holds up to `limit`
+    nodes (then edges, once nodes are exhausted) plus a `next_cursor`
+    token to pass back; `next_cursor` is null after the last edge page.
+    fields/edge_fields narrow the node/edge shape, e.g. fields=cluster for a minimap.
+    The full graph is also available in columnar form by sending
+    `Accept: application/vnd.apache.arrow.stream` or `application/x-msgpack`
+    (see graph_codec for the layout).
+    JSON and columnar responses carry a revision-derived ETag; a matching
+    If-None-Match is answered with 304 without querying the collections.
+    lod=cluster|type|community returns an overview instead: one supernode per group
+    and aggregated inter-group links (expand one with /graph/supernode/...;
+    the bucket of nodes missing the attribute with ?group_null=true).
+    """
     if not db:
         raise HTTPException(status_code=500, detail="Database not connected")
 
+    node_fields = parse_fields(fields, NODE_FIELDS)
+    edge_field_list = parse_fields(edge_fields, EDGE_FIELDS)
+
+    paginated = limit is not None or cursor is not None
+    if lod is not None:
+        resolve_lod(lod)
+        if paginated or format == "ndjson":
+            raise HTTPException(status_code=400, detail="lod cannot be combined with limit/cursor or format=ndjson")
+    if format == "ndjson":
+        if paginated:
+            raise HTTPException(status_code=400, detail="limit/cursor cannot be combined with format=ndjson")
+        return StreamingResponse(
+            stream_graph_ndjson(node_fields, edge_field_list), media_type="application/x-ndjson")
+
+    # Columnar encodings apply to the full graph only
+    media_type = None
+    if not paginated and lod is None:
+        media_type = graph_codec.negotiate_format(request.headers.get("accept"))
+    if media_type and not graph_codec.is_available(media_type):
+        raise HTTPException(status_code=406, detail=f"{media_type} encoding is not installed on this server")
+
+    # Everything except the streaming format is determined by revision + parameters
+    variant = (sorted(request.query_params.multi_items()), media_type)
     try:
-        nodes_cursor = db.aql.execute("FOR node IN nodes RETURN node")
-        edges_cursor = db.aql.execute("FOR edge IN edges RETURN edge")
-
-        nodes = [
-            {
-                "id": n["_id"],
-                "label": n.get("label", n["_key"]),
-                "cluster": n.get("cluster"),
-                "type": n.get("type"),
-                "importance": n.get("importance", 0.5),
-                "size": n.get("size", 40),
-            }
-            for n in nodes_cursor
-        ]
-
-        edges = [
-            {
-                "id": e["_id"],
-                "source": e["_from"],
-                "target": e["_to"],
-                "type": e.get("type", "relation"),
-                "weight": e.get("weight", 1.0),
-            }
-            for e in edges_cursor
-        ]
+        etag = http_cache.make_etag(await graph_cache.revision(), "graph", variant)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read graph revision: {str(e)}")
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+
+    if lod is not None:
+        try:
+            overview = await fetch_lod_graph(lod)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to aggregate graph: {str(e)}")
+        http_cache.set_cache_headers(response, etag)
+        return overview
+
+    if paginated:
+        collection, after_key = decode_page_cursor(cursor) if cursor else ("nodes", "")
+        try:
+            page = await fetch_graph_page(
+                collection, after_key, limit or GRAPH_PAGE_SIZE, node_fields, edge_field_list)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch graph page: {str(e)}")
+        http_cache.set_cache_headers(response, etag)
+        return page
 
+    try:
+        snapshot = await graph_cache.get()
+        # Tag with the revision actually served, in case it moved on meanwhile
+        etag = http_cache.make_etag(snapshot.revision, "graph", variant)
+        nodes = select_fields(snapshot.nodes, node_fields)
+        edges = select_fields(snapshot.edges, edge_field_list)
+        if media_type:
+            encoded = Response(content=graph_codec.encode(media_type, nodes, edges), media_type=media_type)
+            http_cache.set_cache_headers(encoded, etag)
+            return encoded
+        http_cache.set_cache_headers(response, etag)
         return {"nodes": nodes, "edges": edges}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch graph: {str(e)}")
 
 
+@app.get("/graph/supernode/{lod}/{group}")
+async def expand_supernode(
+    lod: str,
+    group: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    edge_fields: Optional[str] = None,
+    group_null: bool = False,
+):
+    """
+    Expand one supernode from /graph?lod=...: its member nodes, the edges
+    between them, and its outside edges summarized per member and neighbouring
+    supernode, so the expanded group stays wired into the overview.
+    `group` is always taken literally; group_null=true expands the bucket of
+    nodes missing the attribute instead (the path group is then ignored).
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    attribute = resolve_lod(lod)
+    node_fields = parse_fields(fields, NODE_FIELDS)
+    edge_field_list = parse_fields(edge_fields, EDGE_FIELDS)
+
+    try:
+        etag = http_cache.make_etag(
+            await graph_cache.revision(), "supernode", lod, group, sorted(request.query_params.multi_items()))
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag)
+
+        query = f"""
+            LET members = (FOR n IN nodes FILTER n.@attr == @group RETURN n)
+            LET member_ids = members[*]._id
+            LET internal = (
+                FOR n IN members
+                    FOR e IN edges
+                        FILTER e._from == n._id AND e._to IN member_ids
+                        RETURN {edge_projection('e', edge_field_list)}
+            )
+            LET boundary = (
+                FOR n IN members
+                    FOR v, e IN 1..1 ANY n._id edges
+                        FILTER v.@attr != @group
+                        COLLECT member = n._id, other = v.@attr, outbound = e._from == n._id
+                        AGGREGATE weight = SUM(NOT_NULL(e.weight, 1.0)), edgeCount = COUNT(1)
+                        RETURN {{member, other, outbound, weight, edgeCount}}
+            )
+            RETURN {{
+                nodes: (FOR n IN members RETURN {node_projection('n', node_fields)}),
+                internal,
+                boundary
+            }}
+        """
+        group_value = None if group_null else group
+        result = (await db.query(query, {"attr": attribute, "group": group_value}))[0]
+
+        boundary = []
+        for link in result["boundary"]:
+            other = supernode_id(lod, link["other"])
+            source, target = (link["member"], other) if link["outbound"] else (other, link["member"])
+            boundary.append({
+                "id": f"{source}->{target}",
+                "source": source,
+                "target": target,
+                "type": "aggregate",
+                "weight": link["weight"],
+                "count": link["edgeCount"],
+            })
+
+        http_cache.set_cache_headers(response, etag)
+        return {
+            "lod": lod,
+            "supernode": supernode_id(lod, group_value),
+            "nodes": result["nodes"],
+            "edges": result["internal"],
+            "boundary_edges": boundary,
+            "count": len(result["nodes"]),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to expand supernode: {str(e)}")
+
+
+def parse_edge_types(edge_types: Optional[str]) -> Optional[List[Optional[str]]]:
+    """Comma-separated edge type filter; edges stored without a type count as 'relation'"""
+    if not edge_types:
+        return None
+    types: List[Optional[str]] = [t.strip() for t in edge_types.split(",") if t.strip()]
+    if "relation" in types:
+        types.append(None)
+    return types
+
+
+def traversal_filters(
+    bind_vars: Dict[str, Any],
+    edge_types: Optional[List[Optional[str]]] = None,
+    min_weight: Optional[float] = None,
+):
+    """
+    AQL filter lines for a neighborhood query: (per-path filters for the
+    traversal, per-edge filters for the edges among reached nodes).
+    Adds the bind variables they use to `bind_vars`.
+    """
+    path_filters, edge_filters = [], []
+    if edge_types is not None:
+        path_filters.append("FILTER p.edges[*].type ALL IN @edge_types")
+        edge_filters.append("FILTER e.type IN @edge_types")
+        bind_vars["edge_types"] = edge_types
+    if min_weight is not None:
+        # Same default weight as EDGE_FIELDS, the ranking and the adjacency index
+        path_filters.append("FILTER p.edges[* RETURN NOT_NULL(CURRENT.weight, 1.0)] ALL >= @min_weight")
+        edge_filters.append("FILTER NOT_NULL(e.weight, 1.0) >= @min_weight")
+        bind_vars["min_weight"] = min_weight
+    return " ".join(path_filters), " ".join(edge_filters)
+
+
+async def fetch_neighborhood(
+    key: str,
+    depth: int,
+    edge_types: Optional[List[Optional[str]]] = None,
+    min_weight: Optional[float] = None,
+    max_nodes: Optional[int] = None,
+    node_fields: Optional[List[str]] = None,
+    edge_fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Center node, reachable nodes and the edges among them in one AQL round trip.
+
+    The traversal runs breadth-first with global vertex uniqueness, so each
+    vertex is visited once at its minimum distance instead of once per path.
+    Edge filters are written as conditions on p.edges[*], which the
+    optimizer applies per edge during traversal: rejected edges are never
+    followed. (A PRUNE would still emit the vertex behind a rejected edge
+    and, under global uniqueness, hide it from other paths.)
+    Edges without a stored weight count as weight 1.0 for min_weight.
+    max_nodes keeps the nearest nodes first (BFS order).
+    """
+    bind_vars: Dict[str, Any] = {"key": key, "depth": depth, "graph": ARANGO_GRAPH}
+    path_filters, edge_filters = traversal_filters(bind_vars, edge_types, min_weight)
+    limit, keep = "", "found"
+    if max_nodes is not None:
+        # One extra row tells us whether the result was cut off
+        limit, keep = "LIMIT @probe_limit", "SLICE(found, 0, @max_nodes)"
+        bind_vars.update(probe_limit=max_nodes + 1, max_nodes=max_nodes)
+
+    query = f"""
+        LET start = CONCAT('nodes/', @key)
+        LET center = DOCUMENT(start)
+        LET found = (
+            FOR v, e, p IN 1..@depth ANY start GRAPH @graph
+                OPTIONS {{uniqueVertices: "global", order: "bfs"}}
+                {path_filters}
+                {limit}
+                RETURN MERGE({node_projection('v', node_fields)}, {{distance: LENGTH(p.edges)}})
+        )
+        LET hits = {keep}
+        LET reached = APPEND([start], hits[*].id)
+        LET links = (
+            FOR id IN reached
+                FOR e IN edges
+                    FILTER e._from == id AND e._to IN reached
+                    {edge_filters}
+                    RETURN {edge_projection('e', edge_fields)}
+        )
+        RETURN {{
+            center: center == null ? null : {node_projection('center', node_fields)},
+            nodes: hits,
+            edges: links,
+            truncated: LENGTH(found) > LENGTH(hits)
+        }}
+    """
+    result = (await db.query(query, bind_vars))[0]
+
+    nodes = ([result["center"]] if result["center"] else []) + result["nodes"]
+    return {"nodes": nodes, "edges": result["edges"], "truncated": result["truncated"]}
+
+
+async def fetch_ranked_neighborhood(
+    key: str,
+    depth: int,
+    edge_types: Optional[List[Optional[str]]] = None,
+    min_weight: Optional[float] = None,
+    per_node_limit: Optional[int] = None,
+    per_node_offset: int = 0,
+    total_limit: Optional[int] = None,
+    node_fields: Optional[List[str]] = None,
+    edge_fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Neighborhood with bounded fan-out, in one AQL round trip.
+
+    Each BFS level is unrolled into its own subquery: every frontier node
+    ranks its unvisited neighbours by edge weight, then neighbour importance,
+    then id, and keeps per_node_limit of them after skipping per_node_offset.
+    The level is ranked the same way again and cut so that at most
+    total_limit nodes (besides the center) are returned. Expanded nodes with
+    neighbours left out carry `more`, the number of them not in the result.
+    """
+    bind_vars: Dict[str, Any] = {"key": key, "graph": ARANGO_GRAPH, "per_node_offset": per_node_offset}
+    _, edge_filters = traversal_filters(bind_vars, edge_types, min_weight)
+    keep = "SLICE(cand, @per_node_offset)"
+    if per_node_limit is not None:
+        keep = "SLICE(cand, @per_node_offset, @per_node_limit)"
+        bind_vars["per_node_limit"] = per_node_limit
+    if total_limit is not None:
+        bind_vars["total_limit"] = total_limit
+
+    levels = []
+    for i in range(1, depth + 1):
+        cut = f"SLICE(ranked{i}, 0, MAX([0, @total_limit + 1 - LENGTH(seen{i - 1})]))" if total_limit else f"ranked{i}"
+        levels.append(f"""
+        LET x{i} = (
+            FOR id IN l{i - 1}
+                LET cand = (
+                    FOR v, e IN 1..1 ANY id GRAPH @graph
+                        FILTER v._id NOT IN seen{i - 1}
+                        {edge_filters}
+                        COLLECT vid = v._id
+                        AGGREGATE w = MAX(NOT_NULL(e.weight, 1.0)), imp = MAX(NOT_NULL(v.importance, 0.5))
+                        SORT w DESC, imp DESC, vid
+                        RETURN {{id: vid, w, imp}}
+                )
+                RETURN {{parent: id, candidates: cand[*].id, kept: {keep}}}
+        )
+        LET ranked{i} = (
+            FOR k IN FLATTEN(x{i}[*].kept)
+                COLLECT id = k.id AGGREGATE w = MAX(k.w), imp = MAX(k.imp)
+                SORT w DESC, imp DESC, id
+                RETURN id
+        )
+        LET l{i} = {cut}
+        LET seen{i} = APPEND(seen{i - 1}, l{i})""")
+    expanded = ", ".join(f"x{i}" for i in range(1, depth + 1))
+    found = ", ".join(f"{{ids: l{i}, distance: {i}}}" for i in range(1, depth + 1))
+    cuts = ", ".join(f"LENGTH(ranked{i}) - LENGTH(l{i})" for i in range(1, depth + 1))
+
+    query = f"""
+        LET start = CONCAT('nodes/', @key)
+        LET center = DOCUMENT(start)
+        LET l0 = center == null ? [] : [start]
+        LET seen0 = l0
+        {''.join(levels)}
+        LET reached = seen{depth}
+        LET markers = (
+            FOR x IN FLATTEN([{expanded}])
+                LET hidden = LENGTH(x.candidates) - @per_node_offset - LENGTH(INTERSECTION(x.candidates, reached))
+                FILTER hidden > 0
+                RETURN {{parent: x.parent, hidden}}
+        )
+        LET more = ZIP(markers[*].parent, markers[*].hidden)
+        LET links = (
+            FOR id IN reached
+                FOR e IN edges
+                    FILTER e._from == id AND e._to IN reached
+                    {edge_filters}
+                    RETURN {edge_projection('e', edge_fields)}
+        )
+        RETURN {{
+            center: center == null ? null : MERGE(
+                {node_projection('center', node_fields)}, HAS(more, start) ? {{more: more[start]}} : {{}}),
+            nodes: (
+                FOR level IN [{found}]
+                    FOR id IN level.ids
+                        LET v = DOCUMENT(id)
+                        RETURN MERGE(
+                            {node_projection('v', node_fields)},
+                            {{distance: level.distance}},
+                            HAS(more, id) ? {{more: more[id]}} : {{}})
+            ),
+            edges: links,
+            truncated: LENGTH(markers) > 0 OR SUM([{cuts}]) > 0
+        }}
+    """
+    result = (await db.query(query, bind_vars))[0]
+
+    nodes = ([result["center"]] if result["center"] else []) + result["nodes"]
+    return {"nodes": nodes, "edges": result["edges"], "truncated": result["truncated"]}
+
+
 @app.get("/neighbors/{node_key}")
-def get_neighbors(node_key: str, depth: int = Query(1, ge=1, le=5)):
-    """Fetch connected nodes within N hops."""
+async def get_neighbors(
+    node_key: str,
+    depth: int = Query(1, ge=1, le=5),
+    fields: Optional[str] = None,
+    edge_fields: Optional[str] = None,
+    edge_types: Optional[str] = None,
+    min_weight: Optional[float] = Query(None, ge=0),
+    max_nodes: Optional[int] = Query(None, ge=1, le=100000),
+    per_node_limit: Optional[int] = Query(None, ge=1, le=10000),
+    per_node_offset: int = Query(0, ge=0),
+    total_limit: Optional[int] = Query(None, ge=1, le=100000),
+    backend: Optional[str] = Query(None, pattern="^(aql|memory)$"),
+):
+    """
+    Fetch connected nodes within N hops.
+    edge_types (comma-separated), min_weight and max_nodes restrict the
+    traversal; `truncated` is true when max_nodes cut the result short.
+    per_node_limit / total_limit bound the fan-out instead, keeping the
+    strongest edges (by weight, then neighbour importance) at each level;
+    expanded nodes with neighbours left out carry `more` (the "+N more"
+    count), and per_node_offset pages through them.
+    backend=memory|aql overrides the ADJACENCY_INDEX setting for one call.
+    Results are cached per graph revision (see neighbor_cache).
+    """
     if not db:
         raise HTTPException(status_code=500, detail="Database not connected")
 
+    node_fields = parse_fields(fields, NODE_FIELDS)
+    edge_field_list = parse_fields(edge_fields, EDGE_FIELDS)
+    edge_type_list = parse_edge_types(edge_types)
+    ranked = per_node_limit is not None or per_node_offset > 0 or total_limit is not None
+    if ranked and max_nodes is not None:
+        raise HTTPException(
+            status_code=400, detail="max_nodes cannot be combined with per_node_limit/total_limit; use total_limit")
+    use_index = backend == "memory" or (backend is None and ADJACENCY_INDEX)
+    if use_index and not adjacency.is_available():
+        raise HTTPException(status_code=503, detail="Adjacency index requires NumPy")
+
     try:
         clean_key = node_key.replace("nodes/", "")
-        query = """
-            FOR v, e, p IN 1..@depth ANY CONCAT('nodes/', @key) GRAPH @graph
-                RETURN DISTINCT { node: v, edge: e, distance: LENGTH(p.edges) }
-        """
-        results = list(db.aql.execute(query, bind_vars={
-            "key": clean_key,
+        cache_key = (
+            clean_key, depth,
+            tuple(edge_type_list) if edge_type_list is not None else None,
+            min_weight, max_nodes, per_node_limit, per_node_offset, total_limit,
+            tuple(node_fields) if node_fields is not None else None,
+            tuple(edge_field_list) if edge_field_list is not None else None,
+            use_index,
+        )
+        revision = await graph_cache.revision()
+        cached = neighbor_cache.get(cache_key, revision)
+        if cached is not None:
+            return cached
+        generation = neighbor_cache.generation
+
+        if use_index and ranked:
+            index = await get_adjacency()
+            neighborhood = index.ranked_neighborhood(
+                f"nodes/{clean_key}",
+                depth,
+                edge_types=edge_type_list,
+                min_weight=min_weight,
+                per_node_limit=per_node_limit,
+                per_node_offset=per_node_offset,
+                total_limit=total_limit,
+            )
+            neighborhood["nodes"] = select_fields(neighborhood["nodes"], node_fields, keep=("distance", "more"))
+            neighborhood["edges"] = select_fields(neighborhood["edges"], edge_field_list)
+        elif use_index:
+            index = await get_adjacency()
+            neighborhood = index.neighborhood(
+                f"nodes/{clean_key}",
+                depth,
+                edge_types=edge_type_list,
+                min_weight=min_weight,
+                max_nodes=max_nodes,
+            )
+            neighborhood["nodes"] = select_fields(neighborhood["nodes"], node_fields, keep=("distance",))
+            neighborhood["edges"] = select_fields(neighborhood["edges"], edge_field_list)
+        elif ranked:
+            neighborhood = await fetch_ranked_neighborhood(
+                clean_key,
+                depth,
+                edge_types=edge_type_list,
+                min_weight=min_weight,
+                per_node_limit=per_node_limit,
+                per_node_offset=per_node_offset,
+                total_limit=total_limit,
+                node_fields=node_fields,
+                edge_fields=edge_field_list,
+            )
+        else:
+            neighborhood = await fetch_neighborhood(
+                clean_key,
+                depth,
+                edge_types=edge_type_list,
+                min_weight=min_weight,
+                max_nodes=max_nodes,
+                node_fields=node_fields,
+                edge_fields=edge_field_list,
+            )
+        result = {
+            "center": clean_key,
             "depth": depth,
-            "graph": ARANGO_GRAPH}))
-
-        nodes, edges, seen_nodes, seen_edges = [], [], set(), set()
-
-        # Add center node
-        center = list(db.aql.execute("RETURN DOCUMENT(CONCAT('nodes/', @key))", bind_vars={"key": clean_key}))
-        if center and center[0]:
-            c = center[0]
-            nodes.append({
-                "id": c["_id"],
-                "label": c.get("label", c["_key"]),
-                "cluster": c.get("cluster"),
-                "type": c.get("type"),
-                "importance": c.get("importance", 0.5),
-                "size": c.get("size", 40)
-            })
-            seen_nodes.add(c["_id"])
-
-        # Add neighbors
-        for item in results:
-            v, e = item["node"], item["edge"]
-            if v["_id"] not in seen_nodes:
-                nodes.append({
-                    "id": v["_id"],
-                    "label": v.get("label", v["_key"]),
-                    "cluster": v.get("cluster"),
-                    "type": v.get("type"),
-                    "importance": v.get("importance", 0.5),
-                    "size": v.get("size", 40),
-                    "distance": item["distance"],
-                })
-                seen_nodes.add(v["_id"])
-            if e and e["_id"] not in seen_edges:
-                edges.append({
-                    "id": e["_id"],
-                    "source": e["_from"],
-                    "target": e["_to"],
-                    "type": e.get("type", "relation"),
-                    "weight": e.get("weight", 1.0),
-                })
-                seen_edges.add(e["_id"])
-
-        return {"center": clean_key, "depth": depth, "nodes": nodes, "edges": edges, "count": len(nodes)}
+            **neighborhood,
+            "count": len(neighborhood["nodes"]),
+        }
+        neighbor_cache.put(cache_key, revision, result, generation)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch neighbors: {str(e)}")
+
+
+async def fetch_neighborhoods(
+    keys: List[str],
+    depth: int,
+    edge_types: Optional[List[Optional[str]]] = None,
+    min_weight: Optional[float] = None,
+    max_nodes: Optional[int] = None,
+    node_fields: Optional[List[str]] = None,
+    edge_fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Merged neighborhood of several seed nodes in one AQL round trip.
+
+    Runs one BFS traversal per seed inside a single query and collects the
+    hits by vertex: each node keeps its minimum distance to any seed and the
+    sorted ids of all seeds that reach it within `depth` (seeds themselves
+    are at distance 0). Nodes reached from several seeds, and the edges among
+    them, appear once. max_nodes keeps the nearest nodes first.
+    """
+    bind_vars: Dict[str, Any] = {"keys": keys, "depth": depth, "graph": ARANGO_GRAPH}
+    path_filters, edge_filters = traversal_filters(bind_vars, edge_types, min_weight)
+    keep = "merged"
+    if max_nodes is not None:
+        keep = "SLICE(merged, 0, @max_nodes)"
+        bind_vars["max_nodes"] = max_nodes
+
+    query = f"""
+        LET seeds = (
+            FOR key IN @keys
+                LET doc = DOCUMENT(CONCAT('nodes/', key))
+                FILTER doc != null
+                RETURN doc
+        )
+        LET hits = (
+            FOR s IN seeds
+                FOR v, e, p IN 1..@depth ANY s GRAPH @graph
+                    OPTIONS {{uniqueVertices: "global", order: "bfs"}}
+                    {path_filters}
+                    RETURN {{id: v._id, seed: s._id, distance: LENGTH(p.edges)}}
+        )
+        LET merged = (
+            FOR hit IN APPEND(seeds[* RETURN {{id: CURRENT._id, seed: CURRENT._id, distance: 0}}], hits)
+                COLLECT id = hit.id
+                AGGREGATE distance = MIN(hit.distance), reached_by = SORTED_UNIQUE(hit.seed)
+                SORT distance, id
+                RETURN {{id, distance, reached_by}}
+        )
+        LET kept = {keep}
+        LET reached = kept[*].id
+        LET links = (
+            FOR id IN reached
+                FOR e IN edges
+                    FILTER e._from == id AND e._to IN reached
+                    {edge_filters}
+                    RETURN {edge_projection('e', edge_fields)}
+        )
+        RETURN {{
+            nodes: (
+                FOR m IN kept
+                    LET v = DOCUMENT(m.id)
+                    RETURN MERGE({node_projection('v', node_fields)}, {{distance: m.distance, seeds: m.reached_by}})
+            ),
+            edges: links,
+            missing: MINUS(@keys, seeds[*]._key),
+            truncated: LENGTH(merged) > LENGTH(kept)
+        }}
+    """
+    result = (await db.query(query, bind_vars))[0]
+    result["missing"] = [f"nodes/{key}" for key in keys if key in result["missing"]]
+    return result
+
+
+@app.post("/neighbors/batch")
+async def get_neighbors_batch(body: NeighborBatchRequest):
+    """
+    Merged neighborhood of several seed nodes within N hops, e.g. for
+    expanding a whole selection at once. Each node carries `distance` (to the
+    nearest seed) and `seeds` (the seeds that reach it); seeds that do not
+    exist are listed in `missing`.
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    node_fields = parse_fields(body.fields, NODE_FIELDS)
+    edge_field_list = parse_fields(body.edge_fields, EDGE_FIELDS)
+    use_index = body.backend == "memory" or (body.backend is None and ADJACENCY_INDEX)
+    if use_index and not adjacency.is_available():
+        raise HTTPException(status_code=503, detail="Adjacency index requires NumPy")
+
+    try:
+        keys = list(dict.fromkeys(seed.replace("nodes/", "") for seed in body.seeds))
+        if use_index:
+            index = await get_adjacency()
+            neighborhood = index.multi_neighborhood(
+                [f"nodes/{key}" for key in keys],
+                body.depth,
+                edge_types=parse_edge_types(body.edge_types),
+                min_weight=body.min_weight,
+                max_nodes=body.max_nodes,
+            )
+            neighborhood["nodes"] = select_fields(neighborhood["nodes"], node_fields, keep=("distance", "seeds"))
+            neighborhood["edges"] = select_fields(neighborhood["edges"], edge_field_list)
+        else:
+            neighborhood = await fetch_neighborhoods(
+                keys,
+                body.depth,
+                edge_types=parse_edge_types(body.edge_types),
+                min_weight=body.min_weight,
+                max_nodes=body.max_nodes,
+                node_fields=node_fields,
+                edge_fields=edge_field_list,
+            )
+        return {
+            "seeds": keys,
+            "depth": body.depth,
+            **neighborhood,
+            "count": len(neighborhood["nodes"]),
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch neighbors: {str(e)}")
 
 
+# errorNum of a query cancelled by its maxRuntime
+ARANGO_QUERY_KILLED = 1500
+
+
+async def fetch_paths(
+    source: str,
+    target: str,
+    k: int,
+    weighted: bool,
+    max_depth: int,
+    node_fields: Optional[List[str]] = None,
+    edge_fields: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Up to k shortest paths between two nodes, cheapest first, in one AQL
+    round trip. With `weighted` each edge costs its weight (1 when missing),
+    otherwise every hop costs 1. Of those k, paths of more than max_depth
+    hops are dropped: unweighted paths come out by length, so this is exact,
+    but weighted searches may return fewer than k. (Filtering before the
+    LIMIT would keep enumerating ever longer paths until the time budget
+    runs out whenever fewer than k fit.) The query is cancelled by the
+    server after PATH_TIME_BUDGET seconds.
+    """
+    bind_vars: Dict[str, Any] = {
+        "source": source, "target": target, "graph": ARANGO_GRAPH, "k": k, "max_depth": max_depth}
+    options = 'OPTIONS {weightAttribute: "weight", defaultWeight: 1}' if weighted else ""
+
+    query = f"""
+        FOR p IN ANY K_SHORTEST_PATHS CONCAT('nodes/', @source) TO CONCAT('nodes/', @target) GRAPH @graph
+            {options}
+            LIMIT @k
+            FILTER LENGTH(p.edges) <= @max_depth
+            RETURN {{
+                nodes: p.vertices[* RETURN {node_projection('CURRENT', node_fields)}],
+                edges: p.edges[* RETURN {edge_projection('CURRENT', edge_fields)}],
+                cost: p.weight,
+                length: LENGTH(p.edges)
+            }}
+    """
+    return await db.query(query, bind_vars, options={"maxRuntime": PATH_TIME_BUDGET})
+
+
+@app.get("/path")
+async def get_paths(
+    source: str = Query(..., alias="from"),
+    target: str = Query(..., alias="to"),
+    k: int = Query(1, ge=1, le=20),
+    weighted: bool = False,
+    max_depth: int = Query(10, ge=1, le=50),
+    fields: Optional[str] = None,
+    edge_fields: Optional[str] = None,
+    backend: Optional[str] = Query(None, pattern="^(aql|memory)$"),
+):
+    """
+    Up to k shortest paths between two nodes, e.g. to see how one part of
+    the graph depends on another without expanding it hop by hop.
+    weighted=true uses edge weight as the cost of a hop; max_depth then
+    drops long paths from the k cheapest, so fewer than k may be returned.
+    `paths` lists each
+    path as node and edge ids with its cost and length; `nodes` and `edges`
+    hold every node and edge on any path once, in the /graph shape.
+    Searches running longer than PATH_TIME_BUDGET seconds fail with 504.
+    backend=memory|aql overrides the ADJACENCY_INDEX setting for one call.
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    node_fields = parse_fields(fields, NODE_FIELDS)
+    edge_field_list = parse_fields(edge_fields, EDGE_FIELDS)
+    use_index = backend == "memory" or (backend is None and ADJACENCY_INDEX)
+    if use_index and not adjacency.is_available():
+        raise HTTPException(status_code=503, detail="Adjacency index requires NumPy")
+
+    source, target = source.replace("nodes/", ""), target.replace("nodes/", "")
+    try:
+        if use_index:
+            index = await get_adjacency()
+            found = await asyncio.to_thread(
+                index.k_shortest_paths,
+                f"nodes/{source}",
+                f"nodes/{target}",
+                k,
+                weighted=weighted,
+                max_depth=max_depth,
+                budget=PATH_TIME_BUDGET,
+            )
+            for path in found:
+                path["nodes"] = select_fields(path["nodes"], node_fields)
+                path["edges"] = select_fields(path["edges"], edge_field_list)
+        else:
+            found = await fetch_paths(
+                source, target, k, weighted, max_depth, node_fields=node_fields, edge_fields=edge_field_list)
+    except PathBudgetExceeded:
+        raise HTTPException(status_code=504, detail="Path search exceeded its time budget")
+    except ArangoError as e:
+        if e.error_num == ARANGO_QUERY_KILLED:
+            raise HTTPException(status_code=504, detail="Path search exceeded its time budget")
+        raise HTTPException(status_code=500, detail=f"Failed to find paths: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to find paths: {str(e)}")
+
+    nodes: Dict[str, Dict[str, Any]] = {}
+    edges: Dict[str, Dict[str, Any]] = {}
+    paths = []
+    for path in found:
+        for node in path["nodes"]:
+            nodes.setdefault(node["id"], node)
+        for edge in path["edges"]:
+            edges.setdefault(edge["id"], edge)
+        paths.append({
+            "nodes": [node["id"] for node in path["nodes"]],
+            "edges": [edge["id"] for edge in path["edges"]],
+            "cost": path["cost"],
+            "length": path["length"],
+        })
+    return {
+        "from": source,
+        "to": target,
+        "weighted": weighted,
+        "paths": paths,
+        "nodes": list(nodes.values()),
+        "edges": list(edges.values()),
+        "count": len(paths),
+    }
+
+
+@app.get("/stats/neighbor-cache")
+async def get_neighbor_cache_stats():
+    """Hit/miss counters and size of the /neighbors result cache"""
+    return neighbor_cache.stats()
+
+
 @app.get("/stats")
-def get_stats():
-    """Graph statistics"""
+async def get_stats(request: Request, response: Response):
+    """
+    Graph statistics from the materialized counters (see graph_stats): node,
+    edge, cluster and type counts plus degree min/max/mean. `stale` is true
+    while a full recompute is pending (`error` says why if it failed).
+    """
     if not db:
         raise HTTPException(status_code=500, detail="Database not connected")
 
     try:
-        node_count = list(db.aql.execute("RETURN LENGTH(nodes)"))[0]
-        edge_count = list(db.aql.execute("RETURN LENGTH(edges)"))[0]
-        cluster_query = """
-            FOR node IN nodes
-                COLLECT cluster = node.cluster WITH COUNT INTO count
-                RETURN {cluster: cluster, count: count}
-        """
-        clusters = list(db.aql.execute(cluster_query))
-        return {"total_nodes": node_count, "total_edges": edge_count, "clusters": clusters}
+        await graph_stats.ensure_ready()
+        etag = http_cache.make_etag(
+            f"{graph_stats.computed_at}:{graph_stats.version}", "stats", graph_stats.stale, graph_stats.error)
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag)
+        http_cache.set_cache_headers(response, etag)
+        return graph_stats.summary()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch stats: {str(e)}")
 
 
+@app.post("/stats/recompute")
+async def recompute_stats():
+    """Rebuild the /stats counters from a full scan"""
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    try:
+        await graph_stats.recompute()
+        return graph_stats.summary()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to recompute stats: {str(e)}")
+
+
+@app.get("/analytics/centrality")
+async def get_centrality(
+    metric: str = Query("pagerank", pattern="^(pagerank|degree|betweenness|importance)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cluster: Optional[str] = None,
+):
+    """
+    Nodes ranked by a centrality metric from the latest run (see
+    centrality), with all metrics per node and the run's status and step
+    timings. Starts a run in the background if none has been made yet;
+    that run leaves the node documents alone (POST writes results back).
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    if not centrality.is_available():
+        raise HTTPException(status_code=503, detail="Centrality requires NumPy and SciPy")
+
+    if centrality_job.result is None and not centrality_job.running:
+        centrality_job.schedule(write=False)
+    return {
+        **centrality_job.status(),
+        "metric": metric,
+        "limit": limit,
+        "offset": offset,
+        **centrality_job.top(metric, limit, offset, cluster),
+    }
+
+
+@app.post("/analytics/centrality")
+async def run_centrality(
+    samples: Optional[int] = Query(None, ge=1, description="betweenness sources (default: exact on small graphs)"),
+    write: bool = Query(True, description="store pagerank/degree/betweenness/importance on the nodes"),
+    wait: bool = Query(False, description="respond when the run has finished"),
+):
+    """
+    Recompute centrality over the current graph in the background. Joins
+    the run in progress if it covers this request (same samples, writing if
+    asked to), otherwise starts once that run has finished. With write (the default) the results are
+    stored on the node documents, replacing `importance`, and the coupling
+    service is notified (COUPLING_NOTIFY_URL).
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    if not centrality.is_available():
+        raise HTTPException(status_code=503, detail="Centrality requires NumPy and SciPy")
+
+    task = centrality_job.schedule(samples, write)
+    if wait:
+        try:
+            await asyncio.shield(task)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to compute centrality: {str(e)}")
+    return centrality_job.status()
+
+
+@app.get("/analytics/communities")
+async def get_communities(limit: int = Query(50, ge=1, le=1000)):
+    """
+    Status of the community worker (see communities) and the largest
+    detected communities. Nodes carry their label as `community`; group by
+    it with /graph?lod=community.
+    """
+    if not communities.is_available():
+        raise HTTPException(status_code=503, detail="Community detection requires NumPy and SciPy")
+    return {"enabled": COMMUNITY_DETECTION, **community_worker.summary(limit)}
+
+
+@app.post("/analytics/communities/recompute")
+async def recompute_communities():
+    """Queue community detection over the whole graph (labels are kept where communities persist)"""
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    if not (COMMUNITY_DETECTION and communities.is_available()):
+        raise HTTPException(status_code=503, detail="Community detection is disabled or SciPy is not installed")
+    community_worker.request_full()
+    return {"enabled": COMMUNITY_DETECTION, **community_worker.summary()}
+
+
+# =========================================
+# BULK EXPORT
+# =========================================
+# Columns of /export/coupling.*: undirected team pairs as in /analytics/team-coupling,
+# with `weight` on the 0-100 scale and `score` the raw sum
+COUPLING_EXPORT_FIELDS = {name: name for name in ("source", "target", "weight", "score", "count")}
+
+
+def split_values(value: Optional[str]) -> Optional[List[str]]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def export_query(table: str, columns: List[str], clusters: Optional[List[str]], types: Optional[List[str]]):
+    """AQL and bind variables streaming the rows of /export/{table}"""
+    bind: Dict[str, Any] = {}
+    if clusters:
+        bind["clusters"] = clusters
+    if types:
+        bind["types"] = types
+    if table == "nodes":
+        filters = "".join([
+            "FILTER n.cluster IN @clusters " if clusters else "",
+            "FILTER n.type IN @types " if types else "",
+        ])
+        return f"FOR n IN nodes {filters}RETURN {node_projection('n', columns)}", bind
+
+    type_filter = "FILTER NOT_NULL(e.type, 'relation') IN @types " if types else ""
+    if not clusters:
+        return f"FOR e IN edges {type_filter}RETURN {edge_projection('e', columns)}", bind
+    # Edges with at least one endpoint in the clusters, found through the
+    # cluster and edge indexes. Each edge is emitted once: from its source if
+    # that is in the clusters, else from its target (self loops included)
+    return f"""
+        FOR n IN nodes
+            FILTER n.cluster IN @clusters
+            FOR e IN UNION(
+                (FOR e IN edges FILTER e._from == n._id RETURN e),
+                (FOR e IN edges FILTER e._to == n._id AND DOCUMENT(e._from).cluster NOT IN @clusters RETURN e)
+            )
+                {type_filter}
+                RETURN {edge_projection('e', columns)}
+    """, bind
+
+
+async def coupling_export_rows(clusters: Optional[List[str]]):
+    """Team pairs from the AQL coupling aggregation (teams x teams rows, so small enough to hold)"""
+    rows = await db.query(COUPLING_QUERY, {"weight": DEFAULT_WEIGHT, "importance": DEFAULT_IMPORTANCE})
+    matrix = CouplingMatrix.from_pairs(rows)
+    wanted = set(clusters) if clusters else None
+
+    async def generate():
+        for source, target, weight, count in matrix.pairs():
+            if wanted is None or source in wanted or target in wanted:
+                yield {"source": source, "target": target, "weight": weight,
+                       "score": matrix.scores[(source, target)], "count": count}
+    return generate()
+
+
+async def primed(rows):
+    """Fetch the first row before the response starts, so query errors can still become a 500"""
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def generate():
+        if first is None:
+            return
+        yield first
+        async for row in rows:
+            yield row
+    return generate()
+
+
+@app.get("/export/{table}.{fmt}")
+async def export_table(
+    table: str,
+    fmt: str,
+    columns: Optional[str] = Query(None, description="Comma-separated columns (default: all)"),
+    cluster: Optional[str] = Query(None, description="Comma-separated clusters to keep"),
+    type: Optional[str] = Query(None, description="Comma-separated node/edge types to keep"),
+):
+    """
+    Bulk table export for BI tools: nodes, edges or team coupling as CSV or
+    Parquet, e.g. /export/nodes.parquet?columns=label,cluster&cluster=range.
+    Node and edge rows stream straight from ArangoDB cursors and are
+    written out EXPORT_CHUNK_ROWS at a time (see table_export), so the
+    table is never held in memory. For edges, `cluster` keeps edges with at
+    least one endpoint in those clusters; for coupling, pairs involving one.
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    available = {"nodes": NODE_FIELDS, "edges": EDGE_FIELDS, "coupling": COUPLING_EXPORT_FIELDS}.get(table)
+    if available is None:
+        raise HTTPException(status_code=404, detail=f"Unknown table '{table}'. Available: nodes, edges, coupling")
+    if fmt not in table_export.FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown format '{fmt}'. Available: {', '.join(table_export.FORMATS)}")
+    if not table_export.is_available(fmt):
+        raise HTTPException(status_code=406, detail=f"{fmt} export is not installed on this server (needs pyarrow)")
+    if table == "coupling" and type:
+        raise HTTPException(status_code=400, detail="`type` does not apply to coupling")
+
+    selected = parse_fields(columns, available) or list(available)
+    clusters, types = split_values(cluster), split_values(type)
+    try:
+        if table == "coupling":
+            rows = await coupling_export_rows(clusters)
+        else:
+            query, bind = export_query(table, selected, clusters, types)
+            rows = await primed(db.execute(query, bind, stream=True))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export {table}: {str(e)}")
+
+    return StreamingResponse(
+        table_export.stream(fmt, rows, selected, EXPORT_CHUNK_ROWS),
+        media_type=table_export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
+
+
+# Default /search result shape
+SEARCH_FIELDS = ["id", "label", "cluster", "type"]
+
+
+@app.get("/search/suggest")
+async def suggest_nodes(q: str = Query(..., min_length=1), k: int = Query(10, ge=1, le=50)):
+    """
+    Search-as-you-type label completions from the in-process index: word
+    prefix matches first, then (for 3+ characters) matches inside labels,
+    more important nodes first within each group.
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    try:
+        index = await get_suggest_index()
+        return {"query": q, "suggestions": index.suggest(q, k)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Suggest failed: {str(e)}")
+
+
+# ArangoDB "collection or view not found"
+ARANGO_DATA_SOURCE_NOT_FOUND = 1203
+
+
 @app.get("/search")
-def search_nodes(q: str):
-    """Search nodes by label"""
+async def search_nodes(
+    q: str = Query(..., min_length=1),
+    fields: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Search nodes by label (and description, type, cluster), best matches
+    first, each with its relevance `score`. Falls back to an unranked
+    substring scan of the graph snapshot when the search view has not been
+    provisioned (run setup_arrango.py).
+    """
     if not db:
         raise HTTPException(status_code=500, detail="Database not connected")
+    result_fields = parse_fields(fields, NODE_FIELDS) or SEARCH_FIELDS
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be blank")
     try:
-        results = list(db.aql.execute("""
-            FOR node IN nodes
-                FILTER CONTAINS(LOWER(node.label), LOWER(@q))
-                RETURN node
-        """, bind_vars={'q': q}))
-        return {"results": [
-            {"id": n["_id"], "label": n.get("label", n["_key"]),
-             "cluster": n.get("cluster"), "type": n.get("type")}
-            for n in results
-        ]}
+        results = None
+        if SEARCH_VIEW:
+            try:
+                query, bind_vars = search_view.build_query(
+                    q, limit, offset, node_projection("doc", result_fields), view=SEARCH_VIEW)
+                results = await db.query(query, bind_vars)
+            except ArangoError as e:
+                if e.error_num != ARANGO_DATA_SOURCE_NOT_FOUND:
+                    raise
+        if results is None:
+            snapshot = await graph_cache.get()
+            needle = q.lower()
+            matches = (n for n, label in zip(snapshot.nodes, snapshot.search_labels) if needle in label)
+            results = select_fields(list(islice(matches, offset, offset + limit + 1)), result_fields)
+        return {
+            "results": results[:limit],
+            "limit": limit,
+            "offset": offset,
+            "has_more": len(results) > limit,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
@@ -264,21 +1694,15 @@ async def chat(request: ChatRequest, req: Request):
     context_text = ""
     if db and request.context:
         node_ids = [c.strip() for c in request.context.split(",") if c.strip()]
-        node_data, neighbor_data = [], []
 
-        for node_id in node_ids:
-            node_result = list(db.aql.execute(
-                "RETURN DOCUMENT(@id)", bind_vars={"id": node_id}
-            ))
-            if node_result and node_result[0]:
-                node_data.append(node_result[0])
+        node_data = await db.query(
+            "FOR id IN @ids LET doc = DOCUMENT(id) FILTER doc != null RETURN doc",
+            {"ids": node_ids})
 
         if node_data:
-            neighbor_result = list(db.aql.execute(
+            neighbor_data = await db.query(
                 "FOR v, e IN 1..1 ANY @id edges RETURN DISTINCT {node: v, edge: e}",
-                bind_vars={"id": node_ids[0]}
-            ))
-            neighbor_data.extend(neighbor_result)
+                {"id": node_ids[0]})
 
             node_summaries = [
                 f"{n.get('label','unknown')} ({n.get('type','node type unknown')}) "
@@ -337,7 +1761,7 @@ async def chat(request: ChatRequest, req: Request):
     # 5. Generate response
     # ----------------------------
     try:
-        response = ollama_client.chat(model=OLLAMA_MODEL, messages=messages)
+        response = await ollama_client.chat(model=OLLAMA_MODEL, messages=messages)
         reply = response["message"]["content"]
 
         # Update short-term history (keep last 10 exchanges)
@@ -378,7 +1802,7 @@ async def chat(request: ChatRequest, req: Request):
     # 3. Call Ollama model
     # ----------------------------
     try:
-        response = ollama_client.chat(
+        response = await ollama_client.chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": system_msg},
@@ -399,7 +1823,7 @@ async def chat(request: ChatRequest, req: Request):
 async def check_ollama():
     """Check Ollama connection"""
     try:
-        models = ollama_client.list().get("models", [])
+        models = (await ollama_client.list()).get("models", [])
         model_names = [m["name"] for m in models]
         return {
             "status": "online",
@@ -410,10 +1834,76 @@ async def check_ollama():
     except Exception as e:
         return {"status": "offline", "error": str(e)}
 
+@app.get("/health/adjacency")
+async def check_adjacency(samples: int = Query(20, ge=1, le=1000), depth: int = Query(2, ge=1, le=5)):
+    """
+    Consistency check: compare the in-process adjacency index against AQL
+    traversals for a random sample of nodes (node ids, distances and edge ids).
+    """
+    if not db:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    if not adjacency.is_available():
+        raise HTTPException(status_code=503, detail="Adjacency index requires NumPy")
+
+    try:
+        index = await get_adjacency()
+        sample = random.sample(index.nodes, min(samples, index.node_count))
+        keys = [n["id"].split("/", 1)[1] for n in sample]
+        expected = await asyncio.gather(*(fetch_neighborhood(key, depth) for key in keys))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Adjacency check failed: {str(e)}")
+
+    mismatches = []
+    for node, want in zip(sample, expected):
+        got = index.neighborhood(node["id"], depth)
+        want_nodes = {n["id"]: n.get("distance", 0) for n in want["nodes"]}
+        got_nodes = {n["id"]: n.get("distance", 0) for n in got["nodes"]}
+        want_edges = {e["id"] for e in want["edges"]}
+        got_edges = {e["id"] for e in got["edges"]}
+        if want_nodes != got_nodes or want_edges != got_edges:
+            mismatches.append({
+                "node": node["id"],
+                "missing_nodes": sorted(want_nodes.keys() - got_nodes.keys()),
+                "extra_nodes": sorted(got_nodes.keys() - want_nodes.keys()),
+                "distance_mismatches": sorted(
+                    k for k in want_nodes.keys() & got_nodes.keys() if want_nodes[k] != got_nodes[k]),
+                "missing_edges": sorted(want_edges - got_edges),
+                "extra_edges": sorted(got_edges - want_edges),
+            })
+
+    return {
+        "status": "consistent" if not mismatches else "inconsistent",
+        "revision": index.revision,
+        "checked": len(sample),
+        "depth": depth,
+        "mismatches": mismatches,
+    }
+
 @app.post("/analytics/notify-update")
-def notify_update(payload: Dict[str, Any]):
-    """Notify analytics updates (frontend -> backend)"""
+async def notify_update(payload: Dict[str, Any]):
+    """
+    Notify analytics updates (frontend -> backend).
+    affected_nodes must list every node whose document or edges changed;
+    for an edge change, both of its endpoints.
+    """
     print(f"📩 Received analytics update: {payload}")
+    change_type = payload.get("change_type")
+    if change_type not in NON_DATA_CHANGE_TYPES:
+        affected = payload.get("affected_nodes") or []
+        if affected and db:
+            await invalidate_nodes(change_type, [node_id(n) for n in affected])
+            try:
+                await graph_stats.refresh_nodes(node_id(n) for n in affected)
+            except Exception as e:
+                print(f"⚠️ Stats refresh failed, recomputing: {e}")
+                graph_stats.schedule_recompute()
+            community_worker.notify(node_id(n) for n in affected)
+        else:
+            graph_cache.invalidate()
+            neighbor_cache.clear()
+            if db:
+                graph_stats.schedule_recompute()
+                community_worker.request_full()
     return {"status": "ok", "received": payload, "timestamp": datetime.now().isoformat()}
 
 # =========================================
@@ -0,0 +1,117 @@
+"""
+Non-blocking ArangoDB access for the ProtoGraph APIs.
+
+A thin async client over ArangoDB's HTTP cursor API (/_api/cursor) built on
+httpx. All requests share one connection pool whose size bounds how many
+queries a worker can have in flight; further queries wait for a free
+connection instead of blocking the event loop.
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+
+class ArangoError(Exception):
+    """Error response from ArangoDB"""
+
+    def __init__(self, message: str, code: Optional[int] = None, error_num: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.error_num = error_num
+
+
+class AsyncArangoDatabase:
+    """Async handle on one ArangoDB database"""
+
+    def __init__(
+        self,
+        host: str,
+        database: str,
+        username: str,
+        password: str,
+        pool_size: int = 20,
+        timeout: float = 30.0,
+        batch_size: int = 1000,
+        ttl: int = 60,
+    ):
+        self.name = database
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self._client = httpx.AsyncClient(
+            base_url=f"{host.rstrip('/')}/_db/{database}",
+            auth=(username, password),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=timeout,
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        response = await self._client.request(method, path, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.is_error or body.get("error"):
+            raise ArangoError(
+                body.get("errorMessage") or f"HTTP {response.status_code} from ArangoDB",
+                code=response.status_code,
+                error_num=body.get("errorNum"),
+            )
+        return body
+
+    async def version(self) -> str:
+        return (await self._request("GET", "/_api/version"))["version"]
+
+    async def collection_revision(self, name: str) -> str:
+        """Revision id of a collection; changes on every write to it"""
+        return (await self._request("GET", f"/_api/collection/{name}/revision"))["revision"]
+
+    async def execute(
+        self,
+        query: str,
+        bind_vars: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+        ttl: Optional[int] = None,
+        stream: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Run an AQL query and yield results as cursor batches arrive.
+        stream=True asks ArangoDB for a streaming cursor, so the server does
+        not materialize the full result either. Abandoning the iteration early
+        deletes the server-side cursor. `options` are passed through as cursor
+        options (e.g. {"maxRuntime": 5}).
+        """
+        body: Dict[str, Any] = {
+            "query": query,
+            "bindVars": bind_vars or {},
+            "batchSize": batch_size or self.batch_size,
+            "ttl": ttl or self.ttl,
+        }
+        if stream or options:
+            body["options"] = {**(options or {}), **({"stream": True} if stream else {})}
+
+        page = await self._request("POST", "/_api/cursor", json=body)
+        cursor_id = page.get("id")
+        try:
+            while True:
+                for item in page.get("result", []):
+                    yield item
+                if not page.get("hasMore"):
+                    cursor_id = None
+                    break
+                # PUT keeps compatibility with ArangoDB releases before 3.11
+                page = await self._request("PUT", f"/_api/cursor/{cursor_id}")
+        finally:
+            if cursor_id:
+                try:
+                    await self._request("DELETE", f"/_api/cursor/{cursor_id}")
+                except (ArangoError, httpx.HTTPError):
+                    pass  # Cursor will expire with its TTL
+
+    async def query(self, query: str, bind_vars: Optional[Dict[str, Any]] = None, **kwargs) -> List[Any]:
+        """Run an AQL query and return all results"""
+        return [item async for item in self.execute(query, bind_vars, **kwargs)]
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+ProtoGraph API benchmarks
+Runs against synthetic graphs so results are reproducible without a database.
+
+Usage:
+  python benchmark.py wire-formats [--nodes 100000] [--edges 300000]
+  python benchmark.py adjacency [--nodes 100000] [--edges 300000] [--api http://localhost:8000]
+  python benchmark.py search [--nodes 1000000] [--arango http://localhost:8529]
+  python benchmark.py suggest [--nodes 200000] [--changes 100]
+  python benchmark.py centrality [--edges 10000 100000 1000000] [--samples N]
+  python benchmark.py communities [--edges 100000 1000000] [--changes 20]
+  python benchmark.py coupling [--edges 100000 1000000 3000000]
+  python benchmark.py export [--nodes 1000000] [--api http://localhost:8000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+import adjacency
+import centrality
+import communities
+import coupling
+import graph_codec
+import search_index
+import search_view
+import table_export
+
+CLUSTERS = ["content_dev", "range", "opfor", "automation"]
+NODE_TYPES = ["requirement", "design", "infrastructure", "tactic", "script", "documentation"]
+EDGE_TYPES = ["defines", "informs", "requires", "enables", "drives", "executes"]
+LABEL_WORDS = [
+    "network", "topology", "campaign", "playbook", "scenario", "narrative", "profile", "range",
+    "objective", "automation", "script", "library", "requirement", "execution", "payload", "sensor",
+    "beacon", "firewall", "domain", "controller", "exercise", "timeline", "inject", "report",
+]
+SEARCH_QUERIES = ["network", "play", "camp", "ecution", "firewall controller", "zzz"]
+SUGGEST_QUERIES = ["n", "ne", "net", "play", "ecution", "firewall con", "zzz"]
+
+
+def synthetic_graph(node_count: int, edge_count: int, seed: int = 42):
+    """Shaped nodes/edges, as served by /graph"""
+    rng = random.Random(seed)
+    nodes = [
+        {
+            "id": f"nodes/n{i}",
+            "label": f"Artifact {i}",
+            "cluster": rng.choice(CLUSTERS),
+            "type": rng.choice(NODE_TYPES),
+            "importance": round(rng.uniform(0.3, 1.0), 2),
+            "size": rng.randint(30, 60),
+        }
+        for i in range(node_count)
+    ]
+    edges = [
+        {
+            "id": f"edges/e{i}",
+            "source": f"nodes/n{rng.randrange(node_count)}",
+            "target": f"nodes/n{rng.randrange(node_count)}",
+            "type": rng.choice(EDGE_TYPES),
+            "weight": round(rng.uniform(0.1, 1.0), 2),
+        }
+        for i in range(edge_count)
+    ]
+    return nodes, edges
+
+
+def synthetic_labels(count: int, seed: int = 42):
+    """Multi-word labels drawn from a small vocabulary, so words repeat like real titles"""
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.sample(LABEL_WORDS, rng.randint(2, 4))).title()} {i}" for i in range(count)]
+
+
+def timed(fn, repeat: int = 3):
+    """Best-of-N wall time in milliseconds, plus the last result"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def bench_wire_formats(args):
+    print("\n📦 Wire formats: JSON vs MessagePack vs Arrow IPC")
+    print("-" * 60)
+    nodes, edges = synthetic_graph(args.nodes, args.edges)
+    print(f"   Graph: {len(nodes):,} nodes, {len(edges):,} edges")
+
+    encoders = [("json", lambda: json.dumps({"nodes": nodes, "edges": edges}).encode())]
+    for media_type, name in [(graph_codec.MSGPACK_MEDIA_TYPE, "msgpack"), (graph_codec.ARROW_MEDIA_TYPE, "arrow")]:
+        if graph_codec.is_available(media_type):
+            encoders.append((name, lambda m=media_type: graph_codec.encode(m, nodes, edges)))
+        else:
+            print(f"   ⚠️  {name} skipped (library not installed)")
+
+    baseline = None
+    print(f"\n   {'format':<10}{'bytes':>14}{'vs json':>10}{'encode ms':>12}")
+    for name, encode in encoders:
+        ms, payload = timed(encode, args.repeat)
+        baseline = baseline or len(payload)
+        print(f"   {name:<10}{len(payload):>14,}{len(payload) / baseline:>9.0%}{ms:>12.1f}")
+
+
+def bench_adjacency(args):
+    print("\n🕸️  Adjacency index: in-process CSR BFS")
+    print("-" * 60)
+    if not adjacency.is_available():
+        print("   ⚠️  skipped (NumPy not installed)")
+        return
+    nodes, edges = synthetic_graph(args.nodes, args.edges)
+    print(f"   Graph: {len(nodes):,} nodes, {len(edges):,} edges")
+
+    build_ms, index = timed(lambda: adjacency.AdjacencyIndex(nodes, edges), 1)
+    print(f"   Build: {build_ms:.1f} ms")
+
+    rng = random.Random(7)
+    seeds = [n["id"] for n in rng.sample(nodes, args.samples)]
+    print(f"\n   {'depth':<8}{'median µs':>12}{'p95 µs':>12}{'avg nodes':>12}")
+    for depth in range(1, 6):
+        durations, sizes = [], []
+        for seed in seeds:
+            start = time.perf_counter()
+            result = index.neighborhood(seed, depth)
+            durations.append((time.perf_counter() - start) * 1e6)
+            sizes.append(len(result["nodes"]))
+        durations.sort()
+        p95 = durations[int(len(durations) * 0.95) - 1]
+        print(f"   {depth:<8}{statistics.median(durations):>12.0f}{p95:>12.0f}{statistics.mean(sizes):>12.0f}")
+
+    if args.api:
+        bench_neighbors_api(args)
+
+
+def bench_neighbors_api(args):
+    """Time /neighbors on a running API: AQL traversal vs in-process index"""
+    print(f"\n   Live API comparison: {args.api}")
+    with urllib.request.urlopen(f"{args.api}/graph?fields=id") as response:
+        keys = [n["id"].split("/", 1)[1] for n in json.load(response)["nodes"]]
+    rng = random.Random(7)
+    keys = rng.sample(keys, min(args.samples, len(keys)))
+
+    print(f"   {'depth':<8}{'aql ms':>12}{'memory ms':>12}")
+    for depth in range(1, 6):
+        medians = []
+        for backend in ("aql", "memory"):
+            durations = []
+            for key in keys:
+                start = time.perf_counter()
+                with urllib.request.urlopen(f"{args.api}/neighbors/{key}?depth={depth}&backend={backend}") as response:
+                    response.read()
+                durations.append((time.perf_counter() - start) * 1000)
+            medians.append(statistics.median(durations))
+        print(f"   {depth:<8}{medians[0]:>12.1f}{medians[1]:>12.1f}")
+
+
+def bench_search(args):
+    print("\n🔎 Search: substring scan vs ArangoSearch view")
+    print("-" * 60)
+    labels = synthetic_labels(args.nodes)
+    folded = [label.lower() for label in labels]
+    print(f"   Nodes: {len(labels):,}")
+
+    print("\n   In-process snapshot scan (fallback path)")
+    print(f"   {'query':<22}{'ms':>10}{'matches':>12}")
+    for q in SEARCH_QUERIES:
+        needle = q.lower()
+        ms, matches = timed(lambda: [i for i, label in enumerate(folded) if needle in label], args.repeat)
+        print(f"   {q:<22}{ms:>10.1f}{len(matches):>12,}")
+
+    if args.arango:
+        bench_search_arango(args, labels)
+
+
+def bench_search_arango(args, labels):
+    """Load the labels into a scratch database and time the old scan query against the view"""
+    from arango import ArangoClient
+
+    client = ArangoClient(hosts=args.arango)
+    user, password = os.getenv("ARANGO_USER", "root"), os.getenv("ARANGO_PASSWORD", "")
+    sys_db = client.db("_system", username=user, password=password)
+    if not sys_db.has_database(args.database):
+        sys_db.create_database(args.database)
+    db = client.db(args.database, username=user, password=password)
+    nodes = db.collection("nodes") if db.has_collection("nodes") else db.create_collection("nodes")
+
+    if nodes.count() != len(labels):
+        print(f"\n   Loading {len(labels):,} nodes into '{args.database}'...")
+        nodes.truncate()
+        rng = random.Random(42)
+        for start in range(0, len(labels), 10_000):
+            nodes.import_bulk([
+                {
+                    "_key": f"n{i}",
+                    "label": labels[i],
+                    "cluster": rng.choice(CLUSTERS),
+                    "type": rng.choice(NODE_TYPES),
+                    "importance": round(rng.uniform(0.3, 1.0), 2),
+                }
+                for i in range(start, min(start + 10_000, len(labels)))
+            ])
+    for line in search_view.provision(db):
+        print(f"   {line}")
+    # Block until the view has indexed everything
+    list(db.aql.execute(
+        f"FOR doc IN {search_view.VIEW_NAME} OPTIONS {{waitForSync: true}} LIMIT 1 RETURN 1"))
+
+    scan = "FOR node IN nodes FILTER CONTAINS(LOWER(node.label), LOWER(@q)) RETURN node"
+    print(f"\n   {'query':<22}{'scan ms':>10}{'view ms':>10}{'scan rows':>12}")
+    for q in SEARCH_QUERIES:
+        scan_ms, rows = timed(lambda: list(db.aql.execute(scan, bind_vars={"q": q})), args.repeat)
+        query, bind_vars = search_view.build_query(q, 20, 0, "{id: doc._id, label: doc.label}")
+        view_ms, _ = timed(lambda: list(db.aql.execute(query, bind_vars=bind_vars)), args.repeat)
+        print(f"   {q:<22}{scan_ms:>10.1f}{view_ms:>10.1f}{len(rows):>12,}")
+
+
+def bench_suggest(args):
+    print("\n⌨️  Typeahead: in-process prefix/trigram index")
+    print("-" * 60)
+    rng = random.Random(42)
+    nodes = [
+        {"id": f"nodes/n{i}", "label": label, "importance": round(rng.uniform(0.3, 1.0), 2)}
+        for i, label in enumerate(synthetic_labels(args.nodes))
+    ]
+    print(f"   Nodes: {len(nodes):,}")
+    build_ms, index = timed(lambda: search_index.SuggestIndex(nodes), 1)
+    print(f"   Build: {build_ms:.0f} ms")
+
+    print(f"\n   {'query':<16}{'median µs':>12}{'p95 µs':>12}{'results':>10}")
+    for q in SUGGEST_QUERIES:
+        durations = []
+        for _ in range(args.samples):
+            start = time.perf_counter()
+            results = index.suggest(q, 10)
+            durations.append((time.perf_counter() - start) * 1e6)
+        durations.sort()
+        p95 = durations[int(len(durations) * 0.95) - 1]
+        print(f"   {q:<16}{statistics.median(durations):>12.0f}{p95:>12.0f}{len(results):>10}")
+
+    changed = list(nodes)
+    for i in rng.sample(range(len(nodes)), args.changes):
+        changed[i] = {**nodes[i], "label": nodes[i]["label"] + " revised", "importance": 0.99}
+    patch_ms, patched = timed(lambda: index.apply(changed), 1)
+    print(f"\n   Patch {args.changes} changed nodes: {patch_ms:.0f} ms "
+          f"({'in place' if patched is index else 'rebuilt'}) vs full build {build_ms:.0f} ms")
+
+
+def bench_centrality(args):
+    print("\n⭐ Centrality: PageRank, degree and betweenness on SciPy sparse matrices")
+    print("-" * 60)
+    if not centrality.is_available():
+        print("   ⚠️  skipped (NumPy/SciPy not installed)")
+        return
+    print(f"   {'edges':>10}{'nodes':>10}{'build ms':>10}{'pagerank':>10}{'between':>10}{'sources':>9}")
+    for edge_count in args.edges:
+        nodes, edges = synthetic_graph(max(edge_count // args.ratio, 3), edge_count)
+        result = centrality.compute(nodes, edges, args.samples)
+        timings = result["timings"]
+        sources = "all" if result["exact"] else f"{result['betweenness_sources']:,}"
+        print(f"   {edge_count:>10,}{len(nodes):>10,}{timings['build']:>10.0f}{timings['pagerank']:>10.0f}"
+              f"{timings['betweenness']:>10.0f}{sources:>9}")
+
+
+def bench_communities(args):
+    print("\n🧩 Communities: full Louvain run vs local refine after small edits")
+    print("-" * 60)
+    if not communities.is_available():
+        print("   ⚠️  skipped (NumPy/SciPy not installed)")
+        return
+    print(f"   {'edges':>10}{'nodes':>10}{'full ms':>10}{'found':>8}{'modularity':>12}{'refine ms':>11}{'visits':>8}")
+    for edge_count in args.edges:
+        nodes, edges = synthetic_graph(max(edge_count // args.ratio, 3), edge_count)
+        full = communities.assign(nodes, edges, {})
+        rng = random.Random(7)
+        added = [
+            {"id": f"edges/new{i}", "source": rng.choice(nodes)["id"], "target": rng.choice(nodes)["id"], "weight": 1.0}
+            for i in range(args.changes)
+        ]
+        changed = {e["source"] for e in added} | {e["target"] for e in added}
+        refined = communities.assign(nodes, edges + added, full["labels"], changed)
+        found = len(set(full["labels"].values()))
+        print(f"   {edge_count:>10,}{len(nodes):>10,}{full['ms']:>10.0f}{found:>8,}{full['modularity']:>12.4f}"
+              f"{refined['ms']:>11.0f}{refined['visits']:>8,}")
+    print("   (both include building the sparse matrix from the snapshot records)")
+
+
+def bench_coupling(args):
+    print("\n🔗 Team coupling: single pass over the edges")
+    print("-" * 60)
+    print(f"   {'edges':>10}{'nodes':>10}{'ms':>10}{'ns/edge':>10}{'pairs':>8}")
+    for edge_count in args.edges:
+        nodes, edges = synthetic_graph(max(edge_count // args.ratio, 3), edge_count)
+        ms, matrix = timed(lambda: coupling.CouplingMatrix.from_graph(nodes, edges), args.repeat)
+        print(f"   {edge_count:>10,}{len(nodes):>10,}{ms:>10.0f}{ms * 1e6 / edge_count:>10.0f}{len(matrix.scores):>8}")
+
+
+def bench_export(args):
+    print("\n📤 Bulk export: JSON body vs streamed CSV / Parquet")
+    print("-" * 60)
+    nodes, _ = synthetic_graph(args.nodes, 0)
+    columns = list(nodes[0])
+    print(f"   Table: {len(nodes):,} node rows, {len(columns)} columns, chunks of {args.chunk:,} rows")
+
+    async def rows():
+        for node in nodes:
+            yield node
+
+    async def drain(fmt):
+        size = 0
+        async for block in table_export.stream(fmt, rows(), columns, args.chunk):
+            size += len(block)
+        return size
+
+    writers = [("json", lambda: len(json.dumps({"nodes": nodes}).encode()))]
+    for fmt in table_export.FORMATS:
+        if table_export.is_available(fmt):
+            writers.append((fmt, lambda f=fmt: asyncio.run(drain(f))))
+        else:
+            print(f"   ⚠️  {fmt} skipped (library not installed)")
+
+    # Peak is what the encoder allocates on top of the rows themselves
+    print(f"\n   {'format':<10}{'bytes':>14}{'ms':>10}{'rows/s':>12}{'peak MiB':>10}")
+    for name, write in writers:
+        ms, size = timed(write, args.repeat)
+        tracemalloc.start()
+        write()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"   {name:<10}{size:>14,}{ms:>10.0f}{len(nodes) / ms * 1000:>12,.0f}{peak / 2**20:>10.1f}")
+
+    if args.api:
+        bench_export_api(args)
+
+
+def bench_export_api(args):
+    """Download the node table from a running API through each endpoint"""
+    print(f"\n   Live API comparison: {args.api}")
+    print(f"   {'endpoint':<28}{'bytes':>14}{'ms':>10}")
+    for path in ("/graph", "/graph?format=ndjson", "/export/nodes.csv", "/export/nodes.parquet"):
+        durations, size = [], 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            with urllib.request.urlopen(f"{args.api}{path}") as response:
+                size = 0
+                while block := response.read(1 << 20):
+                    size += len(block)
+            durations.append((time.perf_counter() - start) * 1000)
+        print(f"   {path:<28}{size:>14,}{min(durations):>10.0f}")
+    print("   (/graph and ndjson include edges; the exports carry the node table only)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProtoGraph API benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    wire = sub.add_parser("wire-formats", help="/graph payload size and encode time per format")
+    wire.add_argument("--nodes", type=int, default=100_000)
+    wire.add_argument("--edges", type=int, default=300_000)
+    wire.set_defaults(run=bench_wire_formats)
+
+    adj = sub.add_parser("adjacency", help="/neighbors BFS latency on the CSR index (optionally vs AQL)")
+    adj.add_argument("--nodes", type=int, default=100_000)
+    adj.add_argument("--edges", type=int, default=300_000)
+    adj.add_argument("--samples", type=int, default=200, help="seed nodes per depth")
+    adj.add_argument("--api", help="base URL of a running API to compare against the AQL path")
+    adj.set_defaults(run=bench_adjacency)
+
+    search = sub.add_parser("search", help="/search latency: substring scan vs ArangoSearch view")
+    search.add_argument("--nodes", type=int, default=1_000_000)
+    search.add_argument("--arango", help="ArangoDB URL to load the nodes into and time the view against the scan "
+                                         "(credentials from ARANGO_USER / ARANGO_PASSWORD)")
+    search.add_argument("--database", default="protograph_bench", help="scratch database for --arango")
+    search.set_defaults(run=bench_search)
+
+    suggest = sub.add_parser("suggest", help="/search/suggest latency and incremental update cost")
+    suggest.add_argument("--nodes", type=int, default=200_000)
+    suggest.add_argument("--samples", type=int, default=200, help="runs per query")
+    suggest.add_argument("--changes", type=int, default=100, help="nodes changed for the patch timing")
+    suggest.set_defaults(run=bench_suggest)
+
+    central = sub.add_parser("centrality", help="/analytics/centrality job runtime per graph size")
+    central.add_argument("--edges", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    central.add_argument("--ratio", type=int, default=3, help="edges per node")
+    central.add_argument("--samples", type=int, help="betweenness sources (default: exact up to "
+                                                     f"{centrality.EXACT_BETWEENNESS_NODES:,} nodes, then budgeted)")
+    central.set_defaults(run=bench_centrality)
+
+    comm = sub.add_parser("communities", help="community detection: full run vs incremental refine")
+    comm.add_argument("--edges", type=int, nargs="+", default=[100_000, 1_000_000])
+    comm.add_argument("--ratio", type=int, default=3, help="edges per node")
+    comm.add_argument("--changes", type=int, default=20, help="edges added before the refine")
+    comm.set_defaults(run=bench_communities)
+
+    coup = sub.add_parser("coupling", help="/analytics/team-coupling computation time per graph size")
+    coup.add_argument("--edges", type=int, nargs="+", default=[100_000, 1_000_000, 3_000_000])
+    coup.add_argument("--ratio", type=int, default=3, help="edges per node")
+    coup.set_defaults(run=bench_coupling)
+
+    export = sub.add_parser("export", help="/export CSV and Parquet throughput vs a JSON body")
+    export.add_argument("--nodes", type=int, default=1_000_000)
+    export.add_argument("--chunk", type=int, default=50_000, help="rows per CSV block / Parquet row group")
+    export.add_argument("--api", help="base URL of a running API to time /graph against /export")
+    export.set_defaults(run=bench_export)
+
+    args = parser.parse_args()
+    print("⏱️  ProtoGraph Benchmarks")
+    print("=" * 60)
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""
+Node centrality for /analytics/centrality.
+
+Computes, over the whole graph at once:
+
+- pagerank: over the directed edges (_from -> _to), each node passing its
+  rank to its successors in proportion to edge weight; nodes without
+  outgoing edges spread theirs over all nodes
+- degree: number of incident edges, both directions
+- betweenness: share of shortest paths (in hops, edges undirected like the
+  ANY traversals elsewhere) that pass through the node, normalized to
+  [0, 1]. Exact (Brandes) on small graphs; on larger ones it is estimated
+  from a random sample of source nodes and scaled up.
+
+Everything runs on SciPy sparse matrices and NumPy arrays. Betweenness runs
+the Brandes passes for a batch of sources at once: each BFS level is one
+product of the frontier rows of the adjacency matrix with a dense
+(nodes x sources) matrix.
+
+`importance` is derived from pagerank as the node's percentile rank, so it
+stays in (0, 1] and spreads evenly instead of following the heavy tail of
+raw pagerank.
+
+CentralityJob runs the computation in a worker thread on the current graph
+snapshot, keeps the latest result for reads and writes it back to the node
+documents in bulk.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+METRICS = ["pagerank", "degree", "betweenness", "importance"]
+DAMPING = 0.85
+# Betweenness is exact up to this many nodes, sampled above
+EXACT_BETWEENNESS_NODES = 5_000
+# Default sample: as many sources as fit in SAMPLE_BUDGET edge visits (each
+# source walks every edge twice), within MIN_SAMPLES..MAX_SAMPLES
+SAMPLE_BUDGET = 100_000_000
+MIN_SAMPLES = 32
+MAX_SAMPLES = 256
+# Sources per Brandes batch: bounds the dense (nodes x batch) work arrays
+BATCH_SIZE = 32
+
+
+def is_available() -> bool:
+    return sparse is not None
+
+
+def build_matrices(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+    """
+    (weighted directed adjacency, 0/1 undirected adjacency without self
+    loops, per-node edge count) over the snapshot records. Parallel edges
+    add up in the directed matrix and collapse in the undirected one.
+    Edges whose endpoints are missing from `nodes` are left out.
+    """
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+    count = len(nodes)
+    linked = [
+        (index[e["source"]], index[e["target"]], e.get("weight", 1.0))
+        for e in edges
+        if e["source"] in index and e["target"] in index
+    ]
+    sources = np.fromiter((l[0] for l in linked), dtype=np.int32, count=len(linked))
+    targets = np.fromiter((l[1] for l in linked), dtype=np.int32, count=len(linked))
+    weights = np.fromiter((l[2] for l in linked), dtype=np.float64, count=len(linked))
+
+    directed = sparse.csr_matrix((weights, (sources, targets)), shape=(count, count))
+    loops = sources == targets
+    heads = np.concatenate([sources[~loops], targets[~loops]])
+    tails = np.concatenate([targets[~loops], sources[~loops]])
+    undirected = sparse.csr_matrix(
+        (np.ones(len(heads), dtype=np.float64), (heads, tails)), shape=(count, count))
+    undirected.data[:] = 1.0  # collapse parallel edges summed by the constructor
+    degree = np.bincount(sources, minlength=count) + np.bincount(targets, minlength=count)
+    return directed, undirected, degree
+
+
+def pagerank(directed, damping: float = DAMPING, tol: float = 1e-10, max_iter: int = 200):
+    """Power iteration; returns (scores summing to 1, iterations used)"""
+    count = directed.shape[0]
+    if count == 0:
+        return np.zeros(0), 0
+    out_weight = np.asarray(directed.sum(axis=1)).ravel()
+    dangling = out_weight <= 0
+    inverse = np.divide(1.0, out_weight, out=np.zeros(count), where=~dangling)
+    # Column-stochastic transition matrix, transposed once so each step is one product
+    transition = (sparse.diags(inverse) @ directed).T.tocsr()
+
+    rank = np.full(count, 1.0 / count)
+    for iteration in range(1, max_iter + 1):
+        spread = (damping * rank[dangling].sum() + 1.0 - damping) / count
+        updated = damping * (transition @ rank) + spread
+        change = np.abs(updated - rank).sum()
+        rank = updated
+        if change < tol:
+            break
+    return rank / rank.sum(), iteration
+
+
+def _brandes_batch(undirected, sources):
+    """Summed dependency of every node on the given sources (algebraic Brandes)"""
+    count, batch = undirected.shape[0], len(sources)
+    columns = np.arange(batch)
+    sigma = np.zeros((count, batch))
+    sigma[sources, columns] = 1.0
+    depth = np.full((count, batch), -1, dtype=np.int16)
+    depth[sources, columns] = 0
+
+    # Forward: count shortest paths level by level; only rows on the frontier feed the product
+    frontier = sigma.copy()
+    rows = np.asarray(sources)
+    level = 0
+    while len(rows):
+        reached = undirected[rows].T @ frontier[rows]
+        reached[depth >= 0] = 0.0
+        hit = reached > 0
+        if not hit.any():
+            break
+        level += 1
+        depth[hit] = level
+        sigma[hit] = reached[hit]
+        frontier = reached
+        rows = np.flatnonzero(hit.any(axis=1))
+
+    # Backward: push dependencies from each level to the one before it
+    delta = np.zeros((count, batch))
+    safe_sigma = np.where(sigma > 0, sigma, 1.0)
+    for d in range(level, 0, -1):
+        at_level = depth == d
+        rows = np.flatnonzero(at_level.any(axis=1))
+        share = np.where(at_level[rows], (1.0 + delta[rows]) / safe_sigma[rows], 0.0)
+        pulled = undirected[rows].T @ share
+        parents = depth == d - 1
+        delta[parents] += sigma[parents] * pulled[parents]
+    delta[sources, columns] = 0.0
+    return delta.sum(axis=1)
+
+
+def betweenness(undirected, samples: Optional[int] = None, seed: int = 0):
+    """
+    Normalized betweenness; returns (scores, sources used). With `samples`
+    below the node count, that many random sources are used and the result
+    is scaled up by count / samples.
+    """
+    count = undirected.shape[0]
+    if count < 3:
+        return np.zeros(count), 0
+    if samples is None or samples >= count:
+        sources = np.arange(count)
+    else:
+        sources = np.random.default_rng(seed).choice(count, size=samples, replace=False)
+
+    total = np.zeros(count)
+    for start in range(0, len(sources), BATCH_SIZE):
+        total += _brandes_batch(undirected, sources[start:start + BATCH_SIZE])
+    # Every unordered pair is seen from both ends when all sources are used
+    scale = count / len(sources) / ((count - 1) * (count - 2))
+    return total * scale, len(sources)
+
+
+def default_samples(edge_entries: int) -> int:
+    """Betweenness sources for a graph whose undirected adjacency has `edge_entries` entries"""
+    return int(min(MAX_SAMPLES, max(MIN_SAMPLES, SAMPLE_BUDGET // max(2 * edge_entries, 1))))
+
+
+def percentile_rank(values):
+    """Share of values <= each value, ties sharing the highest position"""
+    count = len(values)
+    if count == 0:
+        return np.zeros(0)
+    order = np.sort(values)
+    return np.searchsorted(order, values, side="right") / count
+
+
+def compute(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], samples: Optional[int] = None) -> Dict[str, Any]:
+    """
+    All metrics for one snapshot, as {"ids", metric arrays, "timings" (ms),
+    "pagerank_iterations", "betweenness_sources", "exact"}. `samples`
+    defaults to exact betweenness up to EXACT_BETWEENNESS_NODES nodes and
+    default_samples() sources above.
+    """
+    timings = {}
+    started = time.perf_counter()
+    directed, undirected, degree = build_matrices(nodes, edges)
+    timings["build"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    ranks, iterations = pagerank(directed)
+    timings["pagerank"] = (time.perf_counter() - started) * 1000
+
+    if samples is None and len(nodes) > EXACT_BETWEENNESS_NODES:
+        samples = default_samples(undirected.nnz)
+    started = time.perf_counter()
+    between, used = betweenness(undirected, samples)
+    timings["betweenness"] = (time.perf_counter() - started) * 1000
+
+    return {
+        "ids": [n["id"] for n in nodes],
+        "pagerank": ranks,
+        "degree": degree,
+        "betweenness": between,
+        "importance": percentile_rank(ranks),
+        "timings": {step: round(ms, 1) for step, ms in timings.items()},
+        "pagerank_iterations": iterations,
+        "betweenness_sources": used,
+        "exact": used == len(nodes),
+    }
+
+
+class CentralityJob:
+    """
+    Background centrality computation over the graph snapshot.
+
+    - await load() returns the current graph_cache.GraphSnapshot
+    - await write(rows) stores [{"_key", "pagerank", "degree", "betweenness",
+      "importance"}] on the node documents
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[Any]],
+        write: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+    ):
+        self._load = load
+        self._write = write
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # (samples, write) of the latest scheduled run
+        self._params: Tuple[Optional[int], bool] = (None, False)
+        self.result: Optional[Dict[str, Any]] = None
+        self._labels: List[Any] = []
+        self._clusters = None
+        self._orders: Dict[str, Any] = {}
+        self.revision: Optional[str] = None
+        self.computed_at: Optional[float] = None
+        self.written_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run(self, samples: Optional[int] = None, write: bool = True) -> None:
+        """Compute on the current snapshot and, with `write`, store the results on the nodes"""
+        async with self._lock:
+            try:
+                snapshot = await self._load()
+                result = await asyncio.to_thread(compute, snapshot.nodes, snapshot.edges, samples)
+                self.result, self.revision, self.computed_at, self.error = result, snapshot.revision, time.time(), None
+                self._labels = [n.get("label") for n in snapshot.nodes]
+                self._clusters = np.array([n.get("cluster") for n in snapshot.nodes], dtype=object)
+                self._orders = {}
+                if write:
+                    started = time.perf_counter()
+                    await self._write(self.rows())
+                    result["timings"]["write"] = round((time.perf_counter() - started) * 1000, 1)
+                    self.written_at = time.time()
+            except Exception as e:
+                self.error = str(e)
+                raise
+
+    def schedule(self, samples: Optional[int] = None, write: bool = True) -> asyncio.Task:
+        """
+        Start a run in the background; returns its task. A request the latest
+        run already covers (same samples, and it writes if asked to) joins
+        it, any other is queued to start once that run has finished.
+        """
+        if self.running:
+            latest_samples, latest_write = self._params
+            if latest_samples == samples and (latest_write or not write):
+                return self._task
+        self._task = asyncio.create_task(self._run_after(self._task if self.running else None, samples, write))
+        self._params = (samples, write)
+        # Failures are reported through status(); do not log them as unretrieved
+        self._task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._task
+
+    async def _run_after(self, previous: Optional[asyncio.Task], samples: Optional[int], write: bool) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        await self.run(samples, write)
+
+    async def run_schedule(self, interval: float) -> None:
+        """Recompute (and write back) every `interval` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Through schedule() so requests see it as running and join it
+                await asyncio.shield(self.schedule())
+            except Exception as e:
+                print(f"⚠️ Scheduled centrality run failed: {e}")
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Per-node write-back records for the latest result"""
+        result = self.result
+        return [
+            {
+                "_key": node_id.split("/", 1)[-1],
+                "pagerank": round(float(pr), 8),
+                "degree": int(deg),
+                "betweenness": round(float(bc), 8),
+                "importance": round(float(imp), 4),
+            }
+            for node_id, pr, deg, bc, imp in zip(
+                result["ids"], result["pagerank"], result["degree"], result["betweenness"], result["importance"])
+        ]
+
+    def status(self) -> Dict[str, Any]:
+        result = self.result or {}
+        return {
+            "running": self.running,
+            "revision": self.revision,
+            "computed_at": self.computed_at,
+            "written_at": self.written_at,
+            "error": self.error,
+            "node_count": len(result.get("ids", [])),
+            "exact": result.get("exact"),
+            "betweenness_sources": result.get("betweenness_sources"),
+            "pagerank_iterations": result.get("pagerank_iterations"),
+            "timings_ms": result.get("timings"),
+        }
+
+    def _order(self, metric: str):
+        """Node positions by `metric`, highest first, ties by id; cached per result"""
+        if metric not in self._orders:
+            result = self.result
+            if "id_rank" not in self._orders:
+                self._orders["id_rank"] = np.argsort(np.argsort(np.array(result["ids"], dtype=str), kind="stable"))
+            self._orders[metric] = np.lexsort((self._orders["id_rank"], -result[metric]))
+        return self._orders[metric]
+
+    def top(self, metric: str, limit: int, offset: int = 0, cluster: Optional[str] = None) -> Dict[str, Any]:
+        """Nodes ordered by `metric` (highest first, then id), with all metrics"""
+        if self.result is None:
+            return {"nodes": [], "total": 0}
+        result = self.result
+        order = self._order(metric)
+        if cluster is not None:
+            order = order[self._clusters[order] == cluster]
+        nodes = []
+        for i in order[offset:offset + limit].tolist():
+            node_id = result["ids"][i]
+            nodes.append({
+                "id": node_id,
+                "label": self._labels[i],
+                "cluster": self._clusters[i],
+                "pagerank": round(float(result["pagerank"][i]), 8),
+                "degree": int(result["degree"][i]),
+                "betweenness": round(float(result["betweenness"][i]), 8),
+                "importance": round(float(result["importance"][i]), 4),
+            })
+        return {"nodes": nodes, "total": len(order)}
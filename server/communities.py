@@ -0,0 +1,440 @@
+"""
+Data-driven communities for /graph?lod=community.
+
+Communities are found by modularity optimization over the edges, taken as
+undirected and weighted by `weight`:
+
+- detect() runs Louvain: rounds of local moves, where every node moves to
+  the neighbouring community with the best modularity gain, then the
+  communities are collapsed into supernodes and the same is repeated on
+  the smaller graph until nothing moves. Moves are computed for all nodes
+  at once with NumPy; a random half of the improving nodes moves per round
+  so neighbours do not keep swapping places.
+- refine() re-optimizes after small edits: starting from the previous
+  assignment, only the changed nodes are revisited, and a node that moves
+  queues its neighbours, so the work stays proportional to the region the
+  edit actually disturbs.
+
+Both finish with the Leiden guarantee that every community is connected:
+a community that fell apart is split into its components.
+
+Labels are strings ("c0", "c1", ...). A full recompute keeps the label of
+the previous community each new one overlaps most, so colours and supernode
+ids stay put across runs.
+
+CommunityWorker applies these in the background: change events queue node
+ids, and each wake-up either refines around them or, when too much changed,
+recomputes everything; only nodes whose label changed are written back.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:
+    np = None
+    sparse = None
+
+RESOLUTION = 1.0
+# Rounds of simultaneous moves per level, and rounds without improvement before giving up on a level
+MAX_ROUNDS = 50
+PATIENCE = 3
+MAX_LEVELS = 10
+# Minimum modularity gain for a move or a round to count
+TOLERANCE = 1e-7
+# refine() gives up and detect() runs instead above this share of changed nodes
+REFINE_RATIO = 0.05
+# Node visits per changed node that refine() may spend
+REFINE_STEPS = 50
+
+
+def is_available() -> bool:
+    return sparse is not None
+
+
+def symmetric_matrix(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+    """Undirected weighted adjacency (A[i, j] = summed weight of edges between i and j), without self loops"""
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+    count = len(nodes)
+    linked = [
+        (index[e["source"]], index[e["target"]], e.get("weight", 1.0))
+        for e in edges
+        if e["source"] in index and e["target"] in index and e["source"] != e["target"]
+    ]
+    sources = np.fromiter((l[0] for l in linked), dtype=np.int32, count=len(linked))
+    targets = np.fromiter((l[1] for l in linked), dtype=np.int32, count=len(linked))
+    weights = np.fromiter((l[2] for l in linked), dtype=np.float64, count=len(linked))
+    matrix = sparse.csr_matrix(
+        (np.concatenate([weights, weights]), (np.concatenate([sources, targets]), np.concatenate([targets, sources]))),
+        shape=(count, count))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def modularity(matrix, labels, resolution: float = RESOLUTION) -> float:
+    total = matrix.sum()
+    if total <= 0:
+        return 0.0
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    inside = matrix.data[labels[rows] == labels[matrix.indices]].sum()
+    strength = np.bincount(labels, weights=np.asarray(matrix.sum(axis=1)).ravel())
+    return float(inside / total - resolution * (strength ** 2).sum() / total ** 2)
+
+
+def _compact(labels):
+    """Renumber labels to 0..k-1"""
+    _, codes = np.unique(labels, return_inverse=True)
+    return codes.astype(np.int64)
+
+
+def _move_round(matrix, labels, degree, total, resolution, rng):
+    """One round of simultaneous best moves; returns the new labels"""
+    count = matrix.shape[0]
+    strength = np.bincount(labels, weights=degree, minlength=count)
+    rows = np.repeat(np.arange(count), np.diff(matrix.indptr))
+    off_diagonal = rows != matrix.indices
+    # Weight from each node to each neighbouring community (duplicates summed)
+    links = sparse.csr_matrix(
+        (matrix.data[off_diagonal], (rows[off_diagonal], labels[matrix.indices[off_diagonal]])),
+        shape=(count, count))
+    links.sum_duplicates()
+    link_rows = np.repeat(np.arange(count), np.diff(links.indptr))
+    own = links.indices == labels[link_rows]
+
+    # Gain of joining each community, with the node taken out of its own first
+    others = strength[links.indices] - np.where(own, degree[link_rows], 0.0)
+    gain = links.data - resolution * others * degree[link_rows] / total
+    # Staying: the gain of rejoining its own community, which is just the penalty if it has no link there
+    stay = -resolution * (strength[labels] - degree) * degree / total
+    stay[link_rows[own]] = gain[own]
+
+    starts = links.indptr[:-1]
+    linked = np.flatnonzero(np.diff(links.indptr) > 0)
+    best_gain = np.full(count, -np.inf)
+    best_gain[linked] = np.maximum.reduceat(gain, starts[linked])
+    first_best = np.flatnonzero(gain == best_gain[link_rows])
+    best_rows, first = np.unique(link_rows[first_best], return_index=True)
+    best = labels.copy()
+    best[best_rows] = links.indices[first_best[first]]
+
+    movers = (best != labels) & (best_gain > stay + TOLERANCE) & (rng.random(count) < 0.5)
+    moved = labels.copy()
+    moved[movers] = best[movers]
+    return moved
+
+
+def _optimize_level(matrix, resolution, rng):
+    """Local moving on one level, from singletons; returns (labels, whether anything merged)"""
+    count = matrix.shape[0]
+    degree = np.asarray(matrix.sum(axis=1)).ravel()
+    total = matrix.sum()
+    labels = np.arange(count)
+    best, best_q = labels, modularity(matrix, labels, resolution)
+    stalled = 0
+    for _ in range(MAX_ROUNDS):
+        labels = _move_round(matrix, labels, degree, total, resolution, rng)
+        q = modularity(matrix, labels, resolution)
+        if q > best_q + TOLERANCE:
+            best, best_q, stalled = labels, q, 0
+        else:
+            stalled += 1
+            if stalled >= PATIENCE:
+                break
+    best = _compact(best)
+    return best, best.max(initial=-1) + 1 < count
+
+
+def split_disconnected(matrix, labels):
+    """
+    Give every connected part of a community its own label. The largest
+    part keeps the original label; the others get new ones after the
+    current maximum.
+    """
+    count = matrix.shape[0]
+    if count == 0:
+        return labels
+    rows = np.repeat(np.arange(count), np.diff(matrix.indptr))
+    inside = labels[rows] == labels[matrix.indices]
+    internal = sparse.csr_matrix(
+        (np.ones(inside.sum()), (rows[inside], matrix.indices[inside])), shape=(count, count))
+    _, components = csgraph.connected_components(internal, directed=False)
+
+    sizes = np.bincount(components)
+    # Per community, its largest component (ties to the lowest component number)
+    order = np.lexsort((components, -sizes[components], labels))
+    communities, first = np.unique(labels[order], return_index=True)
+    keeper = np.full(labels.max() + 1, -1)
+    keeper[communities] = components[order[first]]
+    split = components != keeper[labels]
+    relabelled = labels.copy()
+    if split.any():
+        extra = _compact(components[split])
+        relabelled[split] = labels.max() + 1 + extra
+    return relabelled
+
+
+def detect(matrix, resolution: float = RESOLUTION, seed: int = 0):
+    """Louvain over the whole graph; returns int labels per node"""
+    rng = np.random.default_rng(seed)
+    labels = np.arange(matrix.shape[0])
+    level_matrix = matrix
+    for _ in range(MAX_LEVELS):
+        level_labels, merged = _optimize_level(level_matrix, resolution, rng)
+        labels = level_labels[labels]
+        if not merged:
+            break
+        # Collapse communities into supernodes; internal weight becomes a self loop
+        membership = sparse.csr_matrix(
+            (np.ones(len(level_labels)), (np.arange(len(level_labels)), level_labels)),
+            shape=(len(level_labels), level_labels.max() + 1))
+        level_matrix = (membership.T @ level_matrix @ membership).tocsr()
+    return _compact(split_disconnected(matrix, labels))
+
+
+def refine(matrix, labels, candidates: Iterable[int], resolution: float = RESOLUTION):
+    """
+    Move changed nodes (and, transitively, the neighbours of nodes that
+    move) to their best neighbouring community, one at a time, starting
+    from `labels`. Returns (labels, node visits).
+    """
+    labels = labels.copy()
+    degree = np.asarray(matrix.sum(axis=1)).ravel()
+    total = matrix.sum()
+    if total <= 0:
+        return labels, 0
+    strength = np.bincount(labels, weights=degree, minlength=labels.max() + 1)
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+
+    queue = deque(dict.fromkeys(candidates))
+    queued = set(queue)
+    budget = REFINE_STEPS * max(len(queue), 1)
+    steps = 0
+    while queue and steps < budget:
+        node = queue.popleft()
+        queued.discard(node)
+        steps += 1
+        start, end = indptr[node], indptr[node + 1]
+        neighbours, weights = indices[start:end], data[start:end]
+        own = labels[node]
+        strength[own] -= degree[node]
+        if len(neighbours):
+            communities, inverse = np.unique(labels[neighbours], return_inverse=True)
+            links = np.bincount(inverse, weights=weights)
+            gain = links - resolution * strength[communities] * degree[node] / total
+            stay = -resolution * strength[own] * degree[node] / total
+            at_own = np.flatnonzero(communities == own)
+            if len(at_own):
+                stay = gain[at_own[0]]
+            choice = int(np.argmax(gain))
+            if gain[choice] > stay + TOLERANCE and communities[choice] != own:
+                labels[node] = communities[choice]
+                for neighbour in neighbours[labels[neighbours] != labels[node]].tolist():
+                    if neighbour not in queued:
+                        queue.append(neighbour)
+                        queued.add(neighbour)
+        strength[labels[node]] += degree[node]
+    return split_disconnected(matrix, labels), steps
+
+
+def _next_label(names: Iterable[str]) -> int:
+    """First n such that "c<n>" and everything after it is unused"""
+    return max((int(name[1:]) for name in names if name[:1] == "c" and name[1:].isdigit()), default=-1) + 1
+
+
+def stable_labels(codes, previous_codes, previous_names: List[str]) -> List[str]:
+    """
+    Name int communities after the previous community they share most nodes
+    with (each previous name used once); the rest get new "c<n>" names.
+    previous_codes holds, per node, an index into previous_names or -1.
+    """
+    known = previous_codes >= 0
+    names: Dict[int, str] = {}
+    if known.any():
+        width = len(previous_names)
+        pairs, overlap = np.unique(codes[known] * width + previous_codes[known], return_counts=True)
+        taken = set()
+        for pair in pairs[np.argsort(-overlap, kind="stable")].tolist():
+            code, name = divmod(pair, width)
+            if code not in names and name not in taken:
+                names[code] = previous_names[name]
+                taken.add(name)
+    fresh = _next_label(previous_names)
+    for code in range(int(codes.max(initial=-1)) + 1):
+        if code not in names:
+            names[code] = f"c{fresh}"
+            fresh += 1
+    return [names[code] for code in codes.tolist()]
+
+
+def assign(
+    nodes: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    previous: Dict[str, str],
+    changed: Optional[Set[str]] = None,
+    resolution: float = RESOLUTION,
+) -> Dict[str, Any]:
+    """
+    Community label per node id. With `changed` (node ids) and a previous
+    assignment covering most nodes, refines around the changed and unlabelled
+    nodes; otherwise detects from scratch. Returns {"labels", "mode",
+    "visits", "modularity", "ms"}.
+    """
+    started = time.perf_counter()
+    matrix = symmetric_matrix(nodes, edges)
+    ids = [n["id"] for n in nodes]
+    previous_names = sorted(set(previous.values()))
+    name_codes = {name: i for i, name in enumerate(previous_names)}
+    previous_codes = np.fromiter((name_codes.get(previous.get(i), -1) for i in ids), dtype=np.int64, count=len(ids))
+
+    unlabelled = np.flatnonzero(previous_codes < 0)
+    touched = len(unlabelled) + len(changed or ())
+    if changed is not None and previous and touched <= REFINE_RATIO * max(len(ids), 1):
+        mode = "refine"
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        codes = previous_codes.copy()
+        # New nodes start on their own
+        codes[unlabelled] = len(previous_names) + np.arange(len(unlabelled))
+        candidates = unlabelled.tolist() + [index[n] for n in changed if n in index]
+        codes, visits = refine(matrix, codes, candidates, resolution)
+        fresh = _next_label(previous_names)
+        names = previous_names + [f"c{fresh + i}" for i in range(int(codes.max(initial=-1)) + 1 - len(previous_names))]
+        labels = [names[code] for code in codes.tolist()]
+    else:
+        mode, visits = "full", len(ids)
+        codes = detect(matrix, resolution)
+        labels = stable_labels(codes, previous_codes, previous_names)
+
+    return {
+        "labels": dict(zip(ids, labels)),
+        "mode": mode,
+        "visits": visits,
+        "modularity": round(modularity(matrix, codes, resolution), 6),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+class CommunityWorker:
+    """
+    Background community maintenance.
+
+    - await load() returns the current graph_cache.GraphSnapshot
+    - await write(rows) stores [{"_key", "community"}] on the node documents
+    - await on_written(labels, revision), if given, is told which node ids
+      were relabelled ({id: community}) and the snapshot revision the labels
+      were computed on, so caches can be patched rather than dropped
+    Call start() once an event loop is running; notify() and
+    request_full() wake the worker. The first pass takes the `community`
+    values already stored on the snapshot nodes as the previous assignment,
+    so a restart does not relabel the graph.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[Any]],
+        write: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        resolution: float = RESOLUTION,
+        on_written: Optional[Callable[[Dict[str, str], str], Awaitable[None]]] = None,
+    ):
+        self._load = load
+        self._write = write
+        self._on_written = on_written
+        self.resolution = resolution
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[str] = set()
+        self._full = False
+        self.labels: Dict[str, str] = {}
+        self._adopted = False
+        self.revision: Optional[str] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.busy = False
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        # First pass: label whatever is not labelled yet
+        self._wake.set()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    def adopt(self, nodes: List[Dict[str, Any]]) -> int:
+        """Take stored `community` values as the previous assignment; returns how many nodes had one"""
+        self.labels = {n["id"]: n["community"] for n in nodes if n.get("community") is not None}
+        return len(self.labels)
+
+    def notify(self, node_ids: Iterable[str]) -> None:
+        """Queue changed nodes for local re-optimization"""
+        if self._wake is None:
+            return
+        self._pending.update(node_ids)
+        self._wake.set()
+
+    def request_full(self) -> None:
+        """Queue a recompute over the whole graph"""
+        if self._wake is None:
+            return
+        self._full = True
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            changed, full = self._pending, self._full
+            self._pending, self._full = set(), False
+            try:
+                await self.update(None if full else changed)
+            except Exception as e:
+                self.error = str(e)
+                print(f"⚠️ Community update failed: {e}")
+
+    async def update(self, changed: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Refine around `changed` (or recompute with None) and write back the nodes whose label changed"""
+        self.busy = True
+        try:
+            snapshot = await self._load()
+            if not self._adopted:
+                self.adopt(snapshot.nodes)
+                self._adopted = True
+            result = await asyncio.to_thread(
+                assign, snapshot.nodes, snapshot.edges, self.labels, changed, self.resolution)
+            labels = result["labels"]
+            relabelled = {node_id: label for node_id, label in labels.items() if self.labels.get(node_id) != label}
+            rows = [{"_key": node_id.split("/", 1)[-1], "community": label} for node_id, label in relabelled.items()]
+            if rows:
+                await self._write(rows)
+                if self._on_written is not None:
+                    await self._on_written(relabelled, snapshot.revision)
+            self.labels, self.revision, self.error = labels, snapshot.revision, None
+            self.last_run = {
+                **{k: v for k, v in result.items() if k != "labels"},
+                "changed_nodes": len(rows),
+                "finished_at": time.time(),
+            }
+            return self.last_run
+        finally:
+            self.busy = False
+
+    def summary(self, limit: int = 50) -> Dict[str, Any]:
+        """Worker status and the largest communities with their member count"""
+        sizes: Dict[str, int] = {}
+        for label in self.labels.values():
+            sizes[label] = sizes.get(label, 0) + 1
+        largest = sorted(sizes.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return {
+            "running": self.busy,
+            "pending_nodes": len(self._pending),
+            "revision": self.revision,
+            "error": self.error,
+            "last_run": self.last_run,
+            "community_count": len(sizes),
+            "communities": [{"community": label, "members": count} for label, count in largest],
+        }
@@ -0,0 +1,338 @@
+"""
+Team coupling for /analytics/team-coupling.
+
+Two teams (clusters) are coupled by the edges running between them. Every
+cross-team edge adds
+
+    score = weight (0.5 if missing) * mean importance of its endpoints
+            (0.5 each if missing)
+
+to the pair in both directions, and counts as one connection. Scores are
+reported on a 0-100 scale relative to the most coupled pair.
+
+The raw sums and counts for every pair come out of a single pass over the
+edges: endpoints are mapped to integer cluster codes and each cross-team
+edge to a pair index (source code * teams + target code), so NumPy's
+bincount adds up scores and counts per pair in one go. Without NumPy the
+same pass runs in plain Python.
+
+Against the live graph the same sums are computed inside ArangoDB
+(COUPLING_QUERY), so only the teams x teams result leaves the database;
+from_graph() stays the reference they are checked against.
+
+CouplingTracker holds those raw sums between reads, seeded and reconciled
+from COUPLING_QUERY. Optionally it also keeps per-edge records, so change
+events only re-read the affected nodes and their incident edges and an
+update costs O(affected edges) rather than an aggregation over all of them
+(see CouplingTracker for the memory this takes). Normalization to 0-100
+happens when the matrix is read.
+"""
+
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from incremental import IncrementalTracker
+
+DEFAULT_WEIGHT = 0.5
+DEFAULT_IMPORTANCE = 0.5
+
+Pair = Tuple[str, str]
+
+# Directed per-pair sums over cross-team edges. Teams are visited one at a
+# time through the nodes.cluster index, each member's outgoing edges through
+# the edge index, and only the target needs a document lookup.
+COUPLING_QUERY = """
+    LET teams = (FOR n IN nodes COLLECT cluster = n.cluster RETURN cluster)
+    FOR team IN teams
+        FOR s IN nodes
+            FILTER s.cluster == team
+            FOR e IN edges
+                FILTER e._from == s._id
+                LET t = DOCUMENT(e._to)
+                FILTER t != null AND t.cluster != team
+                COLLECT source = team, target = t.cluster
+                AGGREGATE
+                    score = SUM(NOT_NULL(e.weight, @weight)
+                                * (NOT_NULL(s.importance, @importance) + NOT_NULL(t.importance, @importance)) / 2),
+                    connections = COUNT(1)
+                RETURN {source, target, score, count: connections}
+"""
+
+
+class CouplingMatrix:
+    """
+    Raw (un-normalized) coupling between teams.
+
+    scores[(a, b)] == scores[(b, a)] is the summed edge score and counts the
+    number of edges between a and b, for every pair with at least one edge.
+    `teams` lists the teams with any cross-team edge, in order of first
+    appearance in the node list.
+    """
+
+    def __init__(self, teams: List[str], scores: Dict[Pair, float], counts: Dict[Pair, int]):
+        self.teams = teams
+        self.scores = scores
+        self.counts = counts
+
+    @classmethod
+    def from_graph(cls, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> "CouplingMatrix":
+        """Single pass over `edges`; edges with an endpoint missing from `nodes` are skipped"""
+        index: Dict[str, int] = {}
+        codes: Dict[str, int] = {}
+        node_codes, importance = [], []
+        for node in nodes:
+            index[node["id"]] = len(node_codes)
+            node_codes.append(codes.setdefault(node["cluster"], len(codes)))
+            importance.append(node.get("importance", DEFAULT_IMPORTANCE))
+        clusters = list(codes)
+
+        if np is None:
+            linked = [
+                (index[e["source"]], index[e["target"]], e.get("weight", DEFAULT_WEIGHT))
+                for e in edges
+                if e["source"] in index and e["target"] in index
+            ]
+            return cls._from_linked(clusters, node_codes, importance, linked)
+
+        team_count = len(clusters)
+        # One trailing slot for missing endpoints (index -1), in a cluster of its own
+        node_codes = np.array(node_codes + [team_count], dtype=np.int64)
+        importance = np.array(importance + [0.0], dtype=np.float64)
+        sources = np.fromiter((index.get(e["source"], -1) for e in edges), dtype=np.int64, count=len(edges))
+        targets = np.fromiter((index.get(e["target"], -1) for e in edges), dtype=np.int64, count=len(edges))
+        weights = np.fromiter((e.get("weight", DEFAULT_WEIGHT) for e in edges), dtype=np.float64, count=len(edges))
+
+        source_codes, target_codes = node_codes[sources], node_codes[targets]
+        cross = (source_codes != target_codes) & (source_codes < team_count) & (target_codes < team_count)
+        pair_index = source_codes[cross] * team_count + target_codes[cross]
+        edge_scores = weights[cross] * (importance[sources[cross]] + importance[targets[cross]]) / 2
+        size = team_count * team_count
+        scores = np.bincount(pair_index, weights=edge_scores, minlength=size).reshape(team_count, team_count)
+        counts = np.bincount(pair_index, minlength=size).reshape(team_count, team_count)
+        # Coupling is undirected: fold a->b and b->a together
+        scores, counts = scores + scores.T, counts + counts.T
+
+        rows, columns = np.nonzero(counts)
+        pairs = [(clusters[a], clusters[b]) for a, b in zip(rows.tolist(), columns.tolist())]
+        return cls(
+            [clusters[code] for code in np.flatnonzero(counts.any(axis=1)).tolist()],
+            dict(zip(pairs, scores[rows, columns].tolist())),
+            dict(zip(pairs, counts[rows, columns].tolist())),
+        )
+
+    @classmethod
+    def from_pairs(cls, rows: List[Dict[str, Any]]) -> "CouplingMatrix":
+        """From directed per-pair sums ({"source", "target", "score", "count"}), e.g. COUPLING_QUERY's result"""
+        scores: Dict[Pair, float] = {}
+        counts: Dict[Pair, int] = {}
+        for row in rows:
+            for pair in ((row["source"], row["target"]), (row["target"], row["source"])):
+                scores[pair] = scores.get(pair, 0.0) + row["score"]
+                counts[pair] = counts.get(pair, 0) + row["count"]
+        teams = list(dict.fromkeys(source for source, _ in scores))
+        order = {team: i for i, team in enumerate(teams)}
+        ordered = sorted(scores, key=lambda pair: (order[pair[0]], order[pair[1]]))
+        return cls(teams, {p: scores[p] for p in ordered}, {p: counts[p] for p in ordered})
+
+    @classmethod
+    def _from_linked(cls, clusters, node_codes, importance, linked) -> "CouplingMatrix":
+        scores: Dict[Pair, float] = {}
+        counts: Dict[Pair, int] = {}
+        for source, target, weight in linked:
+            a, b = node_codes[source], node_codes[target]
+            if a == b:
+                continue
+            score = weight * (importance[source] + importance[target]) / 2
+            for pair in ((clusters[a], clusters[b]), (clusters[b], clusters[a])):
+                scores[pair] = scores.get(pair, 0.0) + score
+                counts[pair] = counts.get(pair, 0) + 1
+        order = {cluster: i for i, cluster in enumerate(clusters)}
+        ordered = sorted(scores, key=lambda pair: (order[pair[0]], order[pair[1]]))
+        teams = [c for c in clusters if any(pair[0] == c for pair in ordered)]
+        return cls(teams, {p: scores[p] for p in ordered}, {p: counts[p] for p in ordered})
+
+    def differences(self, other: "CouplingMatrix", tolerance: float = 1e-9) -> List[Dict[str, Any]]:
+        """Pairs whose raw score or count differ from `other` (scores compared relatively)"""
+        mismatches = []
+        for pair in sorted(self.scores.keys() | other.scores.keys(), key=str):
+            mine, theirs = self.scores.get(pair, 0.0), other.scores.get(pair, 0.0)
+            if abs(mine - theirs) > tolerance * max(abs(mine), abs(theirs), 1.0) or \
+                    self.counts.get(pair, 0) != other.counts.get(pair, 0):
+                mismatches.append({
+                    "source": pair[0],
+                    "target": pair[1],
+                    "score": [mine, theirs],
+                    "count": [self.counts.get(pair, 0), other.counts.get(pair, 0)],
+                })
+        return mismatches
+
+    @property
+    def max_score(self) -> float:
+        return max(self.scores.values(), default=0.0)
+
+    def pairs(self) -> Iterator[Tuple[str, str, float, int]]:
+        """(source team, target team, score on the 0-100 scale, edge count) for pairs with a positive score"""
+        peak = self.max_score
+        for (source, target), score in self.scores.items():
+            if score > 0:
+                yield source, target, score / peak * 100, self.counts[(source, target)]
+
+
+NodeRecord = Dict[str, Any]   # {"id", "cluster", "importance"}
+EdgeRecord = Dict[str, Any]   # {"id", "source", "target", "weight"}
+
+# Relative score difference below which tracked sums count as unchanged
+SCORE_TOLERANCE = 1e-9
+
+
+class CouplingTracker(IncrementalTracker):
+    """
+    Raw coupling sums for one graph.
+
+    - await load_pairs() returns COUPLING_QUERY's rows
+
+    By default only the per-pair sums are held, so the tracker needs
+    O(teams^2) memory and Python work whatever the size of the graph. They
+    can then only be re-aggregated in the database, so change events
+    schedule that in the background rather than wait for it.
+
+    Per-edge tracking is opt-in, by also passing
+
+    - await load_all(), returning (nodes, edges) as NodeRecord / EdgeRecord lists
+    - await load_nodes(ids), returning per id {"id", "node": NodeRecord or
+      None if deleted, "edges": all incident EdgeRecords}
+
+    Change events then re-read only the affected nodes and their edges and
+    apply the difference, in O(affected edges), at the price of a record per
+    node and edge plus the incident edge ids per node: roughly 0.25 KB per
+    node and 0.5 KB per edge. Recomputes still run the aggregation and
+    reload the records only when its sums disagree with the tracked ones.
+
+    An edge's contribution is always derived from the current node records,
+    and node records only change while their incident edges are taken out,
+    so removing an edge subtracts exactly what adding it added.
+    """
+
+    name = "coupling"
+
+    def __init__(
+        self,
+        load_pairs: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        load_all: Optional[Callable[[], Awaitable[Tuple[List[NodeRecord], List[EdgeRecord]]]]] = None,
+        load_nodes: Optional[Callable[[List[str]], Awaitable[List[Dict[str, Any]]]]] = None,
+    ):
+        super().__init__()
+        self._load_pairs = load_pairs
+        self._load_all = load_all
+        self._load_nodes = load_nodes
+        self.track_edges = load_all is not None and load_nodes is not None
+        self._reset()
+        # Sums of the pairs touched by the current patch, as they were before it
+        self._before: Dict[Pair, Tuple[float, int]] = {}
+        self._fingerprint: Tuple[int, str] = (-1, "")
+
+    def _reset(self) -> None:
+        self.nodes: Dict[str, Tuple[Any, float]] = {}
+        self.edges = {}
+        self.incident = {}
+        self.scores: Dict[Pair, float] = {}
+        self.counts: Dict[Pair, int] = {}
+
+    def _edge_record(self, edge: EdgeRecord) -> Tuple:
+        return edge["source"], edge["target"], edge.get("weight", DEFAULT_WEIGHT)
+
+    def _count_edge(self, edge_id: str, sign: int) -> None:
+        source, target, weight = self.edges[edge_id]
+        if source not in self.nodes or target not in self.nodes:
+            return
+        (a, source_importance), (b, target_importance) = self.nodes[source], self.nodes[target]
+        if a == b:
+            return
+        score = weight * (source_importance + target_importance) / 2
+        for pair in ((a, b), (b, a)):
+            self._before.setdefault(pair, (self.scores.get(pair, 0.0), self.counts.get(pair, 0)))
+            count = self.counts.get(pair, 0) + sign
+            if count <= 0:
+                # Drop the pair outright rather than keep a float residue
+                self.counts.pop(pair, None)
+                self.scores.pop(pair, None)
+            else:
+                self.counts[pair] = count
+                self.scores[pair] = self.scores.get(pair, 0.0) + sign * score
+
+    def _set_node(self, node_id: str, node: Optional[NodeRecord]) -> None:
+        """Replace a node record, taking its incident edges out and back in around the change"""
+        edge_ids = list(self.incident.get(node_id, ()))
+        for edge_id in edge_ids:
+            self._count_edge(edge_id, -1)
+        if node is None:
+            self.nodes.pop(node_id, None)
+        else:
+            self.nodes[node_id] = (node.get("cluster"), node.get("importance", DEFAULT_IMPORTANCE))
+        for edge_id in edge_ids:
+            self._count_edge(edge_id, 1)
+
+    def _adopt(self, aggregated: CouplingMatrix) -> bool:
+        """Take over the aggregated sums if they differ from the tracked ones"""
+        if not self.matrix().differences(aggregated, SCORE_TOLERANCE):
+            return False
+        self.scores, self.counts = dict(aggregated.scores), dict(aggregated.counts)
+        return True
+
+    async def _rebuild(self) -> bool:
+        aggregated = CouplingMatrix.from_pairs(await self._load_pairs())
+        if not self.track_edges:
+            return self._adopt(aggregated)
+        if self.computed_at is not None and not self.matrix().differences(aggregated, SCORE_TOLERANCE):
+            return False
+
+        # First load, or the records missed a write: reload them
+        before = self.matrix()
+        nodes, edges = await self._load_all()
+        self._reset()
+        for node in nodes:
+            self.nodes[node["id"]] = (node.get("cluster"), node.get("importance", DEFAULT_IMPORTANCE))
+        for edge in edges:
+            self._add_edge(edge)
+        return bool(before.differences(self.matrix(), SCORE_TOLERANCE))
+
+    async def refresh_nodes(self, node_ids: Iterable[str]) -> None:
+        if self.track_edges:
+            await super().refresh_nodes(node_ids)
+        else:
+            self.schedule_recompute()
+
+    async def _patch(self, ids: List[str]) -> bool:
+        self._before = {}
+        for item in await self._load_nodes(ids):
+            self._patch_edges(item)
+            node = item["node"]
+            record = None if node is None else (node.get("cluster"), node.get("importance", DEFAULT_IMPORTANCE))
+            if self.nodes.get(item["id"]) != record:
+                self._set_node(item["id"], node)
+        return any(
+            self.counts.get(pair, 0) != count
+            or abs(self.scores.get(pair, 0.0) - score) > SCORE_TOLERANCE * max(abs(score), 1.0)
+            for pair, (score, count) in self._before.items()
+        )
+
+    def fingerprint(self) -> str:
+        """Digest of the current sums: changes only with them, and is the same across restarts"""
+        if self._fingerprint[0] != self.version:
+            rows = [(pair, round(self.scores[pair], 9), self.counts[pair]) for pair in sorted(self.scores, key=str)]
+            self._fingerprint = (self.version, hashlib.sha1(repr(rows).encode()).hexdigest()[:16])
+        return self._fingerprint[1]
+
+    def matrix(self) -> CouplingMatrix:
+        """Snapshot of the current sums; pairs() normalizes against its max_score"""
+        ordered = sorted(self.scores, key=lambda pair: (str(pair[0]), str(pair[1])))
+        return CouplingMatrix(
+            list(dict.fromkeys(source for source, _ in ordered)),
+            {pair: self.scores[pair] for pair in ordered},
+            {pair: self.counts[pair] for pair in ordered},
+        )
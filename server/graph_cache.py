@@ -0,0 +1,137 @@
+"""
+In-process graph snapshot cache for the ProtoGraph API.
+
+Holds the shaped node and edge lists served by /graph and /search
+and rebuilds them only when the graph revision changes. The revision is the
+pair of ArangoDB collection revisions plus a local generation counter that
+is bumped whenever a change is reported through /analytics/notify-update.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class GraphSnapshot:
+    """Immutable view of the graph at one revision"""
+
+    def __init__(self, revision: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+        self.revision = revision
+        self.nodes = nodes
+        self.edges = edges
+        self.built_at = time.time()
+
+        # Pre-folded labels so /search is a plain substring scan
+        self.search_labels = [str(n.get("label") or "").lower() for n in nodes]
+        # Structures built from this snapshot on demand (see GraphSnapshotCache.derive)
+        self.derived: Dict[str, Any] = {}
+
+
+class GraphSnapshotCache:
+    """
+    Revision-checked snapshot holder.
+
+    - await load_revision() must be cheap (collection revision lookups)
+    - await load_graph() does the full scan and returns (nodes, edges)
+    A cold rebuild runs once per revision even under concurrent requests:
+    callers that arrive while a rebuild is running wait for it and reuse
+    its result instead of starting their own scan.
+    """
+
+    def __init__(
+        self,
+        load_revision: Callable[[], Awaitable[str]],
+        load_graph: Callable[[], Awaitable[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]],
+        check_interval: float = 1.0,
+    ):
+        self._load_revision = load_revision
+        self._load_graph = load_graph
+        self._check_interval = check_interval
+
+        self._build_lock = asyncio.Lock()
+        self._derive_locks: Dict[str, asyncio.Lock] = {}
+        # Most recent value of each derived structure, for incremental updates
+        self._latest_derived: Dict[str, Any] = {}
+        self._snapshot: Optional[GraphSnapshot] = None
+        self._generation = 0
+        self._revision: Optional[str] = None
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        """Mark the graph as changed; the next request rebuilds the snapshot"""
+        self._generation += 1
+        self._checked_at = 0.0
+
+    def patch_nodes(self, base: str, revision: str, changes: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Move the snapshot from `base` to `revision` with `changes` ({node id:
+        {field: value}}) applied, instead of rescanning, after a write of just
+        those fields followed by one invalidate(). The caller checks that only
+        the nodes collection moved; returns False if the snapshot is no longer
+        at `base` or another change was reported since.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.revision != base:
+            return False
+        if int(revision.rsplit(".", 1)[1]) != int(base.rsplit(".", 1)[1]) + 1:
+            return False
+        nodes = [{**node, **changes[node["id"]]} if node["id"] in changes else node for node in snapshot.nodes]
+        self._snapshot = GraphSnapshot(revision, nodes, snapshot.edges)
+        return True
+
+    async def revision(self) -> str:
+        """Current graph revision, re-read from ArangoDB at most once per check_interval"""
+        now = time.monotonic()
+        if self._revision is None or now - self._checked_at >= self._check_interval:
+            generation = self._generation
+            self._revision = f"{await self._load_revision()}.{generation}"
+            # An invalidate() during the lookup forces the next call to re-check
+            if generation == self._generation:
+                self._checked_at = now
+        return self._revision
+
+    async def get(self) -> GraphSnapshot:
+        """Return a snapshot matching the current revision, rebuilding it if stale"""
+        revision = await self.revision()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.revision == revision:
+            return snapshot
+
+        async with self._build_lock:
+            # Another request may have rebuilt it while we waited
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.revision == revision:
+                return snapshot
+
+            nodes, edges = await self._load_graph()
+            self._snapshot = GraphSnapshot(revision, nodes, edges)
+            return self._snapshot
+
+    async def derive(
+        self,
+        name: str,
+        build: Callable[[GraphSnapshot], Any],
+        update: Optional[Callable[[Any, GraphSnapshot], Any]] = None,
+    ) -> Any:
+        """
+        Return the structure `name` built from the current snapshot, e.g. an
+        index over its nodes. build(snapshot) runs once per snapshot revision,
+        in a worker thread so large builds don't stall the event loop.
+        If given, update(previous, snapshot) is used instead of build once a
+        previous value exists, so the structure can be patched rather than
+        rebuilt; it returns the value for the new snapshot.
+        """
+        snapshot = await self.get()
+        if name in snapshot.derived:
+            return snapshot.derived[name]
+
+        lock = self._derive_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name not in snapshot.derived:
+                previous = self._latest_derived.get(name)
+                if update is not None and previous is not None:
+                    value = await asyncio.to_thread(update, previous, snapshot)
+                else:
+                    value = await asyncio.to_thread(build, snapshot)
+                snapshot.derived[name] = self._latest_derived[name] = value
+            return snapshot.derived[name]
@@ -0,0 +1,138 @@
+"""
+Columnar wire formats for ProtoGraph graph payloads.
+
+JSON repeats every key on every node and edge; the columnar encodings here
+send one array per field instead, with:
+ - `cluster` / `type` / `community` dictionary-encoded (small int codes + a value list)
+ - edge `source` / `target` as integer indexes into the node arrays
+   (-1 when the endpoint is not part of the node list)
+
+Two encodings are offered, both optional dependencies:
+ - Arrow IPC (pyarrow): two IPC streams back to back, nodes then edges.
+   apache-arrow's `RecordBatchReader.readAll()` yields one reader per stream.
+ - MessagePack (msgpack): {"nodes": {field: column}, "edges": {...}}, where
+   dictionary columns are {"codes": [...], "dictionary": [...]}.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+MSGPACK_MEDIA_ALIASES = {MSGPACK_MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack"}
+
+# String columns with few distinct values, sent as codes + dictionary
+DICTIONARY_COLUMNS = {"cluster", "type", "community"}
+# Edge columns holding node ids, sent as indexes into the node arrays
+NODE_REF_COLUMNS = {"source", "target"}
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick a columnar media type from an Accept header, or None for JSON.
+    The first supported type in header order wins; q-values are ignored.
+    """
+    if not accept:
+        return None
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type == ARROW_MEDIA_TYPE:
+            return ARROW_MEDIA_TYPE
+        if media_type in MSGPACK_MEDIA_ALIASES:
+            return MSGPACK_MEDIA_TYPE
+    return None
+
+
+def is_available(media_type: str) -> bool:
+    if media_type == ARROW_MEDIA_TYPE:
+        return pa is not None
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack is not None
+    return False
+
+
+def dictionary_encode(values: List[Any]) -> Tuple[List[int], List[Any]]:
+    """Map values to int codes in first-seen order"""
+    lookup: Dict[Any, int] = {}
+    codes = []
+    for value in values:
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+        codes.append(code)
+    return codes, list(lookup)
+
+
+def to_columns(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Pivot shaped node/edge records into columns. Works on any field subset
+    (see `fields=`); the columns present follow the keys of the records.
+    """
+    node_index = {n["id"]: i for i, n in enumerate(nodes)}
+
+    def pivot(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if not records:
+            return {}
+        columns: Dict[str, Any] = {}
+        for field in records[0]:
+            values = [r.get(field) for r in records]
+            if field in DICTIONARY_COLUMNS:
+                codes, dictionary = dictionary_encode(values)
+                columns[field] = {"codes": codes, "dictionary": dictionary}
+            elif field in NODE_REF_COLUMNS:
+                columns[field] = [node_index.get(v, -1) for v in values]
+            else:
+                columns[field] = values
+        return columns
+
+    return {
+        "nodes": pivot(nodes),
+        "edges": pivot(edges),
+        "node_count": len(nodes),
+        "edge_count": len(edges),
+    }
+
+
+def encode_msgpack(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> bytes:
+    return msgpack.packb(to_columns(nodes, edges), use_bin_type=True)
+
+
+def _arrow_table(columns: Dict[str, Any]):
+    arrays, names = [], []
+    for field, column in columns.items():
+        if isinstance(column, dict):
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(column["codes"], type=pa.int32()),
+                pa.array(column["dictionary"], type=pa.string()),
+            ))
+        elif field in NODE_REF_COLUMNS:
+            arrays.append(pa.array(column, type=pa.int32()))
+        else:
+            arrays.append(pa.array(column))
+        names.append(field)
+    return pa.table(arrays, names=names)
+
+
+def encode_arrow(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> bytes:
+    columns = to_columns(nodes, edges)
+    sink = pa.BufferOutputStream()
+    for part in ("nodes", "edges"):
+        table = _arrow_table(columns[part])
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(media_type: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> bytes:
+    if media_type == ARROW_MEDIA_TYPE:
+        return encode_arrow(nodes, edges)
+    return encode_msgpack(nodes, edges)
@@ -0,0 +1,141 @@
+"""
+Materialized graph statistics for /stats.
+
+Keeps node, edge, cluster, node-type and edge-type counts and the degree
+distribution as counters, so reading them costs the same whatever the size
+of the graph. The counters are
+
+- recomputed from a full scan at startup, on a schedule and on demand
+- patched on change events: the affected nodes and their incident edges are
+  re-read and diffed against what the counters last saw for them
+
+To diff, the per-node attributes and per-edge endpoints that feed the
+counters are kept alongside them.
+"""
+
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from incremental import IncrementalTracker
+
+NodeRecord = Dict[str, Any]   # {"id", "cluster", "type"}
+EdgeRecord = Dict[str, Any]   # {"id", "source", "target", "type"}
+
+
+def _bump(counter: Counter, key: Any, delta: int) -> None:
+    counter[key] += delta
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def _counts(counter: Counter, name: str) -> List[Dict[str, Any]]:
+    """[{name: value, "count": n}] sorted by value, None first"""
+    return [
+        {name: value, "count": count}
+        for value, count in sorted(counter.items(), key=lambda kv: (kv[0] is not None, str(kv[0])))
+    ]
+
+
+class GraphStats(IncrementalTracker):
+    """
+    Counters for one graph.
+
+    - await load_all() returns (nodes, edges) as NodeRecord / EdgeRecord lists
+    - await load_nodes(ids) returns, per id, {"id", "node": NodeRecord or
+      None if deleted, "edges": all incident EdgeRecords}
+    """
+
+    name = "stats"
+
+    def __init__(
+        self,
+        load_all: Callable[[], Awaitable[Tuple[List[NodeRecord], List[EdgeRecord]]]],
+        load_nodes: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+    ):
+        super().__init__()
+        self._load_all = load_all
+        self._load_nodes = load_nodes
+        self._reset()
+
+    def _reset(self) -> None:
+        self.nodes: Dict[str, Tuple[Any, Any]] = {}
+        self.edges = {}
+        self.incident = {}
+        self.degree: Counter = Counter()
+        self.degree_histogram: Counter = Counter()
+        self.clusters: Counter = Counter()
+        self.node_types: Counter = Counter()
+        self.edge_types: Counter = Counter()
+
+    def _set_degree(self, node_id: str, delta: int) -> None:
+        old = self.degree[node_id]
+        self.degree[node_id] = old + delta
+        if node_id in self.nodes:
+            _bump(self.degree_histogram, old, -1)
+            _bump(self.degree_histogram, old + delta, 1)
+        if self.degree[node_id] == 0:
+            del self.degree[node_id]
+
+    def _add_node(self, node: NodeRecord) -> None:
+        node_id = node["id"]
+        self.nodes[node_id] = (node.get("cluster"), node.get("type"))
+        _bump(self.clusters, node.get("cluster"), 1)
+        _bump(self.node_types, node.get("type"), 1)
+        _bump(self.degree_histogram, self.degree[node_id], 1)
+
+    def _remove_node(self, node_id: str) -> None:
+        cluster, node_type = self.nodes.pop(node_id)
+        _bump(self.clusters, cluster, -1)
+        _bump(self.node_types, node_type, -1)
+        _bump(self.degree_histogram, self.degree[node_id], -1)
+
+    def _edge_record(self, edge: EdgeRecord) -> Tuple:
+        return edge["source"], edge["target"], edge.get("type")
+
+    def _count_edge(self, edge_id: str, sign: int) -> None:
+        source, target, edge_type = self.edges[edge_id]
+        _bump(self.edge_types, edge_type, sign)
+        for endpoint in (source, target):
+            self._set_degree(endpoint, sign)
+
+    async def _rebuild(self) -> bool:
+        nodes, edges = await self._load_all()
+        self._reset()
+        for node in nodes:
+            self._add_node(node)
+        for edge in edges:
+            self._add_edge(edge)
+        return True
+
+    async def _patch(self, ids: List[str]) -> bool:
+        changed = False
+        for item in await self._load_nodes(ids):
+            node_id, node = item["id"], item["node"]
+            changed |= self._patch_edges(item)
+            if self.nodes.get(node_id) != (None if node is None else (node.get("cluster"), node.get("type"))):
+                if node_id in self.nodes:
+                    self._remove_node(node_id)
+                if node is not None:
+                    self._add_node(node)
+                changed = True
+        return changed
+
+    def summary(self) -> Dict[str, Any]:
+        node_count = len(self.nodes)
+        degrees = self.degree_histogram
+        return {
+            "total_nodes": node_count,
+            "total_edges": len(self.edges),
+            "clusters": _counts(self.clusters, "cluster"),
+            "node_types": _counts(self.node_types, "type"),
+            "edge_types": _counts(self.edge_types, "type"),
+            "degree": {
+                "min": min(degrees) if degrees else None,
+                "max": max(degrees) if degrees else None,
+                "mean": round(sum(d * c for d, c in degrees.items()) / node_count, 4) if node_count else None,
+            },
+            "computed_at": self.computed_at,
+            "updated_at": self.updated_at,
+            "stale": self.stale,
+            "error": self.error,
+        }
@@ -0,0 +1,183 @@
+"""
+Coupling history for /analytics/team-coupling/history.
+
+Snapshots of the coupling matrix and graph totals are appended to a local
+SQLite file at three resolutions:
+
+- raw: one row per snapshot and team pair
+- hourly / daily: one row per bucket and team pair, holding the sums of all
+  snapshots that fell into it (upserted as each snapshot is recorded)
+
+Every tier has its own retention, so raw snapshots can be dropped after a
+few days while hourly and daily rows keep the long-term trend. Range
+queries read the coarsest tier that still resolves the requested step, and
+since rows are clustered by (tier, bucket) a query only touches the buckets
+in range.
+
+Averages divide by the number of snapshots in the bucket, so a pair that
+was uncoupled for part of a bucket counts as zero for that part.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# (name, bucket width in seconds); raw rows keep the snapshot time
+TIERS: Tuple[Tuple[str, int], ...] = (("raw", 1), ("hourly", 3600), ("daily", 86400))
+
+TOTAL_FIELDS = ("nodes", "edges", "cross_edges", "teams")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS coupling (
+        tier TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        target TEXT NOT NULL,
+        weight_sum REAL NOT NULL,
+        score_sum REAL NOT NULL,
+        count_sum INTEGER NOT NULL,
+        PRIMARY KEY (tier, bucket, source, target)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS totals (
+        tier TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        samples INTEGER NOT NULL,
+        nodes INTEGER NOT NULL,
+        edges INTEGER NOT NULL,
+        cross_edges INTEGER NOT NULL,
+        teams INTEGER NOT NULL,
+        PRIMARY KEY (tier, bucket)
+    ) WITHOUT ROWID;
+"""
+
+
+class CouplingHistory:
+    """
+    Append-only coupling time series in one SQLite file.
+
+    `retention` maps tier name to seconds kept (0 or missing keeps forever).
+    Methods are synchronous and serialized; call them through
+    asyncio.to_thread from request handlers.
+    """
+
+    def __init__(self, path: str, retention: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.retention = retention or {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def record(
+        self,
+        timestamp: float,
+        pairs: Iterable[Tuple[Any, Any, float, float, int]],
+        totals: Dict[str, int],
+    ) -> None:
+        """
+        Store one snapshot: `pairs` yields (source, target, weight on the
+        0-100 scale, raw score, edge count), `totals` holds TOTAL_FIELDS
+        """
+        pair_rows = [(str(s), str(t), weight, score, count) for s, t, weight, score, count in pairs]
+        total_row = tuple(int(totals.get(field, 0)) for field in TOTAL_FIELDS)
+        with self._lock, self._db:
+            for tier, width in TIERS:
+                bucket = int(timestamp) // width * width
+                self._db.executemany(
+                    """
+                    INSERT INTO coupling VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (tier, bucket, source, target) DO UPDATE SET
+                        weight_sum = weight_sum + excluded.weight_sum,
+                        score_sum = score_sum + excluded.score_sum,
+                        count_sum = count_sum + excluded.count_sum
+                    """,
+                    [(tier, bucket) + row for row in pair_rows],
+                )
+                self._db.execute(
+                    """
+                    INSERT INTO totals VALUES (?, ?, 1, ?, ?, ?, ?)
+                    ON CONFLICT (tier, bucket) DO UPDATE SET
+                        samples = samples + 1,
+                        nodes = nodes + excluded.nodes,
+                        edges = edges + excluded.edges,
+                        cross_edges = cross_edges + excluded.cross_edges,
+                        teams = teams + excluded.teams
+                    """,
+                    (tier, bucket) + total_row,
+                )
+            self._prune(timestamp)
+
+    def _prune(self, now: float) -> None:
+        for tier, _ in TIERS:
+            keep = self.retention.get(tier)
+            if keep:
+                cutoff = int(now - keep)
+                self._db.execute("DELETE FROM coupling WHERE tier = ? AND bucket < ?", (tier, cutoff))
+                self._db.execute("DELETE FROM totals WHERE tier = ? AND bucket < ?", (tier, cutoff))
+
+    def tier_for(self, start: float, step: int, now: Optional[float] = None) -> str:
+        """
+        Coarsest tier no wider than `step`; if that tier has already pruned
+        `start`, the finest tier that still reaches back to it
+        """
+        now = time.time() if now is None else now
+        candidates = [name for name, width in TIERS if width <= step] or [TIERS[0][0]]
+        names = [name for name, _ in TIERS]
+        for name in names[names.index(candidates[-1]):]:
+            keep = self.retention.get(name)
+            if not keep or start >= now - keep:
+                return name
+        return names[-1]
+
+    def query(self, start: float, end: float, step: int) -> Dict[str, Any]:
+        """Per-step averages between `start` and `end` (epoch seconds, inclusive)"""
+        tier = self.tier_for(start, step)
+        # Buckets of the chosen tier that start inside the range
+        width = dict(TIERS)[tier]
+        low, high = int(start) // width * width, int(end)
+        args = {"tier": tier, "low": low, "high": high, "step": step}
+        with self._lock:
+            totals = self._db.execute(
+                f"""
+                SELECT bucket / :step * :step AS t, SUM(samples), {", ".join(f"SUM({f})" for f in TOTAL_FIELDS)}
+                FROM totals
+                WHERE tier = :tier AND bucket BETWEEN :low AND :high
+                GROUP BY t ORDER BY t
+                """,
+                args,
+            ).fetchall()
+            pairs = self._db.execute(
+                """
+                SELECT bucket / :step * :step AS t, source, target, SUM(weight_sum), SUM(score_sum), SUM(count_sum)
+                FROM coupling
+                WHERE tier = :tier AND bucket BETWEEN :low AND :high
+                GROUP BY t, source, target ORDER BY t, source, target
+                """,
+                args,
+            ).fetchall()
+
+        samples = {row[0]: row[1] for row in totals}
+        return {
+            "tier": tier,
+            "step": step,
+            "totals": [
+                {"timestamp": t, "samples": n, **{f: s / n for f, s in zip(TOTAL_FIELDS, sums)}}
+                for t, n, *sums in totals
+            ],
+            "pairs": [
+                {
+                    "timestamp": t,
+                    "source": source,
+                    "target": target,
+                    "weight": weight / samples[t],
+                    "score": score / samples[t],
+                    "connection_count": count / samples[t],
+                }
+                for t, source, target, weight, score, count in pairs
+            ],
+        }
@@ -0,0 +1,48 @@
+"""
+HTTP revalidation helpers shared by the ProtoGraph APIs.
+
+Responses derived from the graph get a strong ETag computed from the graph
+revision plus whatever selects the representation (query parameters,
+negotiated media type). A matching If-None-Match is answered with 304
+before any payload is built.
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Request, Response
+
+# How long clients may reuse a response before revalidating (seconds).
+# The default of 0 means "always revalidate", which is cheap thanks to 304s.
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"max-age={HTTP_CACHE_MAX_AGE}, must-revalidate"
+
+
+def make_etag(revision: str, *variant: object) -> str:
+    """Strong ETag for one representation of the graph at `revision`"""
+    digest = hashlib.sha1(repr((revision,) + variant).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag`"""
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return etag in candidates
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
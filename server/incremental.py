@@ -0,0 +1,183 @@
+"""
+Shared machinery for aggregates kept up to date from change events
+(graph_stats.GraphStats, coupling.CouplingTracker).
+
+A subclass decides what is accumulated:
+
+- _rebuild() recomputes everything from the database
+- _patch(ids) re-reads the given nodes and applies the difference
+
+Both return whether the aggregate actually changed. IncrementalTracker
+supplies the rest: updates are serialized, background recomputes report
+their errors, a schedule picks up writes that were never reported, and
+`version` is bumped only when the aggregate changed, so it can key ETags.
+
+Subclasses that patch edge by edge keep per-edge records and, per node, the
+ids of its incident edges (_add_edge / _remove_edge / _patch_edges); those
+cost memory in proportion to the whole graph.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+EdgeRecord = Dict[str, Any]   # {"id", "source", "target", ...}
+
+
+def node_refresh_query(node_projection: str, edge_projection: str) -> str:
+    """
+    AQL returning, per id in @ids, {"id", "node": projection of `n` or null
+    if deleted, "edges": projections of `e` for all incident edges}, read
+    through the edge index
+    """
+    return f"""
+        FOR id IN @ids
+            LET n = DOCUMENT(id)
+            LET incident = UNION_DISTINCT(
+                (FOR e IN edges FILTER e._from == id RETURN {edge_projection}),
+                (FOR e IN edges FILTER e._to == id RETURN {edge_projection})
+            )
+            RETURN {{id, node: n == null ? null : {node_projection}, edges: incident}}
+    """
+
+
+class IncrementalTracker:
+    """Base class; `name` labels log messages"""
+
+    name = "aggregate"
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._recompute_task: Optional[asyncio.Task] = None
+        self._rerun = False
+        self.edges: Dict[str, Tuple] = {}
+        self.incident: Dict[str, set] = {}
+        self.computed_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        # Bumped whenever the aggregate changes (used for ETags)
+        self.version = 0
+        self.stale = True
+        # Message of the last failed background recompute, cleared by the next success
+        self.error: Optional[str] = None
+
+    # ----- what subclasses accumulate -----
+
+    async def _rebuild(self) -> bool:
+        raise NotImplementedError
+
+    async def _patch(self, ids: List[str]) -> bool:
+        raise NotImplementedError
+
+    def _edge_record(self, edge: EdgeRecord) -> Tuple:
+        """What is kept per edge; (source, target, ...)"""
+        raise NotImplementedError
+
+    def _count_edge(self, edge_id: str, sign: int) -> None:
+        """Add (sign=1) or subtract (sign=-1) a recorded edge's contribution"""
+        raise NotImplementedError
+
+    # ----- per-edge bookkeeping -----
+
+    def _add_edge(self, edge: EdgeRecord) -> None:
+        edge_id = edge["id"]
+        self.edges[edge_id] = self._edge_record(edge)
+        for endpoint in (edge["source"], edge["target"]):
+            self.incident.setdefault(endpoint, set()).add(edge_id)
+        self._count_edge(edge_id, 1)
+
+    def _remove_edge(self, edge_id: str) -> None:
+        self._count_edge(edge_id, -1)
+        source, target = self.edges.pop(edge_id)[:2]
+        for endpoint in (source, target):
+            members = self.incident.get(endpoint)
+            if members is not None:
+                members.discard(edge_id)
+                if not members:
+                    del self.incident[endpoint]
+
+    def _patch_edges(self, item: Dict[str, Any]) -> bool:
+        """Bring the recorded edges of item["id"] in line with item["edges"]"""
+        changed = False
+        current = {edge["id"]: edge for edge in item["edges"]}
+        for edge_id in list(self.incident.get(item["id"], ())):
+            if edge_id not in current:
+                self._remove_edge(edge_id)
+                changed = True
+        for edge_id, edge in current.items():
+            known = self.edges.get(edge_id)
+            if known != self._edge_record(edge):
+                if known is not None:
+                    self._remove_edge(edge_id)
+                self._add_edge(edge)
+                changed = True
+        return changed
+
+    # ----- scheduling -----
+
+    def _touch(self) -> None:
+        self.version += 1
+        self.updated_at = time.time()
+
+    async def recompute(self) -> None:
+        """Rebuild the aggregate from the database"""
+        async with self._lock:
+            changed = await self._rebuild()
+            self.computed_at = time.time()
+            # Still stale if a change was reported while this one ran
+            self.stale = self._rerun
+            self.error = None
+            if changed:
+                self._touch()
+
+    def schedule_recompute(self) -> None:
+        """
+        Mark the aggregate stale and recompute it in the background; if a
+        recompute is already running, another one follows it, since that one
+        may have read the database before the change being reported
+        """
+        self.stale = True
+        if self._recompute_task is None or self._recompute_task.done():
+            self._recompute_task = asyncio.create_task(self._recompute_queued())
+            self._recompute_task.add_done_callback(self._recompute_done)
+        else:
+            self._rerun = True
+
+    async def _recompute_queued(self) -> None:
+        self._rerun = True
+        while self._rerun:
+            self._rerun = False
+            await self.recompute()
+
+    def _recompute_done(self, task: asyncio.Task) -> None:
+        # Retrieve the exception so it is reported here rather than as "never retrieved";
+        # the aggregate stays marked stale until a recompute succeeds
+        if task.cancelled() or task.exception() is None:
+            return
+        self.error = str(task.exception())
+        print(f"⚠️ Background {self.name} recompute failed: {self.error}")
+
+    async def refresh_nodes(self, node_ids: Iterable[str]) -> None:
+        """Re-read the given nodes and apply the difference"""
+        ids = sorted(set(node_ids))
+        if not ids:
+            return
+        async with self._lock:
+            if await self._patch(ids):
+                self._touch()
+
+    async def ensure_ready(self) -> None:
+        """Block until the aggregate has been computed at least once"""
+        if self.computed_at is None:
+            if self._recompute_task is not None and not self._recompute_task.done():
+                await self._recompute_task
+            else:
+                await self.recompute()
+
+    async def run_schedule(self, interval: float) -> None:
+        """Recompute every `interval` seconds, to pick up writes that were never reported"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.recompute()
+            except Exception as e:
+                print(f"⚠️ Scheduled {self.name} recompute failed: {e}")
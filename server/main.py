@@ -1,16 +1,77 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import ollama
 import os
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Dict, Optional
-from collections import defaultdict
+
+import http_cache
+from analytics_cache import AnalyticsCache, CachedResult
+from arango_async import AsyncArangoDatabase
+from coupling import COUPLING_QUERY, DEFAULT_IMPORTANCE, DEFAULT_WEIGHT, CouplingMatrix, CouplingTracker
+from history import CouplingHistory
+from incremental import node_refresh_query
+from neighbor_cache import node_id
 
 load_dotenv()
 
-app = FastAPI()
+# ========== ARANGODB CONFIGURATION ==========
+
+ARANGO_HOST = os.getenv("ARANGO_HOST", "http://localhost:8529")
+ARANGO_USER = os.getenv("ARANGO_USER", "root")
+ARANGO_PASSWORD = os.getenv("ARANGO_PASSWORD", "")
+ARANGO_DB = os.getenv("ARANGO_DB", "protograph")
+ARANGO_POOL_SIZE = int(os.getenv("ARANGO_POOL_SIZE", "20"))
+ARANGO_TIMEOUT = float(os.getenv("ARANGO_TIMEOUT", "30"))
+
+# Serve coupling analytics from MOCK_GRAPH_DATA instead of the database (offline demos)
+USE_MOCK_GRAPH = os.getenv("USE_MOCK_GRAPH", "false").lower() in ("1", "true", "yes")
+# Reconciliation of the tracked coupling sums against the AQL aggregation, in seconds (0 disables)
+COUPLING_RECOMPUTE_INTERVAL = float(os.getenv("COUPLING_RECOMPUTE_INTERVAL", "300"))
+# Keep per-node and per-edge records so change events only re-read the affected
+# edges; costs roughly 0.25 KB per node and 0.5 KB per edge (see coupling.CouplingTracker)
+COUPLING_EDGE_TRACKING = os.getenv("COUPLING_EDGE_TRACKING", "false").lower() in ("1", "true", "yes")
+
+# Seconds a computed analytics result is reused while the graph revision is unchanged
+# (0 = until the revision changes, keeping its calculation_timestamp)
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "0"))
+
+# Coupling history snapshots: SQLite file (recording is off unless set), interval in seconds,
+# and how many days each resolution is kept (0 keeps forever)
+COUPLING_HISTORY_PATH = os.getenv("COUPLING_HISTORY_PATH", "")
+COUPLING_HISTORY_INTERVAL = float(os.getenv("COUPLING_HISTORY_INTERVAL", "300"))
+COUPLING_HISTORY_RETENTION_DAYS = {
+    "raw": float(os.getenv("COUPLING_HISTORY_RAW_DAYS", "2")),
+    "hourly": float(os.getenv("COUPLING_HISTORY_HOURLY_DAYS", "90")),
+    "daily": float(os.getenv("COUPLING_HISTORY_DAILY_DAYS", "0")),
+}
+
+db = None if USE_MOCK_GRAPH else AsyncArangoDatabase(
+    ARANGO_HOST, ARANGO_DB, ARANGO_USER, ARANGO_PASSWORD, pool_size=ARANGO_POOL_SIZE, timeout=ARANGO_TIMEOUT)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    schedules = []
+    if db:
+        coupling_tracker.schedule_recompute()
+        if COUPLING_RECOMPUTE_INTERVAL > 0:
+            schedules.append(asyncio.create_task(coupling_tracker.run_schedule(COUPLING_RECOMPUTE_INTERVAL)))
+    if coupling_history and COUPLING_HISTORY_INTERVAL > 0:
+        schedules.append(asyncio.create_task(run_history_schedule(COUPLING_HISTORY_INTERVAL)))
+    yield
+    for schedule in schedules:
+        schedule.cancel()
+    if coupling_history:
+        coupling_history.close()
+    if db:
+        await db.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,8 +86,8 @@ app.add_middleware(
 OLLAMA_HOST = "http://10.10.80.99:4001"
 OLLAMA_MODEL = "gpt-oss:120b"
 
-# Initialize Ollama client
-ollama_client = ollama.Client(host=OLLAMA_HOST)
+# Initialize Ollama client (async, so model calls don't block the event loop)
+ollama_client = ollama.AsyncClient(host=OLLAMA_HOST)
 
 # ========== MODELS ==========
 
@@ -39,6 +100,12 @@ class UpdateNotification(BaseModel):
     affected_nodes: List[str] = []
     timestamp: str
 
+# Change notifications that do not modify the graph (and so keep ETags valid)
+NON_DATA_CHANGE_TYPES = {"node_selection", "gem_saved"}
+
+# Bumped on every graph change notification; analytics ETags derive from it
+graph_revision = 0
+
 # ========== MOCK GRAPH DATA ==========
 
 MOCK_GRAPH_DATA = {
@@ -84,8 +151,10 @@ MOCK_GRAPH_DATA = {
 
 # ========== HELPER FUNCTIONS ==========
 
-def format_team_name(cluster_id: str) -> str:
+def format_team_name(cluster_id: Optional[str]) -> str:
     """Convert cluster IDs to display names"""
+    if cluster_id is None:
+        return "Unassigned"
     name_map = {
         "content_dev": "Content Dev",
         "range": "Range",
@@ -94,66 +163,89 @@ def format_team_name(cluster_id: str) -> str:
     }
     return name_map.get(cluster_id, cluster_id.replace("_", " ").title())
 
-def calculate_coupling_matrix(graph_data: Dict) -> Dict[str, Dict[str, float]]:
-    """
-    Calculate weighted coupling between teams based on:
-    - Number of cross-team edges
-    - Edge weights
-    - Node importance
-    """
-    edges = graph_data["edges"]
-    nodes = {n["id"]: n for n in graph_data["nodes"]}
-    
-    coupling = defaultdict(lambda: defaultdict(float))
-    
-    for edge in edges:
-        source_node = nodes.get(edge["source"])
-        target_node = nodes.get(edge["target"])
-        
-        if not source_node or not target_node:
-            continue
-            
-        source_cluster = source_node["cluster"]
-        target_cluster = target_node["cluster"]
-        
-        # Only count cross-team edges
-        if source_cluster != target_cluster:
-            # Weight = edge weight * average node importance
-            avg_importance = (source_node.get("importance", 0.5) + 
-                            target_node.get("importance", 0.5)) / 2
-            coupling_score = edge.get("weight", 0.5) * avg_importance
-            
-            coupling[source_cluster][target_cluster] += coupling_score
-            coupling[target_cluster][source_cluster] += coupling_score
-    
-    # Normalize to 0-100 scale
-    max_coupling = max(
-        (max(targets.values()) if targets else 0) 
-        for targets in coupling.values()
+COUPLING_NODE_PROJECTION = "{id: n._id, cluster: n.cluster, importance: NOT_NULL(n.importance, @importance)}"
+COUPLING_EDGE_PROJECTION = "{id: e._id, source: e._from, target: e._to, weight: NOT_NULL(e.weight, @weight)}"
+COUPLING_DEFAULTS = {"weight": DEFAULT_WEIGHT, "importance": DEFAULT_IMPORTANCE}
+
+async def load_coupling_graph():
+    """Full scan of the attributes coupling is computed from"""
+    return await asyncio.gather(
+        db.query(f"FOR n IN nodes RETURN {COUPLING_NODE_PROJECTION}", {"importance": DEFAULT_IMPORTANCE}),
+        db.query(f"FOR e IN edges RETURN {COUPLING_EDGE_PROJECTION}", {"weight": DEFAULT_WEIGHT}),
     )
-    
-    if max_coupling > 0:
-        for source in coupling:
-            for target in coupling[source]:
-                coupling[source][target] = (coupling[source][target] / max_coupling) * 100
-    
-    return coupling
 
-def get_edge_count(graph_data: Dict, cluster1: str, cluster2: str) -> int:
-    """Count direct edges between two clusters"""
-    edges = graph_data["edges"]
-    nodes = {n["id"]: n for n in graph_data["nodes"]}
-    
-    count = 0
-    for edge in edges:
-        source_cluster = nodes.get(edge["source"], {}).get("cluster")
-        target_cluster = nodes.get(edge["target"], {}).get("cluster")
-        
-        if (source_cluster == cluster1 and target_cluster == cluster2) or \
-           (source_cluster == cluster2 and target_cluster == cluster1):
-            count += 1
-    
-    return count
+async def load_coupling_pairs() -> List[Dict]:
+    """Per-pair sums, aggregated inside the database"""
+    return await db.query(COUPLING_QUERY, COUPLING_DEFAULTS)
+
+async def load_coupling_nodes(ids: List[str]) -> List[Dict]:
+    """Current state of the given nodes and all their edges, via the edge index"""
+    query = node_refresh_query(COUPLING_NODE_PROJECTION, COUPLING_EDGE_PROJECTION)
+    return await db.query(query, {"ids": ids, **COUPLING_DEFAULTS})
+
+coupling_tracker = CouplingTracker(
+    load_coupling_pairs,
+    *((load_coupling_graph, load_coupling_nodes) if COUPLING_EDGE_TRACKING else ()),
+)
+
+async def load_coupling() -> CouplingMatrix:
+    """Raw team coupling, maintained incrementally from change events (or from the mock graph)"""
+    if db is None:
+        return CouplingMatrix.from_graph(MOCK_GRAPH_DATA["nodes"], MOCK_GRAPH_DATA["edges"])
+    await coupling_tracker.ensure_ready()
+    return coupling_tracker.matrix()
+
+async def coupling_totals(coupling: CouplingMatrix) -> Dict[str, int]:
+    """Graph totals stored next to each coupling snapshot"""
+    if db is None:
+        nodes, edges = len(MOCK_GRAPH_DATA["nodes"]), len(MOCK_GRAPH_DATA["edges"])
+    else:
+        (counts,) = await db.query("RETURN {nodes: LENGTH(nodes), edges: LENGTH(edges)}")
+        nodes, edges = counts["nodes"], counts["edges"]
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        # Each cross-team edge is counted in both directions
+        "cross_edges": sum(coupling.counts.values()) // 2,
+        "teams": len(coupling.teams),
+    }
+
+async def record_history() -> None:
+    """Append the current coupling matrix and totals to the history store"""
+    coupling = (await team_coupling_analytics()).value
+    totals = await coupling_totals(coupling)
+    pairs = [
+        (source, target, weight, coupling.scores[(source, target)], count)
+        for source, target, weight, count in coupling.pairs()
+    ]
+    await asyncio.to_thread(coupling_history.record, time.time(), pairs, totals)
+
+async def run_history_schedule(interval: float) -> None:
+    """Record a history snapshot every `interval` seconds"""
+    while True:
+        try:
+            await record_history()
+        except Exception as e:
+            print(f"⚠️ Coupling history snapshot failed: {e}")
+        await asyncio.sleep(interval)
+
+coupling_history = CouplingHistory(
+    COUPLING_HISTORY_PATH,
+    {tier: days * 86400 for tier, days in COUPLING_HISTORY_RETENTION_DAYS.items()},
+) if COUPLING_HISTORY_PATH else None
+
+async def coupling_revision() -> str:
+    """Change detector for the coupling ETags: changes only when the tracked sums do"""
+    if db is None:
+        return str(graph_revision)
+    await coupling_tracker.ensure_ready()
+    return coupling_tracker.fingerprint()
+
+analytics_cache = AnalyticsCache(coupling_revision, ANALYTICS_CACHE_TTL)
+
+async def team_coupling_analytics() -> CachedResult:
+    """The coupling matrix every coupling view renders from, computed once per revision"""
+    return await analytics_cache.get("team-coupling", load_coupling)
 
 # ========== CHAT ENDPOINT ==========
 
@@ -178,7 +270,7 @@ async def chat(request: ChatRequest):
         ]
         
         # Call Ollama using the official library
-        response = ollama_client.chat(
+        response = await ollama_client.chat(
             model=OLLAMA_MODEL,
             messages=messages
         )
@@ -192,46 +284,66 @@ async def chat(request: ChatRequest):
 
 # ========== ANALYTICS ENDPOINTS ==========
 
-@app.get("/analytics/team-coupling")
-async def get_team_coupling():
-    """
-    Calculate team coupling scores based on cross-cluster edge weights
-    Updates in real-time as graph changes
-    """
-    
-    graph_data = MOCK_GRAPH_DATA
-    coupling_matrix = calculate_coupling_matrix(graph_data)
+def build_team_coupling(analytics: CachedResult) -> Dict:
+    """Render the team coupling heatmap payload from a computed result"""
+    coupling = analytics.value
     
-    # Format for Power BI consumption
+    # Format for Power BI consumption; every row carries the time of the calculation
     power_bi_format = []
-    for source_team, targets in coupling_matrix.items():
-        for target_team, weight in targets.items():
-            if weight > 0:
-                power_bi_format.append({
-                    "source": format_team_name(source_team),
-                    "target": format_team_name(target_team),
-                    "weight": round(weight, 2),
-                    "connection_count": get_edge_count(graph_data, source_team, target_team),
-                    "last_updated": datetime.now().isoformat()
-                })
+    for source_team, target_team, weight, connection_count in coupling.pairs():
+        power_bi_format.append({
+            "source": format_team_name(source_team),
+            "target": format_team_name(target_team),
+            "weight": round(weight, 2),
+            "connection_count": connection_count,
+            "last_updated": analytics.calculation_timestamp
+        })
     
     return {
         "visualization_type": "matrix_heatmap",
         "metric": "Team Coupling Score",
         "data_points": power_bi_format,
         "metadata": {
-            "total_teams": len(coupling_matrix),
+            "total_teams": len(coupling.teams),
             "total_connections": len(power_bi_format),
-            "calculation_timestamp": datetime.now().isoformat()
+            "calculation_timestamp": analytics.calculation_timestamp
         }
     }
 
+def coupling_etag(analytics: CachedResult, view: str) -> str:
+    return http_cache.make_etag(analytics.revision, view)
+
+@app.get("/analytics/team-coupling")
+async def get_team_coupling(request: Request, response: Response):
+    """
+    Calculate team coupling scores based on cross-cluster edge weights
+    Updates in real-time as graph changes
+    """
+    try:
+        analytics = await team_coupling_analytics()
+        etag = coupling_etag(analytics, "team-coupling")
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag)
+        coupling_data = build_team_coupling(analytics)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to calculate team coupling: {str(e)}")
+
+    http_cache.set_cache_headers(response, etag)
+    return coupling_data
+
 @app.get("/analytics/team-coupling-table")
-async def get_team_coupling_table():
+async def get_team_coupling_table(request: Request, response: Response):
     """
     Flattened table format for easier Power BI consumption
     """
-    coupling_data = await get_team_coupling()
+    try:
+        analytics = await team_coupling_analytics()
+        etag = coupling_etag(analytics, "team-coupling-table")
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag)
+        coupling_data = build_team_coupling(analytics)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to calculate team coupling: {str(e)}")
     
     rows = []
     for dp in coupling_data["data_points"]:
@@ -243,9 +355,59 @@ async def get_team_coupling_table():
             "Last Updated": dp["last_updated"]
         })
     
+    http_cache.set_cache_headers(response, etag)
     return {
         "rows": rows,
-        "refresh_time": datetime.now().isoformat()
+        "refresh_time": analytics.calculation_timestamp,
+        "calculation_timestamp": analytics.calculation_timestamp
+    }
+
+def parse_time(value: Optional[str], default: float) -> float:
+    """ISO 8601 timestamp or epoch seconds -> epoch seconds"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp: {value}")
+
+@app.get("/analytics/team-coupling/history")
+async def get_team_coupling_history(
+    start: Optional[str] = Query(None, alias="from", description="ISO 8601 or epoch seconds (default: 24h before `to`)"),
+    end: Optional[str] = Query(None, alias="to", description="ISO 8601 or epoch seconds (default: now)"),
+    step: int = Query(3600, ge=1, description="Bucket size in seconds"),
+):
+    """
+    Team coupling over time, averaged per `step`. Served from the raw,
+    hourly or daily snapshots, whichever is the coarsest that still
+    resolves `step` within its retention.
+    """
+    if coupling_history is None:
+        raise HTTPException(status_code=404, detail="Coupling history is disabled (COUPLING_HISTORY_PATH is not set)")
+    end_ts = parse_time(end, time.time())
+    start_ts = parse_time(start, end_ts - 86400)
+    if start_ts > end_ts:
+        raise HTTPException(status_code=400, detail="`from` must not be after `to`")
+
+    try:
+        history = await asyncio.to_thread(coupling_history.query, start_ts, end_ts, step)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read coupling history: {str(e)}")
+
+    for point in history["totals"] + history["pairs"]:
+        point["timestamp"] = datetime.fromtimestamp(point["timestamp"]).isoformat()
+    for point in history["pairs"]:
+        point["source"] = format_team_name(point["source"])
+        point["target"] = format_team_name(point["target"])
+        point["weight"] = round(point["weight"], 2)
+    return {
+        "from": datetime.fromtimestamp(start_ts).isoformat(),
+        "to": datetime.fromtimestamp(end_ts).isoformat(),
+        **history,
     }
 
 @app.post("/analytics/notify-update")
@@ -254,8 +416,24 @@ async def notify_powerbi_update(update_data: UpdateNotification):
     Called by ProtoGraph frontend when graph changes
     Logs update for Power BI refresh triggers
     """
+    global graph_revision
+
     print(f"🔄 Graph update received: {update_data.change_type}")
     print(f"   Affected nodes: {update_data.affected_nodes}")
+
+    if update_data.change_type not in NON_DATA_CHANGE_TYPES:
+        graph_revision += 1
+        if db and update_data.affected_nodes:
+            # With COUPLING_EDGE_TRACKING only the edges around the changed nodes
+            # are re-read and re-scored; otherwise the sums are re-aggregated in
+            # the background
+            try:
+                await coupling_tracker.refresh_nodes(node_id(n) for n in update_data.affected_nodes)
+            except Exception as e:
+                print(f"⚠️ Coupling refresh failed, recomputing: {e}")
+                coupling_tracker.schedule_recompute()
+        elif db:
+            coupling_tracker.schedule_recompute()
     
     return {
         "status": "acknowledged",
@@ -263,6 +441,37 @@ async def notify_powerbi_update(update_data: UpdateNotification):
         "timestamp": datetime.now().isoformat()
     }
 
+# ========== COUPLING CONSISTENCY CHECK ==========
+
+@app.get("/health/coupling")
+async def check_coupling():
+    """
+    Consistency check: compare the incrementally maintained sums and the
+    AQL aggregation against the Python reference computed from a full scan
+    of both collections
+    """
+    if db is None:
+        raise HTTPException(status_code=400, detail="USE_MOCK_GRAPH is set; there is no database to check")
+
+    try:
+        tracked = await load_coupling()
+        rows, (nodes, edges) = await asyncio.gather(load_coupling_pairs(), load_coupling_graph())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Coupling check failed: {str(e)}")
+
+    reference = CouplingMatrix.from_graph(nodes, edges)
+    mismatches = {
+        "incremental": reference.differences(tracked, tolerance=1e-6),
+        "aql": reference.differences(CouplingMatrix.from_pairs(rows)),
+    }
+    return {
+        "status": "consistent" if not any(mismatches.values()) else "inconsistent",
+        "pairs": len(reference.scores),
+        "stale": coupling_tracker.stale,
+        "cache": analytics_cache.status(),
+        "mismatches": mismatches,
+    }
+
 # ========== OLLAMA HEALTH CHECK ==========
 
 @app.get("/health/ollama")
@@ -272,7 +481,7 @@ async def check_ollama():
     """
     try:
         # List available models
-        models_response = ollama_client.list()
+        models_response = await ollama_client.list()
         model_names = [m['name'] for m in models_response.get('models', [])]
         
         return {
@@ -303,6 +512,7 @@ async def root():
     return {
         "service": "ProtoGraph Analytics API",
         "status": "online",
+        "graph_source": "mock" if db is None else f"arango:{ARANGO_DB}",
         "llm_backend": "Ollama (official library)",
         "ollama_host": OLLAMA_HOST,
         "ollama_model": OLLAMA_MODEL,
@@ -311,6 +521,8 @@ async def root():
             "team_coupling": "/analytics/team-coupling",
             "team_coupling_table": "/analytics/team-coupling-table",
             "notify_update": "/analytics/notify-update",
+            "team_coupling_history": "/analytics/team-coupling/history",
+            "coupling_health": "/health/coupling",
             "ollama_health": "/health/ollama"
         }
     }
\ No newline at end of file
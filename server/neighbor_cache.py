@@ -0,0 +1,152 @@
+"""
+Result cache for /neighbors.
+
+Keeps recently served neighborhoods in an LRU bounded by an approximate byte
+budget, with an optional TTL. Each entry remembers the ids of the nodes it
+contains so a reported change can evict exactly the neighborhoods it could
+affect:
+
+- a node or edge change is reported through /analytics/notify-update with
+  its endpoints in affected_nodes (both endpoints of a changed edge; callers
+  must list them); any neighborhood that can see the change contains one of
+  them (a new edge only extends a traversal through a node it has already
+  reached)
+- truncated results may be cut at a different place after any change, so
+  they are evicted on every reported change
+- a graph revision change that was not reported (e.g. a direct database
+  write) clears the whole cache. After a reported change the entries are
+  only carried over (rebase) if the revision moved in no collection the
+  change does not write; otherwise the cache is cleared as well. Unreported
+  writes to the same collection in that window can still be carried over,
+  so entries are bounded by the TTL too.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+
+class _Entry:
+    __slots__ = ("value", "nodes", "size", "truncated", "expires_at")
+
+    def __init__(self, value: Dict[str, Any], nodes: Set[str], size: int, truncated: bool, expires_at: float):
+        self.value = value
+        self.nodes = nodes
+        self.size = size
+        self.truncated = truncated
+        self.expires_at = expires_at
+
+
+class NeighborhoodCache:
+    """
+    LRU of /neighbors responses for one graph revision.
+
+    max_bytes bounds the summed JSON size of cached responses; ttl (seconds,
+    0 = none) bounds how long an entry is served.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._revision: Optional[str] = None
+        # Bumped on every invalidation so results computed before it are not stored
+        self.generation = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _sync(self, revision: str) -> None:
+        if revision != self._revision:
+            if self._revision is not None:
+                self.clear()
+            self._revision = revision
+
+    def get(self, key: Hashable, revision: str) -> Optional[Dict[str, Any]]:
+        """Cached response for `key` at `revision`, or None"""
+        self._sync(revision)
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl and entry.expires_at <= time.monotonic():
+            self._drop(key)
+            self.counters["expirations"] += 1
+            entry = None
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return entry.value
+
+    def put(self, key: Hashable, revision: str, value: Dict[str, Any], generation: int) -> None:
+        """
+        Store a response computed at `revision`. `generation` is the value of
+        self.generation read before computing it; if an invalidation happened
+        in between, the response may be stale and is not stored.
+        """
+        if not self.enabled or generation != self.generation:
+            return
+        self._sync(revision)
+        size = len(json.dumps(value, separators=(",", ":"), default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        nodes = {n["id"] for n in value["nodes"]}
+        if value.get("center"):
+            nodes.add(node_id(value["center"]))
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        self._entries[key] = _Entry(value, nodes, size, bool(value.get("truncated")), expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    def invalidate_nodes(self, node_ids: Iterable[str]) -> int:
+        """Evict entries containing any of `node_ids`, and all truncated entries"""
+        changed = {node_id(n) for n in node_ids}
+        stale = [key for key, entry in self._entries.items() if entry.truncated or entry.nodes & changed]
+        for key in stale:
+            self._drop(key)
+        self.generation += 1
+        self.counters["invalidations"] += len(stale)
+        return len(stale)
+
+    @property
+    def revision(self) -> Optional[str]:
+        return self._revision
+
+    def rebase(self, revision: str) -> None:
+        """Carry the remaining entries over to `revision` after a reported change"""
+        self._revision = revision
+
+    def clear(self) -> None:
+        self.counters["invalidations"] += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "revision": self._revision,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+def node_id(key: str) -> str:
+    """Accept both bare keys and 'nodes/<key>' ids"""
+    return key if "/" in key else f"nodes/{key}"
@@ -0,0 +1,249 @@
+"""
+In-process typeahead index for /search/suggest.
+
+Two structures over the folded (lower-cased, accent-free) node labels:
+
+- word postings: for every word, the nodes whose label contains it, kept
+  sorted by importance (highest first). A prefix query bisects the sorted
+  vocabulary for the words it could complete and merges their postings
+  lazily, so the k most important matches come out first without looking
+  at the rest.
+- trigram postings: for every three-character sequence, the nodes whose
+  label contains it, sorted the same way. An infix query walks the postings
+  of its rarest trigram and keeps the labels that contain the whole query,
+  again stopping after k.
+
+Word-prefix matches always rank above infix-only matches; within each group
+higher importance wins, then label, then id, so a patched index suggests the
+same nodes in the same order as a fresh build. The index is built from a
+graph_cache.GraphSnapshot and patched (apply) when only a few nodes changed;
+posting lists are never modified, only replaced. Patching leaves the slots
+of removed nodes empty; once they pile up, apply rebuilds instead.
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+NGRAM_SIZE = 3
+# Upper bound on postings read per query, so very common prefixes/trigrams stay cheap
+MAX_SCAN = 20_000
+# Above this share of changed nodes a full rebuild is cheaper than patching
+REBUILD_RATIO = 0.05
+# Rebuild (compacting the serial numbers) once this share of them is unused
+COMPACT_RATIO = 0.25
+
+WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Lower-case and strip accents, so 'Élan' matches 'elan'"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def trigrams(folded: str) -> Set[str]:
+    return {folded[i:i + NGRAM_SIZE] for i in range(len(folded) - NGRAM_SIZE + 1)}
+
+
+def _patched(postings: Dict[str, List[int]], drops: Dict[str, Set[int]], adds: Dict[str, List[int]]) -> Dict[str, List[int]]:
+    """New posting lists for the keys in `drops` / `adds`, leaving the current ones untouched"""
+    return {
+        key: list(heapq.merge(
+            (rank for rank in postings.get(key, ()) if rank not in drops.get(key, ())), sorted(adds.get(key, ()))))
+        for key in drops.keys() | adds.keys()
+    }
+
+
+def _swap(postings: Dict[str, List[int]], patched: Dict[str, List[int]]) -> None:
+    for key, ranks in patched.items():
+        if ranks:
+            postings[key] = ranks
+        else:
+            postings.pop(key, None)
+
+
+class SuggestIndex:
+    """Prefix + trigram index over node labels, boosted by importance"""
+
+    def __init__(self, nodes: List[Dict[str, Any]], revision: Optional[str] = None):
+        self.revision = revision
+        self._lock = threading.Lock()
+        # Postings hold plain int rank keys (see _rank) rather than tuples: tens
+        # of millions of small tuples would make every GC pass crawl the index
+        self.ids: List[Optional[str]] = []
+        self.tombstones = 0
+        # node id -> (label, folded label, importance, rank key)
+        self.records: Dict[str, Tuple[str, str, float, int]] = {}
+        self.words: Dict[str, List[int]] = {}
+        self.vocab: List[str] = []
+        self.node_words: Dict[str, frozenset] = {}
+        self.trigrams: Dict[str, List[int]] = {}
+
+        # Visiting nodes in rank order leaves every posting list sorted
+        words, grams = defaultdict(list), defaultdict(list)
+        for node in nodes:
+            label, importance = self._key(node)
+            self.records[node["id"]] = (label, fold(label), importance, self._rank(node["id"], importance))
+        for node_id, (_, folded, _, rank) in sorted(self.records.items(), key=lambda item: item[1][3]):
+            self.node_words[node_id] = node_words = frozenset(WORD.findall(folded))
+            for word in node_words:
+                words[word].append(rank)
+            for gram in trigrams(folded):
+                grams[gram].append(rank)
+        self.words, self.trigrams = dict(words), dict(grams)
+        self.vocab = sorted(self.words)
+
+    @staticmethod
+    def _key(node: Dict[str, Any]) -> Tuple[str, float]:
+        return str(node.get("label") or ""), float(node.get("importance") or 0.0)
+
+    def _rank(self, node_id: str, importance: float) -> int:
+        """Sort key packing importance (descending) above a per-node serial number"""
+        serial = len(self.ids)
+        self.ids.append(node_id)
+        return (round(-importance * 1e6) << 32) + serial
+
+    def _node(self, rank: int) -> str:
+        return self.ids[rank & 0xFFFFFFFF]
+
+    def _top(self, ranks, k: int, accept) -> List[str]:
+        """
+        First k accepted nodes from rank-ordered `ranks`, ties on importance
+        broken by label then id: reading continues past the k-th match until
+        importance drops, then the ties are sorted
+        """
+        found: List[Tuple[int, str]] = []
+        for scanned, rank in enumerate(ranks):
+            if scanned == MAX_SCAN or (len(found) >= k and rank >> 32 != found[k - 1][0] >> 32):
+                break
+            node_id = self._node(rank)
+            if accept(node_id):
+                found.append((rank, node_id))
+        found.sort(key=lambda item: (item[0] >> 32, self.records[item[1]][0], item[1]))
+        return [node_id for _, node_id in found[:k]]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def apply(self, nodes: List[Dict[str, Any]], revision: Optional[str] = None) -> "SuggestIndex":
+        """
+        Bring the index in line with `nodes`: patch the added, removed and
+        relabelled/re-weighted nodes, or return a fresh index when too much
+        changed for patching to pay off. Replacement posting lists are built
+        first and only swapped in under the lock, so suggest() never waits for
+        the patch itself.
+        """
+        current = {n["id"]: self._key(n) for n in nodes}
+        removed = [i for i in self.records if i not in current]
+        changed = [
+            i for i, (label, importance) in current.items()
+            if i not in self.records or self.records[i][0] != label or self.records[i][2] != importance
+        ]
+        if len(removed) + len(changed) > REBUILD_RATIO * max(len(current), 1) + 100:
+            return SuggestIndex(nodes, revision)
+        # Every removed or re-added node leaves an empty serial behind
+        if self.tombstones + len(removed) + len(changed) > COMPACT_RATIO * max(len(current), 1) + 100:
+            return SuggestIndex(nodes, revision)
+
+        word_drops, word_adds = defaultdict(set), defaultdict(list)
+        gram_drops, gram_adds = defaultdict(set), defaultdict(list)
+        freed = []
+        for node_id in removed + [i for i in changed if i in self.records]:
+            _, folded, _, rank = self.records[node_id]
+            freed.append(rank)
+            for word in self.node_words[node_id]:
+                word_drops[word].add(rank)
+            for gram in trigrams(folded):
+                gram_drops[gram].add(rank)
+        records, node_words = {}, {}
+        for node_id in changed:
+            label, importance = current[node_id]
+            folded = fold(label)
+            rank = self._rank(node_id, importance)
+            records[node_id] = (label, folded, importance, rank)
+            node_words[node_id] = frozenset(WORD.findall(folded))
+            for word in node_words[node_id]:
+                word_adds[word].append(rank)
+            for gram in trigrams(folded):
+                gram_adds[gram].append(rank)
+
+        words = _patched(self.words, word_drops, word_adds)
+        grams = _patched(self.trigrams, gram_drops, gram_adds)
+        vocab = None
+        gone = {word for word, postings in words.items() if not postings}
+        new = sorted(word for word, postings in words.items() if postings and word not in self.words)
+        if gone or new:
+            vocab = list(heapq.merge((word for word in self.vocab if word not in gone), new))
+
+        with self._lock:
+            for rank in freed:
+                self.ids[rank & 0xFFFFFFFF] = None
+            self.tombstones += len(freed)
+            for node_id in removed:
+                del self.records[node_id]
+                del self.node_words[node_id]
+            self.records.update(records)
+            self.node_words.update(node_words)
+            _swap(self.words, words)
+            _swap(self.trigrams, grams)
+            if vocab is not None:
+                self.vocab = vocab
+            self.revision = revision
+        return self
+
+    def suggest(self, q: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Top-k completions for `q`. Earlier words of the query must appear in
+        the label as whole words and the last one as a word prefix; queries of
+        three or more characters also match anywhere inside the label.
+        """
+        folded = fold(q).strip()
+        tokens = WORD.findall(folded)
+        if not tokens:
+            return []
+
+        with self._lock:
+            results: List[Dict[str, Any]] = []
+            seen: Set[str] = set()
+            *complete, last = tokens
+            required = set(complete)
+            if all(word in self.words for word in required):
+                start = bisect_left(self.vocab, last)
+                stop = bisect_left(self.vocab, last + "\uffff")
+                postings = [self.words[word] for word in self.vocab[start:stop]]
+
+                def word_match(node_id: str) -> bool:
+                    # A node is in the merged postings once per completed word
+                    if node_id in seen or not required <= self.node_words[node_id]:
+                        return False
+                    seen.add(node_id)
+                    return True
+
+                for node_id in self._top(heapq.merge(*postings), k, word_match):
+                    results.append(self._suggestion(node_id, "prefix", 1.0))
+
+            if len(results) < k and len(folded) >= NGRAM_SIZE:
+                rarest = min((self.trigrams.get(g, []) for g in trigrams(folded)), key=len)
+                infix = self._top(
+                    rarest, k - len(results),
+                    lambda node_id: node_id not in seen and folded in self.records[node_id][1])
+                for node_id in infix:
+                    results.append(self._suggestion(node_id, "infix", 0.0))
+            return results
+
+    def _suggestion(self, node_id: str, match: str, boost: float) -> Dict[str, Any]:
+        label, _, importance, _ = self.records[node_id]
+        return {
+            "id": node_id,
+            "label": label,
+            "importance": importance,
+            "match": match,
+            "score": round(boost + importance, 4),
+        }
@@ -0,0 +1,120 @@
+"""
+ArangoSearch definitions for node search.
+
+Shared by setup_arrango.py (which provisions them), the /search endpoint and
+benchmark.py, so the analyzer and view names cannot drift apart.
+
+- TEXT_ANALYZER splits text into words, lower-cased with accents removed;
+  BM25 ranks on these terms
+- NGRAM_ANALYZER folds the same way and emits character trigrams, so a
+  PHRASE of trigrams matches any substring of three or more characters
+"""
+
+from typing import Any, Dict, List, Tuple
+
+VIEW_NAME = "nodesSearch"
+TEXT_ANALYZER = "protograph_text"
+NGRAM_ANALYZER = "protograph_ngram"
+NGRAM_SIZE = 3
+
+ANALYZERS: List[Dict[str, Any]] = [
+    {
+        "name": TEXT_ANALYZER,
+        "analyzer_type": "text",
+        "properties": {"locale": "en", "case": "lower", "accent": False, "stemming": False, "stopwords": []},
+        "features": ["frequency", "norm", "position"],
+    },
+    {
+        "name": NGRAM_ANALYZER,
+        "analyzer_type": "pipeline",
+        "properties": {
+            "pipeline": [
+                {"type": "norm", "properties": {"locale": "en", "case": "lower", "accent": False}},
+                {"type": "ngram", "properties": {
+                    "min": NGRAM_SIZE, "max": NGRAM_SIZE, "preserveOriginal": False, "streamType": "utf8"}},
+            ]
+        },
+        "features": ["frequency", "norm", "position"],
+    },
+]
+
+VIEW_PROPERTIES: Dict[str, Any] = {
+    "links": {
+        "nodes": {
+            "includeAllFields": False,
+            "fields": {
+                "label": {"analyzers": [TEXT_ANALYZER, NGRAM_ANALYZER]},
+                "description": {"analyzers": [TEXT_ANALYZER]},
+                "type": {"analyzers": [TEXT_ANALYZER]},
+                "cluster": {"analyzers": [TEXT_ANALYZER]},
+            },
+        }
+    },
+}
+
+
+def provision(db) -> List[str]:
+    """
+    Create the analyzers and the view on a python-arango database handle if
+    they do not exist yet. Returns a line per object for the setup log.
+    """
+    log = []
+    existing = {a["name"].split("::")[-1] for a in db.analyzers()}
+    for analyzer in ANALYZERS:
+        if analyzer["name"] in existing:
+            log.append(f"Analyzer already exists: {analyzer['name']}")
+        else:
+            db.create_analyzer(**analyzer)
+            log.append(f"Created analyzer: {analyzer['name']}")
+
+    if any(view["name"] == VIEW_NAME for view in db.views()):
+        db.update_arangosearch_view(VIEW_NAME, VIEW_PROPERTIES)
+        log.append(f"View already exists, links updated: {VIEW_NAME}")
+    else:
+        db.create_arangosearch_view(VIEW_NAME, properties=VIEW_PROPERTIES)
+        log.append(f"Created view: {VIEW_NAME}")
+    return log
+
+
+def build_query(
+    q: str, limit: int, offset: int, projection: str, view: str = VIEW_NAME
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Ranked node search on the view, as (AQL, bind vars).
+
+    Matches whole words in label, description, type and cluster, the last
+    word as a prefix (for search-as-you-type) and, for queries of NGRAM_SIZE
+    or more characters, any substring of the label via trigram phrases.
+    Results are ordered by BM25 score, label matches counting double, then
+    by importance. `projection` is an AQL expression over `doc`; each row
+    also carries its `score`. Returns up to limit + 1 rows so the caller can
+    tell whether there are more.
+    """
+    bind_vars: Dict[str, Any] = {
+        "@view": view,
+        "q": q,
+        "prefix": q.lower().split()[-1],
+        "text": TEXT_ANALYZER,
+        "offset": offset,
+        "probe": limit + 1,
+    }
+    infix = ""
+    if len(q.strip()) >= NGRAM_SIZE:
+        infix = "OR ANALYZER(PHRASE(doc.label, @q), @ngram)"
+        bind_vars["ngram"] = NGRAM_ANALYZER
+
+    query = f"""
+        FOR doc IN @@view
+            SEARCH ANALYZER(
+                    BOOST(doc.label IN TOKENS(@q, @text), 2.0)
+                    OR doc.description IN TOKENS(@q, @text)
+                    OR doc.type IN TOKENS(@q, @text)
+                    OR doc.cluster IN TOKENS(@q, @text)
+                    OR STARTS_WITH(doc.label, @prefix), @text)
+                {infix}
+            LET score = BM25(doc)
+            SORT score DESC, doc.importance DESC, doc._key
+            LIMIT @offset, @probe
+            RETURN MERGE({projection}, {{score}})
+    """
+    return query, bind_vars
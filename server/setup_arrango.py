@@ -8,6 +8,8 @@ import sys
 import getpass
 from arango import ArangoClient
 
+import search_view
+
 print("=" * 60)
 print("🚀 ProtoGraph Database Setup")
 print("=" * 60)
@@ -101,6 +103,11 @@ def setup_database():
         else:
             print("✓ Importance index already exists")
         
+        # Full-text search: analyzers + ArangoSearch view used by /search
+        print(f"\n🔎 Setting up search view: {search_view.VIEW_NAME}")
+        for line in search_view.provision(db):
+            print(f"✓ {line}")
+        
         return db, graph
         
     except Exception as e:
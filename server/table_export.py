@@ -0,0 +1,118 @@
+"""
+Tabular exports for /export/{table}.{csv,parquet}.
+
+Rows arrive from an async iterator (typically a streaming AQL cursor) and
+are written out one chunk of at most `chunk_rows` rows at a time, so memory
+stays bounded by a single chunk whatever the size of the table:
+
+ - CSV: a header line, then one encoded block per chunk. Missing values
+   are written as empty fields.
+ - Parquet (pyarrow, optional): one row group per chunk, drained from the
+   writer as soon as it is complete; the footer follows the last one.
+   `cluster` / `type` / `community` are dictionary-encoded.
+"""
+
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Parquet column types; anything not listed is a string column
+NUMERIC_COLUMNS = {"importance": "float", "size": "float", "weight": "float", "score": "float", "count": "int"}
+DICTIONARY_COLUMNS = {"cluster", "type", "community"}
+
+
+def is_available(fmt: str) -> bool:
+    if fmt == "parquet":
+        return pq is not None
+    return fmt in FORMATS
+
+
+async def chunked(rows: AsyncIterator[Dict[str, Any]], size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Group an async row iterator into lists of at most `size` rows"""
+    buffer: List[Dict[str, Any]] = []
+    async for row in rows:
+        buffer.append(row)
+        if len(buffer) >= size:
+            yield buffer
+            buffer = []
+    if buffer:
+        yield buffer
+
+
+async def stream_csv(rows: AsyncIterator[Dict[str, Any]], columns: List[str], chunk_rows: int) -> AsyncIterator[bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    yield out.getvalue().encode()
+    async for chunk in chunked(rows, chunk_rows):
+        out.seek(0)
+        out.truncate()
+        writer.writerows([row.get(column) for column in columns] for row in chunk)
+        yield out.getvalue().encode()
+
+
+class _Drain:
+    """Write-only file object for ParquetWriter that hands back what was written so far"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_schema(columns: List[str]):
+    types = {"float": pa.float64(), "int": pa.int64()}
+    return pa.schema([
+        (column, pa.dictionary(pa.int32(), pa.string()) if column in DICTIONARY_COLUMNS
+         else types.get(NUMERIC_COLUMNS.get(column), pa.string()))
+        for column in columns
+    ])
+
+
+async def stream_parquet(rows: AsyncIterator[Dict[str, Any]], columns: List[str], chunk_rows: int) -> AsyncIterator[bytes]:
+    schema = parquet_schema(columns)
+    sink = _Drain()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        async for chunk in chunked(rows, chunk_rows):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def stream(fmt: str, rows: AsyncIterator[Dict[str, Any]], columns: List[str], chunk_rows: int) -> AsyncIterator[bytes]:
+    if fmt == "parquet":
+        return stream_parquet(rows, columns, chunk_rows)
+    return stream_csv(rows, columns, chunk_rows)
@@ -0,0 +1,11 @@
+"""
+Equivalence checks for the in-process algorithms, run with `pytest server/tests`.
+
+The server modules are flat scripts rather than a package, so their
+directory is put on the import path here.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,124 @@
+"""AdjacencyIndex against brute-force references on small random graphs"""
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from adjacency import AdjacencyIndex  # noqa: E402
+
+
+def random_graph(rng: random.Random, node_count: int, edge_count: int):
+    # Weights and importances are exact binary fractions, so the float32
+    # copies inside the index compare equal to the reference's floats
+    nodes = [{"id": f"nodes/{i}", "importance": rng.choice([0.25, 0.5, 1.0])} for i in range(node_count)]
+    edges = []
+    for j in range(edge_count):
+        source, target = rng.randrange(node_count), rng.randrange(node_count)
+        if source != target:
+            edges.append({
+                "id": f"edges/{j}",
+                "source": f"nodes/{source}",
+                "target": f"nodes/{target}",
+                "weight": rng.choice([0.25, 0.5, 0.75, 1.0]),
+            })
+    return nodes, edges
+
+
+def reference_ranked_bfs(nodes, edges, start, depth, limit, offset, total):
+    """Level by level: each parent's new neighbours by (weight, importance, id), then each level the same way"""
+    importance = {n["id"]: n["importance"] for n in nodes}
+    adjacent = {}
+    for e in edges:
+        for a, b in ((e["source"], e["target"]), (e["target"], e["source"])):
+            adjacent.setdefault(a, []).append((b, e["weight"]))
+
+    seen, frontier, budget = {start}, [start], total
+    reached, candidates = [], {}
+    for level in range(1, depth + 1):
+        best = {}
+        for parent in frontier:
+            strongest = {}
+            for neighbour, weight in adjacent.get(parent, []):
+                if neighbour not in seen:
+                    strongest[neighbour] = max(strongest.get(neighbour, -1.0), weight)
+            ranked = sorted(strongest, key=lambda b: (-strongest[b], -importance[b], b))
+            if ranked:
+                candidates[parent] = ranked
+            for neighbour in ranked[offset:None if limit is None else offset + limit]:
+                best[neighbour] = max(best.get(neighbour, -1.0), strongest[neighbour])
+        fresh = sorted(best, key=lambda b: (-best[b], -importance[b], b))
+        if budget is not None:
+            fresh = fresh[:budget]
+            budget -= len(fresh)
+        if not fresh:
+            break
+        seen.update(fresh)
+        reached += [(node, level) for node in fresh]
+        frontier = fresh
+    hidden = {p: len(r) - offset - sum(1 for b in r if b in seen) for p, r in candidates.items()}
+    return reached, {p: n for p, n in hidden.items() if n > 0}
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_ranked_bfs_matches_reference(seed):
+    rng = random.Random(seed)
+    nodes, edges = random_graph(rng, rng.randint(5, 120), rng.randint(5, 400))
+    index = AdjacencyIndex(nodes, edges)
+    start = rng.choice(nodes)["id"]
+    depth, limit = rng.randint(1, 4), rng.choice([None, 1, 2, 5])
+    offset, total = rng.choice([0, 0, 1]), rng.choice([None, 3, 20])
+
+    found, distances, more, _ = index.ranked_bfs(index.index[start], depth, None, None, limit, offset, total)
+    reached = [(nodes[i]["id"], int(d)) for i, d in zip(found.tolist(), distances.tolist())]
+    hidden = {nodes[i]["id"]: n for i, n in more.items()}
+    assert (reached, hidden) == reference_ranked_bfs(nodes, edges, start, depth, limit, offset, total)
+
+
+def all_simple_paths(edges, source, target):
+    """Every loopless path from source to target, as edge lists (parallel edges make distinct paths)"""
+    adjacent = {}
+    for e in edges:
+        adjacent.setdefault(e["source"], []).append((e["target"], e))
+        adjacent.setdefault(e["target"], []).append((e["source"], e))
+    paths = []
+
+    def extend(node, visited, path):
+        if node == target:
+            paths.append(list(path))
+            return
+        for neighbour, edge in adjacent.get(node, []):
+            if neighbour not in visited:
+                visited.add(neighbour)
+                path.append(edge)
+                extend(neighbour, visited, path)
+                path.pop()
+                visited.remove(neighbour)
+
+    extend(source, {source}, [])
+    return paths
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("weighted", [False, True])
+def test_k_shortest_paths_match_enumeration(seed, weighted):
+    rng = random.Random(seed)
+    nodes, edges = random_graph(rng, 9, 18)
+    index = AdjacencyIndex(nodes, edges)
+    paths = all_simple_paths(edges, "nodes/0", "nodes/8")
+    cost = (lambda p: sum(e["weight"] for e in p)) if weighted else len
+
+    for k in (1, 3, 5):
+        found = index.k_shortest_paths("nodes/0", "nodes/8", k, weighted)
+        assert [p["cost"] for p in found] == sorted(round(cost(p), 6) for p in paths)[:k]
+        for path in found:
+            ids = [n["id"] for n in path["nodes"]]
+            assert ids[0] == "nodes/0" and ids[-1] == "nodes/8" and len(set(ids)) == len(ids)
+
+    if not weighted:
+        # Unweighted paths come out by length, so max_depth applied after the
+        # k cheapest is exact: the k shortest, minus those that are too long
+        for k, max_depth in ((3, 2), (5, 3), (4, 10)):
+            found = index.k_shortest_paths("nodes/0", "nodes/8", k, weighted, max_depth)
+            assert [p["length"] for p in found] == [n for n in sorted(map(len, paths))[:k] if n <= max_depth]
@@ -0,0 +1,81 @@
+"""Batched algebraic Brandes against a plain per-source Brandes"""
+
+import random
+from collections import deque
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+import centrality  # noqa: E402
+
+
+def random_graph(rng: random.Random, node_count: int, edge_count: int):
+    nodes = [{"id": f"nodes/{i}"} for i in range(node_count)]
+    edges = [
+        {"source": f"nodes/{rng.randrange(node_count)}", "target": f"nodes/{rng.randrange(node_count)}"}
+        for _ in range(edge_count)
+    ]
+    return nodes, edges
+
+
+def reference_dependencies(nodes, edges, sources):
+    """Summed Brandes dependencies from `sources`, hop counts over the undirected simple graph"""
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+    adjacent = [set() for _ in nodes]
+    for e in edges:
+        a, b = index[e["source"]], index[e["target"]]
+        if a != b:
+            adjacent[a].add(b)
+            adjacent[b].add(a)
+
+    total = [0.0] * len(nodes)
+    for source in sources:
+        sigma, depth, order = {source: 1.0}, {source: 0}, []
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbour in adjacent[node]:
+                if neighbour not in depth:
+                    depth[neighbour] = depth[node] + 1
+                    sigma[neighbour] = 0.0
+                    queue.append(neighbour)
+                if depth[neighbour] == depth[node] + 1:
+                    sigma[neighbour] += sigma[node]
+        delta = dict.fromkeys(order, 0.0)
+        for node in reversed(order):
+            for parent in adjacent[node]:
+                if depth.get(parent) == depth[node] - 1:
+                    delta[parent] += sigma[parent] / sigma[node] * (1.0 + delta[node])
+            if node != source:
+                total[node] += delta[node]
+    return np.array(total)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_exact_betweenness_matches_brandes(seed):
+    rng = random.Random(seed)
+    # Up to a few batches of sources, with parallel edges, self loops and isolated nodes
+    nodes, edges = random_graph(rng, rng.randint(3, 100), rng.randint(0, 300))
+    _, undirected, _ = centrality.build_matrices(nodes, edges)
+    scores, used = centrality.betweenness(undirected)
+    count = len(nodes)
+    expected = reference_dependencies(nodes, edges, range(count)) / ((count - 1) * (count - 2))
+    assert used == count
+    np.testing.assert_allclose(scores, expected, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sampled_betweenness_scales_the_sampled_sources(seed):
+    rng = random.Random(seed)
+    nodes, edges = random_graph(rng, 80, 200)
+    _, undirected, _ = centrality.build_matrices(nodes, edges)
+    samples = 40
+    scores, used = centrality.betweenness(undirected, samples, seed=seed)
+    count = len(nodes)
+    sources = np.random.default_rng(seed).choice(count, size=samples, replace=False)
+    expected = reference_dependencies(nodes, edges, sources.tolist()) * count / samples / ((count - 1) * (count - 2))
+    assert used == samples
+    np.testing.assert_allclose(scores, expected, rtol=1e-9, atol=1e-12)
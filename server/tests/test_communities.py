@@ -0,0 +1,122 @@
+"""Incremental community refinement against its starting point and a full detect"""
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+from scipy.sparse import csgraph  # noqa: E402
+
+import communities  # noqa: E402
+
+
+def planted_graph(rng: random.Random, blocks: int, size: int, inside: float = 0.3, across: float = 0.01):
+    """`blocks` dense groups of `size` nodes, sparsely linked to each other"""
+    nodes = [{"id": f"nodes/{i}"} for i in range(blocks * size)]
+    edges = []
+    for a in range(len(nodes)):
+        for b in range(a + 1, len(nodes)):
+            if rng.random() < (inside if a // size == b // size else across):
+                edges.append({"source": f"nodes/{a}", "target": f"nodes/{b}", "weight": rng.choice([1.0, 2.0])})
+    return nodes, edges
+
+
+def connected_communities(matrix, labels) -> bool:
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        parts, _ = csgraph.connected_components(matrix[members][:, members], directed=False)
+        if parts != 1:
+            return False
+    return True
+
+
+def rewire(rng: random.Random, nodes, edges, count: int):
+    """Drop and add `count` edges; returns (edges, ids of touched nodes)"""
+    edges = list(edges)
+    touched = set()
+    for _ in range(count):
+        dropped = edges.pop(rng.randrange(len(edges)))
+        source, target = rng.sample(nodes, 2)
+        edges.append({"source": source["id"], "target": target["id"], "weight": 1.0})
+        touched |= {dropped["source"], dropped["target"], source["id"], target["id"]}
+    return edges, touched
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_detect_gives_connected_communities(seed):
+    rng = random.Random(seed)
+    nodes, edges = planted_graph(rng, rng.randint(2, 8), rng.randint(5, 25), inside=0.2, across=0.02)
+    matrix = communities.symmetric_matrix(nodes, edges)
+    labels = communities.detect(matrix, seed=seed)
+    assert connected_communities(matrix, labels)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_refine_never_lowers_modularity(seed):
+    rng = random.Random(seed)
+    nodes, edges = planted_graph(rng, 5, 20)
+    before = communities.symmetric_matrix(nodes, edges)
+    labels = communities.detect(before, seed=seed)
+    edges, touched = rewire(rng, nodes, edges, rng.randint(1, 10))
+    matrix = communities.symmetric_matrix(nodes, edges)
+    start = communities.split_disconnected(matrix, labels)
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+
+    refined, visits = communities.refine(matrix, start, [index[i] for i in touched])
+    assert visits <= communities.REFINE_STEPS * len(touched)
+    assert communities.modularity(matrix, refined) >= communities.modularity(matrix, start) - 1e-12
+    assert connected_communities(matrix, refined)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_refine_without_candidates_keeps_labels(seed):
+    rng = random.Random(seed)
+    nodes, edges = planted_graph(rng, 4, 15)
+    matrix = communities.symmetric_matrix(nodes, edges)
+    labels = communities.detect(matrix, seed=seed)
+    refined, visits = communities.refine(matrix, labels, [])
+    assert visits == 0
+    assert np.array_equal(refined, labels)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_refine_only_relabels_around_the_change(seed):
+    # Blocks with no links between them: an edit inside one block cannot move nodes of another
+    rng = random.Random(seed)
+    nodes, edges = planted_graph(rng, 6, 15, inside=0.4, across=0.0)
+    labels = communities.detect(communities.symmetric_matrix(nodes, edges), seed=seed)
+    block = rng.randrange(6)
+    members = nodes[block * 15:(block + 1) * 15]
+    edited = list(edges)
+    touched = set()
+    for _ in range(3):
+        source, target = rng.sample(members, 2)
+        edited.append({"source": source["id"], "target": target["id"], "weight": 1.0})
+        touched |= {source["id"], target["id"]}
+    matrix = communities.symmetric_matrix(nodes, edited)
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+
+    refined, _ = communities.refine(matrix, labels, [index[i] for i in touched])
+    outside = np.ones(len(nodes), dtype=bool)
+    outside[block * 15:(block + 1) * 15] = False
+    assert np.array_equal(refined[outside], labels[outside])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_assign_refines_small_edits_close_to_full_detect(seed):
+    rng = random.Random(seed)
+    nodes, edges = planted_graph(rng, 8, 25)
+    first = communities.assign(nodes, edges, {})
+    assert first["mode"] == "full"
+
+    edges, touched = rewire(rng, nodes, edges, 2)
+    refined = communities.assign(nodes, edges, first["labels"], changed=touched)
+    full = communities.assign(nodes, edges, first["labels"])
+    assert refined["mode"] == "refine"
+    assert full["mode"] == "full"
+    assert refined["visits"] < len(nodes)
+    assert refined["modularity"] >= full["modularity"] - 0.01
+    matrix = communities.symmetric_matrix(nodes, edges)
+    codes = np.unique([refined["labels"][n["id"]] for n in nodes], return_inverse=True)[1]
+    assert connected_communities(matrix, codes)
@@ -0,0 +1,69 @@
+"""CouplingMatrix.from_graph (NumPy and plain-Python passes) against a per-pair reference"""
+
+import random
+
+import pytest
+
+import coupling
+from coupling import DEFAULT_IMPORTANCE, DEFAULT_WEIGHT, CouplingMatrix
+
+
+def random_graph(rng: random.Random):
+    teams = [f"team_{i}" for i in range(rng.randint(1, 6))]
+    nodes = []
+    for i in range(rng.randint(1, 60)):
+        node = {"id": f"nodes/{i}", "cluster": rng.choice(teams)}
+        if rng.random() < 0.8:
+            node["importance"] = rng.random()
+        nodes.append(node)
+    ids = [n["id"] for n in nodes] + ["nodes/missing"]
+    edges = []
+    for j in range(rng.randint(0, 200)):
+        edge = {"id": f"edges/{j}", "source": rng.choice(ids), "target": rng.choice(ids)}
+        if rng.random() < 0.8:
+            edge["weight"] = rng.random()
+        edges.append(edge)
+    return nodes, edges
+
+
+def reference(nodes, edges):
+    """For every ordered pair of teams, sum and count the edges between them one pair at a time"""
+    by_id = {n["id"]: n for n in nodes}
+    teams = {n["cluster"] for n in nodes}
+    scores, counts = {}, {}
+    for a in teams:
+        for b in teams:
+            if a == b:
+                continue
+            for e in edges:
+                source, target = by_id.get(e["source"]), by_id.get(e["target"])
+                if source is None or target is None or {source["cluster"], target["cluster"]} != {a, b}:
+                    continue
+                importance = source.get("importance", DEFAULT_IMPORTANCE) + target.get("importance", DEFAULT_IMPORTANCE)
+                scores[(a, b)] = scores.get((a, b), 0.0) + e.get("weight", DEFAULT_WEIGHT) * importance / 2
+                counts[(a, b)] = counts.get((a, b), 0) + 1
+    return CouplingMatrix(sorted({a for a, _ in scores}), scores, counts)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+@pytest.mark.parametrize("seed", range(30))
+def test_from_graph_matches_reference(seed, vectorized, monkeypatch):
+    if vectorized:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(coupling, "np", None)
+    nodes, edges = random_graph(random.Random(seed))
+    matrix = CouplingMatrix.from_graph(nodes, edges)
+    expected = reference(nodes, edges)
+    assert matrix.differences(expected) == []
+    assert sorted(matrix.teams) == expected.teams
+
+
+def test_from_pairs_folds_directions():
+    rows = [
+        {"source": "a", "target": "b", "score": 1.5, "count": 2},
+        {"source": "b", "target": "a", "score": 0.5, "count": 1},
+    ]
+    matrix = CouplingMatrix.from_pairs(rows)
+    assert matrix.scores == {("a", "b"): 2.0, ("b", "a"): 2.0}
+    assert matrix.counts == {("a", "b"): 3, ("b", "a"): 3}
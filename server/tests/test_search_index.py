@@ -0,0 +1,53 @@
+"""SuggestIndex: a patched index must suggest exactly what a fresh build does"""
+
+import random
+
+import pytest
+
+from search_index import SuggestIndex
+
+WORDS = ["net", "network", "play", "playbook", "range", "topo", "camp", "élan"]
+QUERIES = ["n", "net", "play", "ran", "work", "topo 3", "etw", "elan", "camp net", "zzz"]
+
+
+def random_node(rng: random.Random, i: int):
+    return {
+        "id": f"nodes/{i}",
+        "label": " ".join(rng.sample(WORDS, 2)) + f" {rng.randrange(5)}",
+        # Few distinct importances, so ranking ties are common
+        "importance": rng.choice([0.5, 0.7, 0.9]),
+    }
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_patched_index_matches_fresh_build(seed):
+    rng = random.Random(seed)
+    nodes = {i: random_node(rng, i) for i in range(1000)}
+    index = SuggestIndex(list(nodes.values()))
+    next_id = len(nodes)
+    patched = 0
+    for _ in range(60):
+        for _ in range(5):
+            key = rng.choice(list(nodes))
+            if rng.random() < 0.5:
+                del nodes[key]
+            else:
+                nodes[key] = random_node(rng, key)
+            nodes[next_id] = random_node(rng, next_id)
+            next_id += 1
+        updated = index.apply(list(nodes.values()))
+        patched += updated is index
+        index = updated
+
+        fresh = SuggestIndex(list(nodes.values()))
+        for q in QUERIES:
+            assert index.suggest(q, 10) == fresh.suggest(q, 10), q
+    assert patched > 0
+
+
+def test_prefix_matches_rank_above_infix():
+    index = SuggestIndex([
+        {"id": "nodes/a", "label": "Network ops", "importance": 0.1},
+        {"id": "nodes/b", "label": "Subnetwork", "importance": 0.9},
+    ])
+    assert [(s["id"], s["match"]) for s in index.suggest("netw")] == [("nodes/a", "prefix"), ("nodes/b", "infix")]
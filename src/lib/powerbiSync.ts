@@ -22,10 +22,53 @@ const DEFAULT_OPTIONS: SyncOptions = {
 };
 
 let debounceTimer: NodeJS.Timeout | null = null;
+// Change waiting for the debounce; further calls of the same type add their nodes to it.
+// allNodes sticks once any merged call named no nodes ("everything changed").
+let pending: { changeType: ChangeType; affectedNodes: Set<string>; allNodes: boolean } | null = null;
+
+// Types describing current state rather than a change: only the latest call is sent
+const LATEST_ONLY: ChangeType[] = ["node_selection"];
+
+const sendUpdate = async (changeType: ChangeType, affectedNodes: string[]) => {
+    try {
+        const response = await fetch("http://127.0.0.1:8000/analytics/notify-update", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                change_type: changeType,
+                affected_nodes: affectedNodes,
+                timestamp: new Date().toISOString()
+            })
+        });
+
+        if (response.ok) {
+            console.log(`✅ Power BI notified: ${changeType}`, affectedNodes);
+        } else {
+            console.warn(`⚠️ Power BI notification failed: ${response.status}`);
+        }
+    } catch (err) {
+        // Fail silently - don't break ProtoGraph if Power BI is down
+        console.warn("⚠️ Power BI not available:", err);
+    }
+};
+
+const flushPending = () => {
+    if (debounceTimer) {
+        clearTimeout(debounceTimer);
+        debounceTimer = null;
+    }
+    if (pending) {
+        const { changeType, affectedNodes, allNodes } = pending;
+        pending = null;
+        sendUpdate(changeType, allNodes ? [] : [...affectedNodes]);
+    }
+};
 
 /**
  * Notify Power BI that ProtoGraph data has changed
  * Power BI will then refresh its dataset to pull latest metrics
+ * For edge changes, pass both endpoints in affectedNodes: the server evicts
+ * cached neighborhoods and re-reads analytics by node.
  */
 export const notifyPowerBIUpdate = async (
     changeType: ChangeType,
@@ -37,33 +80,24 @@ export const notifyPowerBIUpdate = async (
         return;
     }
 
-    // Debounce rapid updates
+    // Debounce rapid updates. Nothing is dropped: calls of the same type are
+    // merged (a selection replaces the previous one), and a different type
+    // sends the pending change first.
+    if (pending && pending.changeType !== changeType) {
+        flushPending();
+    }
+    if (!pending || LATEST_ONLY.includes(changeType)) {
+        pending = { changeType, affectedNodes: new Set(), allNodes: false };
+    }
+    if (!affectedNodes || affectedNodes.length === 0) {
+        pending.allNodes = true;
+    }
+    (affectedNodes || []).forEach((id) => pending!.affectedNodes.add(id));
+
     if (debounceTimer) {
         clearTimeout(debounceTimer);
     }
-
-    debounceTimer = setTimeout(async () => {
-        try {
-            const response = await fetch("http://127.0.0.1:8000/analytics/notify-update", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({
-                    change_type: changeType,
-                    affected_nodes: affectedNodes || [],
-                    timestamp: new Date().toISOString()
-                })
-            });
-
-            if (response.ok) {
-                console.log(`✅ Power BI notified: ${changeType}`, affectedNodes);
-            } else {
-                console.warn(`⚠️ Power BI notification failed: ${response.status}`);
-            }
-        } catch (err) {
-            // Fail silently - don't break ProtoGraph if Power BI is down
-            console.warn("⚠️ Power BI not available:", err);
-        }
-    }, options.debounceMs);
+    debounceTimer = setTimeout(flushPending, options.debounceMs);
 };
 
 /**